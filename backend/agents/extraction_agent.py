@@ -1,9 +1,115 @@
-from typing import TypedDict, Annotated
+import asyncio
+import json
+import logging
+import operator
+import time
+from typing import Callable, TypedDict, Annotated
 from langgraph.graph import StateGraph, END
 from langchain_anthropic import ChatAnthropic
 from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.runnables import RunnableConfig
+import metrics
 from config import get_settings
-import json
+from services import get_step_output, step_key, store_step_output
+from tokens import CHARS_PER_TOKEN
+from .preprocessing import dedupe_tweets, sample_tweets
+
+logger = logging.getLogger(__name__)
+
+EXTRACTION_MODEL = "claude-sonnet-4-20250514"
+
+# Independent steps that only read tweets_text; they run concurrently
+EXTRACTION_NODES = (
+    "extract_traits",
+    "extract_interests",
+    "extract_communication_style",
+    "extract_values",
+    "select_sample_tweets",
+)
+
+# "graph" runs one LLM call per profile field; "structured" asks for the whole
+# profile in a single tool call, sending the tweets once instead of six times.
+# Both analyze a token-budgeted sample of the tweets; "map_reduce" reads the
+# whole corpus in batches and combines the partial signals in a final call.
+EXTRACTION_MODES = ("graph", "structured", "map_reduce")
+
+PROFILE_TOOL_NAME = "record_personality_profile"
+STRUCTURED_INSTRUCTIONS = """You are an expert at analyzing social media content to understand someone's personality,
+interests, values and voice. Analyze the following content and record a profile of this person
+with the record_personality_profile tool."""
+# Output cap for batch requests; a profile is well under this
+MAX_OUTPUT_TOKENS = 4096
+# Calls per structured extraction: the first asks for every field, later
+# ones only for the fields that failed validation
+STRUCTURED_MAX_ATTEMPTS = 3
+
+# Fields of the single-call profile: JSON schema and, for lists, the item
+# count accepted by validation (a little looser than what the prompt asks for)
+PROFILE_FIELDS: dict[str, tuple[dict, tuple[int, int] | None]] = {
+    "traits": (
+        {
+            "type": "array",
+            "items": {"type": "string"},
+            "description": "5-7 key personality traits, e.g. curious, empathetic, analytical. "
+            "Genuine personality characteristics, not superficial observations.",
+        },
+        (3, 10),
+    ),
+    "interests": (
+        {
+            "type": "array",
+            "items": {"type": "string"},
+            "description": "5-10 interests and topics this person cares about, "
+            "from recurring themes and genuine passions.",
+        },
+        (3, 12),
+    ),
+    "communication_style": (
+        {
+            "type": "string",
+            "description": "2-3 sentences on their tone (formal/casual), use of humor, "
+            "level of directness and vocabulary complexity.",
+        },
+        None,
+    ),
+    "values": (
+        {
+            "type": "array",
+            "items": {"type": "string"},
+            "description": "3-5 core values, from what they advocate for, criticize, "
+            "or repeatedly emphasize.",
+        },
+        (2, 8),
+    ),
+    "sample_tweets": (
+        {
+            "type": "array",
+            "items": {"type": "string"},
+            "description": "5-10 tweets, copied exactly as written, that best show their "
+            "distinctive phrasing, slang, humor, sentence structure and tone. "
+            "Prefer original thoughts over replies.",
+        },
+        (3, 12),
+    ),
+    "summary": (
+        {
+            "type": "string",
+            "description": "3-4 sentences capturing the essence of their personality, "
+            "written in third person as if describing them to a friend. "
+            "It will be used to power an AI clone, so it should feel personal and authentic.",
+        },
+        None,
+    ),
+}
+MAX_TEXT_FIELD_CHARS = 2000
+
+SIGNALS_TOOL_NAME = "record_partial_signals"
+# Progress reported once every map batch is done; the reduce call is the rest
+MAP_PROGRESS = 90
+# Bounds on what the reduce prompt carries, independent of corpus size
+REDUCE_TOP_ITEMS = 30  # Most frequent traits / interests / values
+REDUCE_STYLE_NOTES = 20
+REDUCE_TWEET_CANDIDATES = 40
 
 
 class ExtractionState(TypedDict):
@@ -16,66 +122,312 @@ class ExtractionState(TypedDict):
     values: list[str]
     sample_tweets: list[str]
     summary: str
-    progress: int
+    # Parallel nodes each add their share of progress and their own timing
+    progress: Annotated[int, operator.add]
+    node_timings: Annotated[dict[str, float], operator.or_]
+    input_tokens: Annotated[int, operator.add]
     error: str | None
 
 
+def _parse_json_list(text: str) -> list:
+    try:
+        value = json.loads(text)
+    except json.JSONDecodeError:
+        return []
+    return value if isinstance(value, list) else []
+
+
+def _tweets_text(content: dict, token_budget: int | None = None) -> str:
+    """Combine the bio and preprocessed tweets into the text the prompts analyze.
+
+    Tweets are normalized and deduplicated; with a ``token_budget`` only a
+    representative sample that fits it is kept.
+    """
+    raw_tweets = content.get("tweets", [])
+    tweets = dedupe_tweets(raw_tweets)
+    metrics.observe("extraction_tweets", len(raw_tweets), stage="fetched")
+    metrics.observe("extraction_tweets", len(tweets), stage="deduplicated")
+    if token_budget is not None:
+        tweets = sample_tweets(tweets, token_budget, content.get("user", {}).get("id"))
+        metrics.observe("extraction_tweets", len(tweets), stage="sampled")
+
+    tweets_text = "\n\n".join(f"Tweet: {t['text']}" for t in tweets)
+
+    # Add user bio if available
+    user = content.get("user", {})
+    if user.get("description"):
+        tweets_text = f"Bio: {user['description']}\n\n{tweets_text}"
+    return tweets_text
+
+
+def _split_batches(text: str, max_tokens: int) -> list[str]:
+    """Split combined tweet text into batches of about ``max_tokens``, at tweet boundaries."""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    batches = []
+    current: list[str] = []
+    size = 0
+    for piece in text.split("\n\n"):
+        if current and size + len(piece) > max_chars:
+            batches.append("\n\n".join(current))
+            current, size = [], 0
+        current.append(piece[:max_chars])
+        size += len(current[-1]) + 2
+    if current:
+        batches.append("\n\n".join(current))
+    return batches
+
+
+def _signals_tool() -> dict:
+    """Tool definition for the per-batch signals of map-reduce extraction."""
+    string_list = {"type": "array", "items": {"type": "string"}}
+    return {
+        "name": SIGNALS_TOOL_NAME,
+        "description": "Record the personality signals found in this part of the content.",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "traits": {**string_list, "description": "Personality traits this part shows, up to 7."},
+                "interests": {**string_list, "description": "Interests and topics discussed, up to 10."},
+                "values": {**string_list, "description": "Values advocated for or emphasized, up to 5."},
+                "communication_style": {
+                    "type": "string",
+                    "description": "One or two sentences on tone, humor, directness and vocabulary.",
+                },
+                "sample_tweets": {
+                    **string_list,
+                    "description": "Up to 3 tweets, copied exactly, that best show their distinctive voice.",
+                },
+            },
+            "required": ["traits", "interests", "values", "communication_style", "sample_tweets"],
+        },
+    }
+
+
+def _clean_signals(answer: dict, batch: str) -> dict:
+    """Keep the well-formed parts of a batch's signals; tweets must be verbatim."""
+    signals = {}
+    for name in ("traits", "interests", "values", "sample_tweets"):
+        value = answer.get(name)
+        items = [v.strip() for v in value if isinstance(v, str) and v.strip()] if isinstance(value, list) else []
+        if name == "sample_tweets":
+            items = [v for v in items if v in batch]
+        signals[name] = items
+    style = answer.get("communication_style")
+    signals["communication_style"] = style.strip() if isinstance(style, str) else ""
+    return signals
+
+
+def _spread(items: list, limit: int) -> list:
+    """Up to ``limit`` items taken evenly across the list."""
+    if len(items) <= limit:
+        return items
+    step = len(items) / limit
+    return [items[int(i * step)] for i in range(limit)]
+
+
+def _reduce_input(content: dict, partials: list[dict]) -> str:
+    """Tally per-batch signals into the reduce prompt."""
+    sections = []
+    bio = content.get("user", {}).get("description")
+    if bio:
+        sections.append(f"Bio: {bio}")
+    sections.append(f"Parts analyzed: {len(partials)}")
+
+    for name in ("traits", "interests", "values"):
+        counts: dict[str, int] = {}
+        labels: dict[str, str] = {}
+        for signals in partials:
+            for item in {v.lower(): v for v in signals[name]}.items():
+                counts[item[0]] = counts.get(item[0], 0) + 1
+                labels.setdefault(item[0], item[1])
+        top = sorted(counts, key=counts.get, reverse=True)[:REDUCE_TOP_ITEMS]
+        sections.append(f"{name.capitalize()}:\n" + "\n".join(f"- {labels[k]} ({counts[k]})" for k in top))
+
+    notes = _spread([p["communication_style"] for p in partials if p["communication_style"]], REDUCE_STYLE_NOTES)
+    sections.append("Communication style notes:\n" + "\n".join(f"- {n}" for n in notes))
+    candidates = _spread([t for p in partials for t in p["sample_tweets"]], REDUCE_TWEET_CANDIDATES)
+    sections.append("Sample tweet candidates:\n" + "\n".join(f"- {t}" for t in candidates))
+    return "\n\n".join(sections)
+
+
+def _input_tokens(response) -> int:
+    """Prompt tokens billed for one LLM response (0 if the provider didn't say)."""
+    usage = getattr(response, "usage_metadata", None) or {}
+    return usage.get("input_tokens", 0)
+
+
+def _profile_tool(fields: list[str]) -> dict:
+    """Tool definition asking for the given profile fields."""
+    return {
+        "name": PROFILE_TOOL_NAME,
+        "description": "Record the personality profile extracted from the content.",
+        "input_schema": {
+            "type": "object",
+            "properties": {name: PROFILE_FIELDS[name][0] for name in fields},
+            "required": fields,
+        },
+    }
+
+
+def _validate_profile_field(name: str, value, tweets_text: str) -> tuple[object, str | None]:
+    """Check one field of a structured answer.
+
+    Returns (cleaned value, None) when it is usable, or (None, reason).
+    Sample tweets that don't appear verbatim in the content are dropped.
+    """
+    bounds = PROFILE_FIELDS[name][1]
+    if bounds is None:
+        if not isinstance(value, str) or not value.strip():
+            return None, "expected a non-empty string"
+        if len(value) > MAX_TEXT_FIELD_CHARS:
+            return None, f"expected at most {MAX_TEXT_FIELD_CHARS} characters"
+        return value.strip(), None
+
+    if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+        return None, "expected an array of strings"
+    items = [v.strip() for v in value if v.strip()]
+    if name == "sample_tweets":
+        items = [v for v in items if v in tweets_text]
+    low, high = bounds
+    if not low <= len(items) <= high:
+        qualifier = " copied exactly from the content" if name == "sample_tweets" else ""
+        return None, f"expected {low}-{high} items{qualifier}, got {len(items)}"
+    return items, None
+
+
+def validate_profile(answer: dict, fields: list[str], tweets_text: str) -> tuple[dict, dict[str, str]]:
+    """Check the given fields of a profile tool answer.
+
+    Returns (cleaned values of the valid fields, reason per invalid field).
+    """
+    profile, errors = {}, {}
+    for name in fields:
+        value, error = _validate_profile_field(name, answer.get(name), tweets_text)
+        if error:
+            errors[name] = error
+        else:
+            profile[name] = value
+    return profile, errors
+
+
+def structured_batch_request(content: dict) -> tuple[dict, str, str]:
+    """Messages API parameters for a one-shot structured extraction.
+
+    Used to submit extractions through a message batch instead of live
+    calls. Returns (params, tweets_text to validate the answer against,
+    step cache key); the key is the one the live structured call's first
+    attempt uses, so a stored batch answer is reused by later live runs.
+    """
+    tweets_text = _tweets_text(content, get_settings().extraction_sample_tokens)
+    text = tweets_text[:8000]
+    tool = _profile_tool(list(PROFILE_FIELDS))
+    params = {
+        "model": EXTRACTION_MODEL,
+        "max_tokens": MAX_OUTPUT_TOKENS,
+        "system": STRUCTURED_INSTRUCTIONS,
+        "messages": [{"role": "user", "content": text}],
+        "tools": [tool],
+        "tool_choice": {"type": "tool", "name": PROFILE_TOOL_NAME},
+    }
+    return params, tweets_text, step_key(EXTRACTION_MODEL, [STRUCTURED_INSTRUCTIONS, text], tool)
+
+
 class ExtractionAgent:
     """LangGraph agent for extracting personality from social media content."""
 
     def __init__(self):
         settings = get_settings()
         self.llm = ChatAnthropic(
-            model="claude-sonnet-4-20250514",
+            model=EXTRACTION_MODEL,
             anthropic_api_key=settings.anthropic_api_key,
         )
+        self.use_cache = settings.extraction_cache_enabled
         self.graph = self._build_graph()
 
     def _build_graph(self) -> StateGraph:
         """Build the extraction pipeline graph."""
         workflow = StateGraph(ExtractionState)
 
-        # Add nodes
-        workflow.add_node("process_content", self._process_content)
-        workflow.add_node("extract_traits", self._extract_traits)
-        workflow.add_node("extract_interests", self._extract_interests)
-        workflow.add_node("extract_communication_style", self._extract_communication_style)
-        workflow.add_node("extract_values", self._extract_values)
-        workflow.add_node("select_sample_tweets", self._select_sample_tweets)
-        workflow.add_node("generate_summary", self._generate_summary)
+        nodes = {
+            "process_content": self._process_content,
+            "extract_traits": self._extract_traits,
+            "extract_interests": self._extract_interests,
+            "extract_communication_style": self._extract_communication_style,
+            "extract_values": self._extract_values,
+            "select_sample_tweets": self._select_sample_tweets,
+            "generate_summary": self._generate_summary,
+        }
+        for name, node in nodes.items():
+            workflow.add_node(name, self._timed(name, node))
 
-        # Add edges
+        # Fan out to the independent extraction steps, then join once all
+        # of them have finished
         workflow.set_entry_point("process_content")
-        workflow.add_edge("process_content", "extract_traits")
-        workflow.add_edge("extract_traits", "extract_interests")
-        workflow.add_edge("extract_interests", "extract_communication_style")
-        workflow.add_edge("extract_communication_style", "extract_values")
-        workflow.add_edge("extract_values", "select_sample_tweets")
-        workflow.add_edge("select_sample_tweets", "generate_summary")
+        for node in EXTRACTION_NODES:
+            workflow.add_edge("process_content", node)
+        workflow.add_edge(list(EXTRACTION_NODES), "generate_summary")
         workflow.add_edge("generate_summary", END)
 
         return workflow.compile()
 
-    def _process_content(self, state: ExtractionState) -> ExtractionState:
+    async def _invoke(
+        self,
+        step: str,
+        messages: list,
+        tool: dict | None = None,
+        cache_if: Callable[[object], object] = bool,
+    ):
+        """Call the model, or reuse the stored output of an identical call.
+
+        Returns (output, input_tokens): the response text, or the tool call
+        arguments when ``tool`` is given (the call is forced to use it).
+        Outputs for which ``cache_if`` is falsy, e.g. unparseable answers,
+        are not stored. Cache hits report 0 input tokens.
+        """
+        key = step_key(EXTRACTION_MODEL, [m.content for m in messages], tool)
+        if self.use_cache:
+            output = await get_step_output(key, step)
+            if output is not None:
+                return output, 0
+
+        if tool:
+            response = await self.llm.bind_tools([tool], tool_choice=tool["name"]).ainvoke(messages)
+            output = response.tool_calls[0]["args"] if response.tool_calls else {}
+        else:
+            response = await self.llm.ainvoke(messages)
+            output = response.content
+        input_tokens = _input_tokens(response)
+
+        if self.use_cache and cache_if(output):
+            await store_step_output(key, step, output, input_tokens)
+        return output, input_tokens
+
+    @staticmethod
+    def _timed(name: str, node):
+        """Wrap a node so its wall-clock time is recorded in node_timings.
+
+        A ``on_node_done(name, progress)`` callable in the run's configurable
+        is told as soon as the node finishes.
+        """
+
+        async def run(state: ExtractionState, config: RunnableConfig) -> dict:
+            start = time.perf_counter()
+            update = await node(state)
+            elapsed = time.perf_counter() - start
+            metrics.observe("extraction_node_seconds", elapsed, node=name)
+            on_node_done = config.get("configurable", {}).get("on_node_done")
+            if on_node_done:
+                on_node_done(name, update.get("progress", 0))
+            return {**update, "node_timings": {name: round(elapsed, 3)}}
+
+        return run
+
+    async def _process_content(self, state: ExtractionState) -> dict:
         """Process raw content into analyzable text."""
-        content = state["content"]
-        tweets = content.get("tweets", [])
+        tweets_text = _tweets_text(state["content"], get_settings().extraction_sample_tokens)
+        return {"tweets_text": tweets_text, "progress": 20}
 
-        # Combine all tweet text
-        tweets_text = "\n\n".join([
-            f"Tweet: {t.get('text', '')}"
-            for t in tweets
-            if t.get("text")
-        ])
-
-        # Add user bio if available
-        user = content.get("user", {})
-        if user.get("description"):
-            tweets_text = f"Bio: {user['description']}\n\n{tweets_text}"
-
-        return {**state, "tweets_text": tweets_text, "progress": 20}
-
-    def _extract_traits(self, state: ExtractionState) -> ExtractionState:
+    async def _extract_traits(self, state: ExtractionState) -> dict:
         """Extract personality traits from content."""
         messages = [
             SystemMessage(content="""You are an expert at analyzing social media content to understand personality traits.
@@ -85,17 +437,14 @@ Focus on genuine personality characteristics, not superficial observations."""),
             HumanMessage(content=state["tweets_text"][:8000]),  # Limit content length
         ]
 
-        response = self.llm.invoke(messages)
-        try:
-            traits = json.loads(response.content)
-            if not isinstance(traits, list):
-                traits = []
-        except json.JSONDecodeError:
-            traits = []
-
-        return {**state, "traits": traits, "progress": 40}
+        output, input_tokens = await self._invoke("extract_traits", messages, cache_if=_parse_json_list)
+        return {
+            "traits": _parse_json_list(output),
+            "progress": 14,
+            "input_tokens": input_tokens,
+        }
 
-    def _extract_interests(self, state: ExtractionState) -> ExtractionState:
+    async def _extract_interests(self, state: ExtractionState) -> dict:
         """Extract interests and topics from content."""
         messages = [
             SystemMessage(content="""You are an expert at analyzing social media content to understand interests.
@@ -105,17 +454,14 @@ Focus on recurring themes and genuine passions."""),
             HumanMessage(content=state["tweets_text"][:8000]),
         ]
 
-        response = self.llm.invoke(messages)
-        try:
-            interests = json.loads(response.content)
-            if not isinstance(interests, list):
-                interests = []
-        except json.JSONDecodeError:
-            interests = []
-
-        return {**state, "interests": interests, "progress": 60}
+        output, input_tokens = await self._invoke("extract_interests", messages, cache_if=_parse_json_list)
+        return {
+            "interests": _parse_json_list(output),
+            "progress": 14,
+            "input_tokens": input_tokens,
+        }
 
-    def _extract_communication_style(self, state: ExtractionState) -> ExtractionState:
+    async def _extract_communication_style(self, state: ExtractionState) -> dict:
         """Analyze communication style."""
         messages = [
             SystemMessage(content="""You are an expert at analyzing communication patterns.
@@ -125,12 +471,16 @@ Return ONLY the description as plain text."""),
             HumanMessage(content=state["tweets_text"][:8000]),
         ]
 
-        response = self.llm.invoke(messages)
-        communication_style = response.content.strip()
+        output, input_tokens = await self._invoke("extract_communication_style", messages, cache_if=str.strip)
+        communication_style = output.strip()
 
-        return {**state, "communication_style": communication_style, "progress": 75}
+        return {
+            "communication_style": communication_style,
+            "progress": 14,
+            "input_tokens": input_tokens,
+        }
 
-    def _extract_values(self, state: ExtractionState) -> ExtractionState:
+    async def _extract_values(self, state: ExtractionState) -> dict:
         """Extract core values."""
         messages = [
             SystemMessage(content="""You are an expert at understanding personal values from social media content.
@@ -140,17 +490,14 @@ Look for what they advocate for, criticize, or repeatedly emphasize."""),
             HumanMessage(content=state["tweets_text"][:8000]),
         ]
 
-        response = self.llm.invoke(messages)
-        try:
-            values = json.loads(response.content)
-            if not isinstance(values, list):
-                values = []
-        except json.JSONDecodeError:
-            values = []
-
-        return {**state, "values": values, "progress": 80}
+        output, input_tokens = await self._invoke("extract_values", messages, cache_if=_parse_json_list)
+        return {
+            "values": _parse_json_list(output),
+            "progress": 14,
+            "input_tokens": input_tokens,
+        }
 
-    def _select_sample_tweets(self, state: ExtractionState) -> ExtractionState:
+    async def _select_sample_tweets(self, state: ExtractionState) -> dict:
         """Select representative sample tweets that best capture language style."""
         messages = [
             SystemMessage(content="""You are an expert at analyzing writing style and voice.
@@ -161,17 +508,14 @@ Return ONLY a JSON array of the selected tweet strings, exactly as written."""),
             HumanMessage(content=state["tweets_text"][:8000]),
         ]
 
-        response = self.llm.invoke(messages)
-        try:
-            sample_tweets = json.loads(response.content)
-            if not isinstance(sample_tweets, list):
-                sample_tweets = []
-        except json.JSONDecodeError:
-            sample_tweets = []
-
-        return {**state, "sample_tweets": sample_tweets, "progress": 90}
+        output, input_tokens = await self._invoke("select_sample_tweets", messages, cache_if=_parse_json_list)
+        return {
+            "sample_tweets": _parse_json_list(output),
+            "progress": 14,
+            "input_tokens": input_tokens,
+        }
 
-    def _generate_summary(self, state: ExtractionState) -> ExtractionState:
+    async def _generate_summary(self, state: ExtractionState) -> dict:
         """Generate a cohesive personality summary."""
         context = f"""
 Traits: {', '.join(state['traits'])}
@@ -191,13 +535,172 @@ Write in third person, as if describing someone to a friend."""),
             HumanMessage(content=context),
         ]
 
-        response = self.llm.invoke(messages)
-        summary = response.content.strip()
+        output, input_tokens = await self._invoke("generate_summary", messages, cache_if=str.strip)
+        summary = output.strip()
 
-        return {**state, "summary": summary, "progress": 100}
+        return {"summary": summary, "progress": 10, "input_tokens": input_tokens}
+
+    async def _extract_structured(self, content: dict) -> tuple[dict, int]:
+        """Extract the whole profile with one tool call. Returns (profile, prompt tokens)."""
+        tweets_text = _tweets_text(content, get_settings().extraction_sample_tokens)
+        return await self._record_profile(
+            "structured",
+            STRUCTURED_INSTRUCTIONS,
+            tweets_text[:8000],
+            tweets_text,
+        )
+
+    async def _record_profile(self, step: str, instructions: str, text: str, tweets_text: str) -> tuple[dict, int]:
+        """Ask for the profile through the profile tool until every field validates.
+
+        Only the fields that fail are asked for again. Fields still invalid
+        after the last attempt fall back to empty values, like a failed JSON
+        parse does in the graph. Sample tweets are checked against
+        ``tweets_text``. Returns (profile, prompt tokens used).
+        """
+        profile: dict = {}
+        errors: dict[str, str] = {}
+        fields = list(PROFILE_FIELDS)
+        input_tokens = 0
+
+        for attempt in range(STRUCTURED_MAX_ATTEMPTS):
+            prompt = instructions
+            if errors:
+                problems = "\n".join(f"- {name}: {reason}" for name, reason in errors.items())
+                prompt += f"""
+A previous answer had invalid fields. Provide only these, fixing the problems:
+{problems}"""
+
+            answer, tokens = await self._invoke(
+                step,
+                [SystemMessage(content=prompt), HumanMessage(content=text)],
+                tool=_profile_tool(fields),
+                # Keep only complete answers, so a re-run doesn't replay a bad one
+                cache_if=lambda answer: not validate_profile(answer, fields, tweets_text)[1],
+            )
+            input_tokens += tokens
+
+            valid, errors = validate_profile(answer, fields, tweets_text)
+            profile.update(valid)
+            if not errors:
+                break
+            logger.info(f"Profile attempt {attempt + 1} had invalid fields: {errors}")
+            metrics.increment("extraction_field_retries", len(errors))
+            fields = list(errors)
+
+        for name in errors:
+            profile[name] = [] if PROFILE_FIELDS[name][1] else ""
+        return {name: profile[name] for name in PROFILE_FIELDS}, input_tokens
+
+    async def _extract_map_reduce(
+        self, content: dict, on_progress: Callable[[str, int], None] | None = None
+    ) -> tuple[dict, int]:
+        """Profile the full corpus: partial signals per batch, then one reduce call.
+
+        The corpus is split into batches of about extraction_batch_tokens;
+        at most extraction_map_concurrency batch calls run at once. Their
+        signals are tallied into a bounded summary, so the reduce prompt
+        stays the same size however many batches there are.
+        Returns (profile, prompt tokens).
+        """
+        settings = get_settings()
+        tweets_text = _tweets_text(content)
+        batches = _split_batches(tweets_text, settings.extraction_batch_tokens)
+        metrics.observe("extraction_map_batches", len(batches))
+        semaphore = asyncio.Semaphore(settings.extraction_map_concurrency)
+        done = 0
+
+        async def map_batch(batch: str) -> tuple[dict, int]:
+            nonlocal done
+            async with semaphore:
+                answer, tokens = await self._invoke(
+                    "map",
+                    [
+                        SystemMessage(content="""You are an expert at analyzing social media content to understand someone's personality,
+interests, values and voice. The following is one part of this person's posts. Record the signals
+this part shows with the record_partial_signals tool; leave a field empty if this part says nothing about it."""),
+                        HumanMessage(content=batch),
+                    ],
+                    tool=_signals_tool(),
+                )
+            done += 1
+            if on_progress:
+                on_progress("map", MAP_PROGRESS * done // len(batches))
+            return _clean_signals(answer, batch), tokens
+
+        results = await asyncio.gather(*(map_batch(b) for b in batches), return_exceptions=True)
+        failures = [r for r in results if isinstance(r, BaseException)]
+        partials = [r for r in results if not isinstance(r, BaseException)]
+        if failures:
+            logger.warning(f"{len(failures)} of {len(batches)} extraction batches failed: {failures[0]}")
+            metrics.increment("extraction_map_failures", len(failures))
+        if not partials:
+            raise failures[0] if failures else ValueError("No content to extract from")
+
+        profile, reduce_tokens = await self._record_profile(
+            "reduce",
+            """You are an expert at understanding people from their social media. Below are signals extracted
+from every part of one person's posts, with how many parts each appeared in. Combine them into one
+profile of this person with the record_personality_profile tool. Weigh recurring signals over one-offs,
+and pick sample tweets only from the candidates, copied exactly.""",
+            _reduce_input(content, [signals for signals, _ in partials]),
+            tweets_text,
+        )
+        if on_progress:
+            on_progress("reduce", 100)
+        return profile, sum(tokens for _, tokens in partials) + reduce_tokens
+
+    async def extract(
+        self,
+        content: dict,
+        mode: str | None = None,
+        on_progress: Callable[[str, int], None] | None = None,
+    ) -> dict:
+        """Run the extraction pipeline.
+
+        ``mode`` is one of EXTRACTION_MODES and defaults to the
+        ``extraction_mode`` setting. ``on_progress(step, percent)`` is
+        called as steps finish (per graph node, per map batch, or once for
+        the single structured call).
+        """
+        mode = mode or get_settings().extraction_mode
+        if mode not in EXTRACTION_MODES:
+            raise ValueError(f"Unknown extraction mode: {mode}")
+
+        try:
+            start = time.perf_counter()
+            timings = {}
+            if mode == "structured":
+                profile, input_tokens = await self._extract_structured(content)
+                if on_progress:
+                    on_progress("structured", 100)
+            elif mode == "map_reduce":
+                profile, input_tokens = await self._extract_map_reduce(content, on_progress)
+            else:
+                profile, input_tokens, timings = await self._extract_graph(content, on_progress)
+            elapsed = time.perf_counter() - start
+            metrics.observe("extraction_seconds", elapsed, mode=mode)
+            metrics.observe("extraction_input_tokens", input_tokens, mode=mode)
+            logger.info(
+                f"{mode.capitalize()} extraction finished in {elapsed:.2f}s "
+                f"using {input_tokens} input tokens; node timings: {timings}"
+            )
+            return profile
+        except Exception as e:
+            return {"error": str(e)}
+
+    async def _extract_graph(
+        self, content: dict, on_progress: Callable[[str, int], None] | None = None
+    ) -> tuple[dict, int, dict[str, float]]:
+        """Run the per-field graph. Returns (profile, prompt tokens, node timings)."""
+        done = 0
+
+        def node_done(name: str, progress: int) -> None:
+            nonlocal done
+            done += progress
+            if on_progress:
+                on_progress(name, done)
 
-    async def extract(self, content: dict) -> dict:
-        """Run the extraction pipeline."""
         initial_state: ExtractionState = {
             "content": content,
             "tweets_text": "",
@@ -208,18 +711,11 @@ Write in third person, as if describing someone to a friend."""),
             "sample_tweets": [],
             "summary": "",
             "progress": 0,
+            "node_timings": {},
+            "input_tokens": 0,
             "error": None,
         }
 
-        try:
-            result = self.graph.invoke(initial_state)
-            return {
-                "traits": result["traits"],
-                "interests": result["interests"],
-                "communication_style": result["communication_style"],
-                "values": result["values"],
-                "sample_tweets": result["sample_tweets"],
-                "summary": result["summary"],
-            }
-        except Exception as e:
-            return {"error": str(e)}
+        result = await self.graph.ainvoke(initial_state, {"configurable": {"on_node_done": node_done}})
+        profile = {name: result[name] for name in PROFILE_FIELDS}
+        return profile, result["input_tokens"], result["node_timings"]
@@ -0,0 +1,140 @@
+import hashlib
+import html
+import math
+import re
+
+from tokens import estimate_tokens
+
+_URL = re.compile(r"https?://\S+")
+_LEADING_MENTIONS = re.compile(r"^(?:@\w+\s+)+")
+_MENTION = re.compile(r"@\w+")
+_SPACE = re.compile(r"\s+")
+_WORD = re.compile(r"\w+")
+
+# Tweets with fewer words than this after normalization carry little signal
+MIN_WORDS = 4
+# SimHash distance (of 64 bits) at or below which two tweets count as near-duplicates
+NEAR_DUPLICATE_BITS = 3
+# Tweets picked from one conversation, so one long thread can't fill the sample
+MAX_PER_CONVERSATION = 2
+# Time slices the sample is spread across, so it isn't all from one week
+TIME_BUCKETS = 8
+
+
+def normalize_tweet(text: str) -> str:
+    """Strip what says nothing about the author: links, reply prefixes, handles."""
+    text = html.unescape(text)
+    text = _URL.sub("", text)
+    text = _LEADING_MENTIONS.sub("", text.strip())
+    text = _MENTION.sub("@user", text)
+    return _SPACE.sub(" ", text).strip()
+
+
+def _stable_hash(value: str) -> int:
+    # Python's hash() is salted per process; samples must be reproducible so
+    # identical input keeps hitting the extraction cache
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+
+def _simhash(words: list[str]) -> int:
+    weights = [0] * 64
+    for shingle in (" ".join(words[i:i + 2]) for i in range(max(len(words) - 1, 1))):
+        h = _stable_hash(shingle)
+        for bit in range(64):
+            weights[bit] += 1 if h >> bit & 1 else -1
+    return sum(1 << bit for bit in range(64) if weights[bit] > 0)
+
+
+def dedupe_tweets(tweets: list[dict]) -> list[dict]:
+    """Normalize tweets and drop empty, exact-duplicate and near-duplicate ones.
+
+    Returns copies with ``text`` normalized, in the original order. Exact
+    duplicates are found by hashing the lowercased text; near-duplicates
+    (templated posts, lightly edited reposts) by SimHash, comparing only
+    tweets that share one of four 16-bit bands of the fingerprint.
+    """
+    seen_exact = set()
+    bands: dict[tuple[int, int], list[int]] = {}
+    kept = []
+    for tweet in tweets:
+        text = normalize_tweet(tweet.get("text") or "")
+        words = _WORD.findall(text.lower())
+        if not words:
+            continue
+        exact = hashlib.sha256(" ".join(words).encode()).hexdigest()
+        if exact in seen_exact:
+            continue
+        seen_exact.add(exact)
+
+        fingerprint = _simhash(words)
+        keys = [(band, fingerprint >> (band * 16) & 0xFFFF) for band in range(4)]
+        if any(
+            bin(fingerprint ^ other).count("1") <= NEAR_DUPLICATE_BITS
+            for key in keys
+            for other in bands.get(key, ())
+        ):
+            continue
+        for key in keys:
+            bands.setdefault(key, []).append(fingerprint)
+        kept.append({**tweet, "text": text})
+    return kept
+
+
+def _score(tweet: dict, author_id: str | None) -> float:
+    """Higher for tweets that say more about the author."""
+    m = tweet.get("public_metrics") or {}
+    engagement = (
+        m.get("like_count", 0)
+        + 2 * m.get("retweet_count", 0)
+        + 2 * m.get("quote_count", 0)
+        + m.get("reply_count", 0)
+    )
+    words = len(tweet["text"].split())
+    score = math.log1p(engagement) + math.log(words)
+    reply_to = tweet.get("in_reply_to_user_id")
+    if reply_to and reply_to != author_id:
+        # Replies to others lean on context we don't have; self-replies are threads
+        score *= 0.5
+    return score
+
+
+def _created_at(tweet: dict) -> str:
+    return tweet.get("created_at") or ""
+
+
+def sample_tweets(tweets: list[dict], token_budget: int, author_id: str | None = None) -> list[dict]:
+    """Pick a diverse, high-signal subset of deduplicated tweets within a token budget.
+
+    Short tweets are skipped. The rest are ranked by engagement
+    (public_metrics), length and whether they reply to someone else, then
+    taken round-robin across time slices, at most MAX_PER_CONVERSATION per
+    conversation, until the budget is spent. Returned newest first.
+    """
+    candidates = [t for t in tweets if len(t["text"].split()) >= MIN_WORDS]
+    candidates.sort(key=_created_at)
+    if not candidates:
+        return []
+
+    size = math.ceil(len(candidates) / TIME_BUCKETS)
+    buckets = [
+        sorted(candidates[i:i + size], key=lambda t: _score(t, author_id), reverse=True)
+        for i in range(0, len(candidates), size)
+    ]
+
+    picked = []
+    per_conversation: dict[str, int] = {}
+    used = 0
+    while any(buckets) and used < token_budget:
+        for bucket in buckets:
+            while bucket:
+                tweet = bucket.pop(0)
+                conversation = tweet.get("conversation_id") or tweet.get("id")
+                cost = estimate_tokens(tweet["text"]) + 3  # "Tweet: " prefix and separator
+                if per_conversation.get(conversation, 0) >= MAX_PER_CONVERSATION or used + cost > token_budget:
+                    continue
+                per_conversation[conversation] = per_conversation.get(conversation, 0) + 1
+                picked.append(tweet)
+                used += cost
+                break
+    picked.sort(key=_created_at, reverse=True)
+    return picked
@@ -0,0 +1,283 @@
+"""Operator endpoints, enabled by setting ADMIN_API_KEY.
+
+Batch re-extraction: after extraction prompts change, every ready substrate
+is re-profiled through message batches (see services/message_batches.py)
+rather than one live extraction job each. Submission, polling and writing
+results back all run on the job queue.
+"""
+import hmac
+import logging
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from pydantic import BaseModel
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import metrics
+from agents.extraction_agent import PROFILE_FIELDS, PROFILE_TOOL_NAME, structured_batch_request, validate_profile
+from config import get_settings
+from db import get_db
+from models import (
+    ExtractionBatch,
+    ExtractionBatchItem,
+    ExtractionBatchStatus,
+    SocialAccount,
+    Substrate,
+    SubstrateStatus,
+)
+from services import enqueue, get_batch_client, job_handler, load_archived_content, periodic_task, store_step_outputs
+
+logger = logging.getLogger(__name__)
+
+# Substrates whose archived content is loaded at a time while building a batch
+CONTENT_PAGE_SIZE = 100
+# Results written back per bulk UPDATE
+APPLY_PAGE_SIZE = 500
+
+
+async def require_admin(x_admin_key: str = Header("")):
+    expected = get_settings().admin_api_key
+    if not expected or not hmac.compare_digest(x_admin_key, expected):
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+
+class BatchExtractionRequest(BaseModel):
+    substrate_ids: Optional[list[str]] = None  # Default: every ready substrate
+
+
+@router.post("/extraction-batches")
+async def start_batch_extraction(
+    request: BatchExtractionRequest,
+    db: AsyncSession = Depends(get_db),
+):
+    """Re-extract ready substrates through message batches.
+
+    Profiles are replaced once each batch has been processed, usually
+    within an hour; progress is listed by GET /admin/extraction-batches.
+    """
+    job = await enqueue(db, "extraction_batch_submit", {"substrate_ids": request.substrate_ids})
+    await db.commit()
+    return {"message": "Batch extraction queued", "job_id": job.id}
+
+
+@router.get("/extraction-batches")
+async def list_extraction_batches(
+    limit: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_db),
+):
+    """Most recent extraction batches with their result counts."""
+    result = await db.execute(
+        select(ExtractionBatch).order_by(ExtractionBatch.created_at.desc()).limit(limit)
+    )
+    return [batch.to_dict() for batch in result.scalars().all()]
+
+
+async def _load_contents(db: AsyncSession, substrate_ids: list[str]) -> dict[str, dict]:
+    """Archived tweets and profile per substrate, merged across accounts like run_extraction."""
+    max_tweets = get_settings().extraction_max_tweets
+    accounts = await db.execute(
+        select(SocialAccount).where(
+            SocialAccount.substrate_id.in_(substrate_ids),
+            SocialAccount.platform == "twitter",
+        )
+    )
+    contents: dict[str, dict] = {}
+    for account in accounts.scalars().all():
+        archived = await load_archived_content(db, account, max_tweets)
+        content = contents.setdefault(account.substrate_id, {"tweets": [], "user": {}})
+        content["tweets"].extend(archived["tweets"])
+        if archived["user"]:
+            content["user"] = archived["user"]
+    return contents
+
+
+@job_handler("extraction_batch_submit", workers=1, max_attempts=1, visibility_timeout=1800)
+async def submit_extraction_batch(
+    db: AsyncSession,
+    substrate_ids: Optional[list[str]] = None,
+    after_id: str = "",
+):
+    """Submit one batch of structured extractions, then queue the next.
+
+    Takes up to extraction_batch_max_requests ready substrates ordered by
+    id after ``after_id`` (only ``substrate_ids`` if given). Content comes
+    from the tweet archive, so Twitter isn't called; substrates with no
+    archived tweets are skipped. Not retried, since a retry could submit
+    (and pay for) the same batch twice.
+    """
+    settings = get_settings()
+    query = (
+        select(Substrate.id)
+        .where(Substrate.status == SubstrateStatus.READY, Substrate.id > after_id)
+        .order_by(Substrate.id)
+        .limit(settings.extraction_batch_max_requests)
+    )
+    if substrate_ids is not None:
+        query = query.where(Substrate.id.in_(substrate_ids))
+    ids = list((await db.execute(query)).scalars().all())
+    if not ids:
+        return
+
+    requests = []
+    items = []
+    for start in range(0, len(ids), CONTENT_PAGE_SIZE):
+        page = ids[start:start + CONTENT_PAGE_SIZE]
+        contents = await _load_contents(db, page)
+        for substrate_id in page:
+            content = contents.get(substrate_id)
+            if not content or not content["tweets"]:
+                continue
+            params, tweets_text, cache_key = structured_batch_request(content)
+            requests.append({"custom_id": substrate_id, "params": params})
+            items.append(ExtractionBatchItem(substrate_id=substrate_id, tweets_text=tweets_text, cache_key=cache_key))
+
+    if requests:
+        provider_batch_id = await get_batch_client().submit(requests)
+        batch = ExtractionBatch(provider_batch_id=provider_batch_id, request_count=len(requests))
+        db.add(batch)
+        await db.flush()
+        for item in items:
+            item.batch_id = batch.id
+        db.add_all(items)
+        metrics.increment("extraction_batch_requests", len(requests))
+        logger.info(f"Submitted extraction batch {batch.id} ({provider_batch_id}) with {len(requests)} requests")
+
+    if len(ids) == settings.extraction_batch_max_requests:
+        await enqueue(db, "extraction_batch_submit", {"substrate_ids": substrate_ids, "after_id": ids[-1]})
+    await db.commit()
+
+
+@periodic_task("extraction_batch_poll", interval=get_settings().extraction_batch_poll_seconds)
+async def _poll_extraction_batches(db: AsyncSession):
+    """Queue the write-back of batches the provider has finished."""
+    result = await db.execute(
+        select(ExtractionBatch.id, ExtractionBatch.provider_batch_id).where(
+            ExtractionBatch.status == ExtractionBatchStatus.PROCESSING
+        )
+    )
+    client = get_batch_client()
+    for row in result.all():
+        try:
+            status = await client.status(row.provider_batch_id)
+        except Exception as e:
+            logger.warning(f"Could not check extraction batch {row.id}: {e}")
+            continue
+        if not status.ended:
+            continue
+        # Another process polling the same batch loses the compare-and-set
+        claimed = await db.execute(
+            update(ExtractionBatch)
+            .where(ExtractionBatch.id == row.id, ExtractionBatch.status == ExtractionBatchStatus.PROCESSING)
+            .values(status=ExtractionBatchStatus.ENDED, ended_at=datetime.utcnow())
+        )
+        if claimed.rowcount == 1:
+            await enqueue(db, "extraction_batch_apply", {"batch_id": row.id})
+
+
+async def _apply_page(db: AsyncSession, batch_id: str, page: list[tuple[str, dict]], counts: dict[str, int]) -> None:
+    """Validate one page of results and write the valid profiles with one UPDATE."""
+    ids = [custom_id for custom_id, _ in page]
+    items = {
+        item.substrate_id: item
+        for item in (await db.execute(
+            select(ExtractionBatchItem).where(
+                ExtractionBatchItem.batch_id == batch_id,
+                ExtractionBatchItem.substrate_id.in_(ids),
+            )
+        )).scalars().all()
+    }
+    # Substrates deleted or being re-extracted live since submission are left alone
+    ready = set((await db.execute(
+        select(Substrate.id).where(Substrate.id.in_(ids), Substrate.status == SubstrateStatus.READY)
+    )).scalars().all())
+
+    updates = []
+    cache_entries = []
+    for custom_id, result in page:
+        item = items.get(custom_id)
+        if item is None:
+            continue
+        if result["type"] != "succeeded":
+            counts["failed"] += 1
+            continue
+        message = result["message"]
+        answer = next(
+            (block["input"] for block in message["content"]
+             if block["type"] == "tool_use" and block["name"] == PROFILE_TOOL_NAME),
+            {},
+        )
+        profile, errors = validate_profile(answer, list(PROFILE_FIELDS), item.tweets_text)
+        if errors:
+            # Keeps its current profile; re-run it live or in a later batch
+            logger.info(f"Batch profile for substrate {custom_id} had invalid fields: {errors}")
+            counts["invalid"] += 1
+            continue
+        input_tokens = (message.get("usage") or {}).get("input_tokens", 0)
+        metrics.increment("extraction_batch_input_tokens", input_tokens)
+        cache_entries.append((item.cache_key, answer, input_tokens))
+        if custom_id in ready:
+            updates.append({"b_id": custom_id, "b_profile": {name: profile[name] for name in PROFILE_FIELDS}})
+
+    if updates:
+        substrates = Substrate.__table__
+        await db.execute(
+            update(substrates)
+            .where(substrates.c.id == bindparam("b_id"), substrates.c.status == SubstrateStatus.READY)
+            .values(personality_profile=bindparam("b_profile"), updated_at=datetime.utcnow()),
+            updates,
+        )
+        counts["applied"] += len(updates)
+    if get_settings().extraction_cache_enabled:
+        await store_step_outputs(db, "structured", cache_entries)
+    await db.commit()
+
+
+async def _apply_failed(batch_id: str, error: str, db: AsyncSession):
+    """Mark a batch failed once its write-back job gives up."""
+    await db.execute(
+        update(ExtractionBatch)
+        .where(ExtractionBatch.id == batch_id)
+        .values(status=ExtractionBatchStatus.FAILED, last_error=error)
+    )
+    await db.commit()
+
+
+@job_handler("extraction_batch_apply", on_failure=_apply_failed, workers=1, visibility_timeout=1800)
+async def apply_extraction_batch(batch_id: str, db: AsyncSession):
+    """Write a finished batch's profiles back in bulk.
+
+    Results are streamed in pages of APPLY_PAGE_SIZE, each written with
+    one executemany UPDATE. Answers failing profile validation, and
+    requests that errored or expired, leave the substrate's current
+    profile in place. Valid answers also go into the step cache, so a
+    later live structured extraction of the same content is free. Safe to
+    retry: writing the same results again changes nothing.
+    """
+    batch = await db.get(ExtractionBatch, batch_id)
+    if batch is None or batch.status != ExtractionBatchStatus.ENDED:
+        return
+
+    counts = {"applied": 0, "invalid": 0, "failed": 0}
+    page = []
+    async for custom_id, result in get_batch_client().results(batch.provider_batch_id):
+        page.append((custom_id, result))
+        if len(page) >= APPLY_PAGE_SIZE:
+            await _apply_page(db, batch_id, page, counts)
+            page = []
+    if page:
+        await _apply_page(db, batch_id, page, counts)
+
+    for result, count in counts.items():
+        metrics.increment("extraction_batch_results", count, result=result)
+    batch.applied_count = counts["applied"]
+    batch.invalid_count = counts["invalid"]
+    batch.failed_count = counts["failed"]
+    batch.status = ExtractionBatchStatus.APPLIED
+    batch.applied_at = datetime.utcnow()
+    await db.commit()
+    logger.info(f"Applied extraction batch {batch_id}: {counts}")
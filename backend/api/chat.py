@@ -3,6 +3,7 @@ import uuid
 from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from pydantic import BaseModel
@@ -41,7 +42,12 @@ async def send_chat_message(
     voice: bool = Query(False),
     db: AsyncSession = Depends(get_db),
 ):
-    """Send a message to chat with a substrate."""
+    """Send a message to chat with a substrate.
+
+    With ``voice=true`` the reply's speech is included as base64 MP3; to
+    start playback sooner, stream it from
+    GET /substrates/{id}/chat/messages/{message_id}/speech instead.
+    """
     # Get substrate
     result = await db.execute(
         select(Substrate).where(Substrate.id == substrate_id)
@@ -127,7 +133,7 @@ async def send_chat_message(
             raise HTTPException(status_code=400, detail="Voice is not ready")
         try:
             service = VoiceService()
-            response.audio_base64 = service.text_to_speech_base64(
+            response.audio_base64 = await service.text_to_speech_base64(
                 substrate.voice_id, response_content
             )
         except Exception as e:
@@ -137,6 +143,55 @@ async def send_chat_message(
     return response
 
 
+@router.get("/substrates/{substrate_id}/chat/messages/{message_id}/speech")
+async def stream_message_speech(
+    substrate_id: str,
+    message_id: str,
+    db: AsyncSession = Depends(get_db),
+):
+    """Speak an assistant message in the substrate's cloned voice, as streamed MP3.
+
+    Audio is relayed chunk by chunk as ElevenLabs synthesizes it, so
+    nothing is buffered here and playback can start before it finishes.
+    """
+    result = await db.execute(
+        select(Substrate).where(Substrate.id == substrate_id)
+    )
+    substrate = result.scalar_one_or_none()
+    if not substrate:
+        raise HTTPException(status_code=404, detail="Substrate not found")
+    if substrate.voice_status != VoiceStatus.READY or not substrate.voice_id:
+        raise HTTPException(status_code=400, detail="Voice is not ready")
+
+    message_result = await db.execute(
+        select(ChatMessage)
+        .join(ChatSession, ChatMessage.session_id == ChatSession.id)
+        .where(
+            ChatMessage.id == message_id,
+            ChatMessage.role == MessageRole.ASSISTANT,
+            ChatSession.substrate_id == substrate_id,
+        )
+    )
+    message = message_result.scalar_one_or_none()
+    if not message:
+        raise HTTPException(status_code=404, detail="Message not found")
+
+    chunks = VoiceService().stream_speech(substrate.voice_id, message.content)
+    # Wait for the first chunk so a failed synthesis is still an HTTP error
+    try:
+        first = await anext(chunks, b"")
+    except Exception as e:
+        logger.error(f"TTS failed for substrate {substrate_id}: {e}")
+        raise HTTPException(status_code=502, detail="Speech synthesis failed")
+
+    async def body():
+        yield first
+        async for chunk in chunks:
+            yield chunk
+
+    return StreamingResponse(body(), media_type="audio/mpeg")
+
+
 @router.get("/substrates/{substrate_id}/chat/history", response_model=list[ChatMessageResponse])
 async def get_chat_history(
     substrate_id: str,
@@ -1,19 +1,34 @@
+import asyncio
 import logging
+import os
+import random
+import time
 import uuid
+from datetime import datetime, timedelta
+from itertools import islice
 
 import anthropic
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import func, select, update
 from pydantic import BaseModel
 from typing import Optional
+import events
+import metrics
 from config import get_settings
 from db import get_db
+from fetchers import fetch_url_content, iter_file_text
+from fetchers.file_text import SUPPORTED_EXTENSIONS
 from models import Substrate, Knowledge, KnowledgeSourceType, KnowledgeStatus
-from vectorstore import chunk_text, add_knowledge_chunks, delete_knowledge_chunks
+from services import PermanentJobError, enqueue, job_handler, periodic_task, get_url_content
+from vectorstore import chunk_text, iter_chunks, add_knowledge_chunks, delete_knowledge_chunks, sync_knowledge_chunks
+from .uploads import receive_upload, upload_path
 
 logger = logging.getLogger(__name__)
 
+# Uploaded documents can be huge; only their beginning is stored in the DB
+FILE_CONTENT_PREVIEW_CHARS = 2000
+
 router = APIRouter(tags=["knowledge"])
 
 
@@ -21,6 +36,11 @@ class AddKnowledgeRequest(BaseModel):
     source_type: str  # "url" or "text"
     content: str
     title: Optional[str] = None
+    refresh_interval_hours: Optional[int] = None  # URL only; re-check the page periodically
+
+
+class UpdateKnowledgeRequest(BaseModel):
+    refresh_interval_hours: Optional[int] = None  # None turns refreshing off
 
 
 class KnowledgeResponse(BaseModel):
@@ -33,6 +53,8 @@ class KnowledgeResponse(BaseModel):
     chunk_count: int
     status: str
     error_message: Optional[str] = None
+    refresh_interval_hours: Optional[int] = None
+    next_refresh_at: Optional[str] = None
     created_at: str
     updated_at: str
 
@@ -95,8 +117,64 @@ URL: {url}""",
     return {"title": title, "content": content, "error": None}
 
 
+async def _extract_url_content(url: str) -> dict:
+    """Tiered URL extraction: local HTML parsing first, Claude web_fetch as fallback.
+
+    Plain article pages are handled locally in well under a second; only
+    pages whose local extraction scores below url_local_min_quality
+    (JS-rendered, paywalled, link-heavy) pay for a Haiku call. URLs refused
+    for pointing at a non-public address fail without the fallback.
+    """
+    settings = get_settings()
+
+    start = time.perf_counter()
+    local = await fetch_url_content(url, max_bytes=settings.url_fetch_max_bytes)
+    local_seconds = time.perf_counter() - start
+    if not local["error"] and local["quality"] >= settings.url_local_min_quality:
+        metrics.increment("url_extraction_tier", tier="local")
+        metrics.observe("url_extraction_seconds", local_seconds, tier="local")
+        logger.info(f"Extracted {url} locally (quality {local['quality']}, {local_seconds:.2f}s)")
+        return local
+    if local.get("blocked"):
+        return local
+
+    start = time.perf_counter()
+    fetched = await _fetch_url_with_claude(url)
+    claude_seconds = time.perf_counter() - start
+    metrics.increment("url_extraction_tier", tier="claude")
+    metrics.observe("url_extraction_seconds", claude_seconds, tier="claude")
+    logger.info(
+        f"Extracted {url} with Claude ({claude_seconds:.2f}s); local extraction "
+        f"{'failed: ' + local['error'] if local['error'] else 'scored ' + str(local['quality'])}"
+    )
+    return fetched
+
+
+async def _url_knowledge_failed(knowledge_id: str, url: str, substrate_id: str, error: str, db: AsyncSession):
+    """Mark a URL knowledge entry failed once its job gives up."""
+    result = await db.execute(
+        select(Knowledge).where(Knowledge.id == knowledge_id)
+    )
+    knowledge = result.scalar_one_or_none()
+    if knowledge:
+        knowledge.status = KnowledgeStatus.FAILED
+        knowledge.error_message = error
+        await db.commit()
+        events.publish(substrate_id, "knowledge", events.knowledge_event(knowledge))
+
+
+def _vectorize_text(substrate_id: str, knowledge_id: str, content: str) -> int:
+    """Chunk and embed text, replacing chunks left by an interrupted earlier attempt.
+
+    Blocking (CPU-bound embedding); run it in a thread. Returns the chunk count.
+    """
+    delete_knowledge_chunks(knowledge_id, substrate_id)
+    return add_knowledge_chunks(substrate_id, knowledge_id, chunk_text(content))
+
+
+@job_handler("url_knowledge", on_failure=_url_knowledge_failed, workers=4)
 async def _process_url_knowledge(knowledge_id: str, url: str, substrate_id: str, db: AsyncSession):
-    """Background task to fetch URL content and vectorize it."""
+    """Job handler to fetch URL content and vectorize it."""
     result = await db.execute(
         select(Knowledge).where(Knowledge.id == knowledge_id)
     )
@@ -105,38 +183,194 @@ async def _process_url_knowledge(knowledge_id: str, url: str, substrate_id: str,
     if not knowledge:
         return
 
-    try:
-        fetched = await _fetch_url_with_claude(url)
+    # Shared across substrates; only re-extracts when the page changed
+    fetched = await get_url_content(url, _extract_url_content)
 
-        if fetched["error"]:
-            knowledge.status = KnowledgeStatus.FAILED
-            knowledge.error_message = fetched["error"]
-            await db.commit()
-            return
+    if fetched["error"]:
+        raise PermanentJobError(fetched["error"])
 
-        knowledge.content = fetched["content"]
-        if fetched["title"] and not knowledge.title:
-            knowledge.title = fetched["title"]
+    knowledge.content = fetched["content"]
+    knowledge.content_hash = fetched["content_hash"]
+    if fetched["title"] and not knowledge.title:
+        knowledge.title = fetched["title"]
 
-        # Chunk and vectorize
-        chunks = chunk_text(fetched["content"])
-        count = add_knowledge_chunks(substrate_id, knowledge_id, chunks)
+    count = await asyncio.to_thread(_vectorize_text, substrate_id, knowledge_id, fetched["content"])
 
-        knowledge.chunk_count = count
-        knowledge.status = KnowledgeStatus.READY
-        await db.commit()
+    knowledge.chunk_count = count
+    knowledge.status = KnowledgeStatus.READY
+    await db.commit()
+    events.publish(substrate_id, "knowledge", events.knowledge_event(knowledge))
+
+
+def _next_refresh_at(interval_hours: int) -> datetime:
+    # +/-10% jitter so entries added together drift apart instead of
+    # refreshing in lockstep forever
+    return datetime.utcnow() + timedelta(hours=interval_hours * random.uniform(0.9, 1.1))
+
+
+def _validate_refresh_interval(interval_hours: Optional[int]) -> None:
+    minimum = get_settings().knowledge_refresh_min_interval_hours
+    if interval_hours is not None and interval_hours < minimum:
+        raise HTTPException(status_code=400, detail=f"refresh_interval_hours must be at least {minimum}")
 
-    except Exception as e:
+
+@periodic_task("url_refresh_scan", interval=get_settings().knowledge_refresh_scan_seconds)
+async def _schedule_url_refreshes(db: AsyncSession):
+    """Queue refresh jobs for URL entries that are due, at a bounded rate."""
+    settings = get_settings()
+    window = settings.knowledge_refresh_scan_seconds
+    limit = max(1, settings.knowledge_refresh_max_per_minute * window // 60)
+
+    due = await db.execute(
+        select(Knowledge.id, Knowledge.next_refresh_at, Knowledge.refresh_interval_hours)
+        .where(
+            Knowledge.refresh_interval_hours.is_not(None),
+            Knowledge.next_refresh_at <= datetime.utcnow(),
+            Knowledge.status == KnowledgeStatus.READY,
+        )
+        .order_by(Knowledge.next_refresh_at)
+        .limit(limit)
+    )
+    for row in due.all():
+        # Claim the entry by moving its schedule; another process that read
+        # the same row loses the compare-and-set and skips it
+        claimed = await db.execute(
+            update(Knowledge)
+            .where(Knowledge.id == row.id, Knowledge.next_refresh_at == row.next_refresh_at)
+            .values(next_refresh_at=_next_refresh_at(row.refresh_interval_hours), updated_at=Knowledge.updated_at)
+        )
+        if claimed.rowcount != 1:
+            continue
+        # Spread the batch over the scan window so embedding load stays smooth
+        await enqueue(db, "url_refresh", {"knowledge_id": row.id}, delay=random.uniform(0, window))
+
+
+@job_handler("url_refresh", workers=1)
+async def _refresh_url_knowledge(knowledge_id: str, db: AsyncSession):
+    """Job handler to re-check a URL entry and re-embed only what changed."""
+    result = await db.execute(
+        select(Knowledge).where(Knowledge.id == knowledge_id)
+    )
+    knowledge = result.scalar_one_or_none()
+    if not knowledge or not knowledge.refresh_interval_hours or knowledge.status != KnowledgeStatus.READY:
+        return
+
+    # Conditional GET against the shared cache first; the page is only
+    # re-extracted when its validators changed
+    fetched = await get_url_content(knowledge.source_url, _extract_url_content, revalidate=True)
+    if fetched["error"]:
+        # Keep serving the last good content; the next scheduled refresh retries
+        metrics.increment("knowledge_refresh", result="error")
+        logger.warning(f"Refresh of {knowledge.source_url} failed: {fetched['error']}")
+        return
+
+    if fetched["content_hash"] == knowledge.content_hash:
+        metrics.increment("knowledge_refresh", result="unchanged")
+        return
+
+    chunks = chunk_text(fetched["content"])
+    changes = await asyncio.to_thread(
+        sync_knowledge_chunks, knowledge.substrate_id, knowledge_id, chunks, fetched["content_hash"][:12]
+    )
+
+    knowledge.content = fetched["content"]
+    knowledge.content_hash = fetched["content_hash"]
+    knowledge.chunk_count = len(chunks)
+    await db.commit()
+    events.publish(knowledge.substrate_id, "knowledge", events.knowledge_event(knowledge))
+
+    metrics.increment("knowledge_refresh", result="changed")
+    metrics.increment("knowledge_refresh_chunks", changes["added"], change="added")
+    metrics.increment("knowledge_refresh_chunks", changes["removed"], change="removed")
+    metrics.increment("knowledge_refresh_chunks", changes["kept"], change="kept")
+    logger.info(f"Refreshed {knowledge.source_url}: {changes}")
+
+
+def _ingest_file(substrate_id: str, knowledge_id: str, path: str) -> tuple[int, str]:
+    """Stream a document through the chunker and embedder in batches.
+
+    Runs in a worker thread. Returns (chunk_count, content_preview).
+    """
+    batch_size = get_settings().knowledge_ingest_batch_size
+    preview = []
+    preview_chars = 0
+
+    def pieces():
+        nonlocal preview_chars
+        for piece in iter_file_text(path):
+            if preview_chars < FILE_CONTENT_PREVIEW_CHARS:
+                preview.append(piece[:FILE_CONTENT_PREVIEW_CHARS - preview_chars])
+                preview_chars += len(preview[-1])
+            yield piece
+
+    chunks = iter_chunks(pieces())
+    count = 0
+    while batch := list(islice(chunks, batch_size)):
+        count += add_knowledge_chunks(substrate_id, knowledge_id, batch, start_index=count)
+    return count, "".join(preview).strip()
+
+
+async def _file_knowledge_failed(knowledge_id: str, path: str, substrate_id: str, error: str, db: AsyncSession):
+    """Mark an uploaded document failed and drop the file once its job gives up."""
+    path = upload_path(path)
+    if os.path.exists(path):
+        os.remove(path)
+    delete_knowledge_chunks(knowledge_id, substrate_id)
+    result = await db.execute(
+        select(Knowledge).where(Knowledge.id == knowledge_id)
+    )
+    knowledge = result.scalar_one_or_none()
+    if knowledge:
         knowledge.status = KnowledgeStatus.FAILED
-        knowledge.error_message = str(e)
+        knowledge.error_message = error
         await db.commit()
+        events.publish(substrate_id, "knowledge", events.knowledge_event(knowledge))
+
+
+@job_handler("file_knowledge", on_failure=_file_knowledge_failed, workers=2, visibility_timeout=1800)
+async def _process_file_knowledge(knowledge_id: str, path: str, substrate_id: str, db: AsyncSession):
+    """Job handler to extract, chunk and vectorize an uploaded document.
+
+    ``path`` names the file in the shared upload directory.
+    """
+    path = upload_path(path)
+    result = await db.execute(
+        select(Knowledge).where(Knowledge.id == knowledge_id)
+    )
+    knowledge = result.scalar_one_or_none()
+
+    if not knowledge:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    if not os.path.exists(path):
+        raise PermanentJobError("Uploaded file is no longer available")
+
+    # Clear chunks left by an interrupted earlier attempt
+    delete_knowledge_chunks(knowledge_id, substrate_id)
+    start = time.perf_counter()
+    try:
+        count, preview = await asyncio.to_thread(_ingest_file, substrate_id, knowledge_id, path)
+    except ValueError as e:
+        raise PermanentJobError(str(e))
+    metrics.observe("knowledge_file_ingest_seconds", time.perf_counter() - start)
+
+    if count == 0:
+        raise PermanentJobError("No text could be extracted from the file")
+
+    knowledge.content = preview
+    knowledge.chunk_count = count
+    knowledge.status = KnowledgeStatus.READY
+    await db.commit()
+    events.publish(substrate_id, "knowledge", events.knowledge_event(knowledge))
+
+    os.remove(path)
 
 
 @router.post("/substrates/{substrate_id}/knowledge", response_model=KnowledgeResponse)
 async def add_knowledge(
     substrate_id: str,
     request: AddKnowledgeRequest,
-    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db),
 ):
     """Add a knowledge entry to a substrate."""
@@ -153,6 +387,9 @@ async def add_knowledge(
         raise HTTPException(status_code=400, detail="source_type must be 'url' or 'text'")
 
     source_type = KnowledgeSourceType(request.source_type)
+    if request.refresh_interval_hours is not None and source_type != KnowledgeSourceType.URL:
+        raise HTTPException(status_code=400, detail="Only URL knowledge can be refreshed")
+    _validate_refresh_interval(request.refresh_interval_hours)
 
     knowledge = Knowledge(
         id=str(uuid.uuid4()),
@@ -160,7 +397,10 @@ async def add_knowledge(
         source_type=source_type,
         source_url=request.content if source_type == KnowledgeSourceType.URL else None,
         title=request.title,
+        refresh_interval_hours=request.refresh_interval_hours,
     )
+    if request.refresh_interval_hours:
+        knowledge.next_refresh_at = _next_refresh_at(request.refresh_interval_hours)
 
     if source_type == KnowledgeSourceType.TEXT:
         # Process text inline — chunk and vectorize immediately
@@ -170,15 +410,68 @@ async def add_knowledge(
         knowledge.chunk_count = count
         knowledge.status = KnowledgeStatus.READY
     else:
-        # URL: process in background
+        # URL: process in a background job
         knowledge.status = KnowledgeStatus.PROCESSING
 
     db.add(knowledge)
+    if source_type == KnowledgeSourceType.URL:
+        await enqueue(db, "url_knowledge", {
+            "knowledge_id": knowledge.id,
+            "url": request.content,
+            "substrate_id": substrate_id,
+        })
     await db.commit()
     await db.refresh(knowledge)
+    events.publish(substrate_id, "knowledge", events.knowledge_event(knowledge))
 
-    if source_type == KnowledgeSourceType.URL:
-        background_tasks.add_task(_process_url_knowledge, knowledge.id, request.content, substrate_id, db)
+    return KnowledgeResponse(**knowledge.to_dict())
+
+
+@router.post("/substrates/{substrate_id}/knowledge/upload", response_model=KnowledgeResponse)
+async def upload_knowledge(
+    substrate_id: str,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+):
+    """Add a text, Markdown or PDF document to a substrate.
+
+    Expects multipart/form-data with a ``file`` part and an optional
+    ``title`` field. The file is streamed to disk and ingested in the
+    background.
+    """
+    result = await db.execute(
+        select(Substrate).where(Substrate.id == substrate_id)
+    )
+    if not result.scalar_one_or_none():
+        raise HTTPException(status_code=404, detail="Substrate not found")
+
+    upload = await receive_upload(
+        request,
+        "file",
+        max_bytes=get_settings().knowledge_upload_max_bytes,
+        allowed_extensions=SUPPORTED_EXTENSIONS,
+    )
+    if upload.size == 0:
+        os.remove(upload.path)
+        raise HTTPException(status_code=400, detail="Uploaded file is empty")
+    metrics.observe("knowledge_upload_bytes", upload.size)
+
+    knowledge = Knowledge(
+        id=str(uuid.uuid4()),
+        substrate_id=substrate_id,
+        source_type=KnowledgeSourceType.FILE,
+        title=upload.fields.get("title") or upload.filename,
+        status=KnowledgeStatus.PROCESSING,
+    )
+    db.add(knowledge)
+    await enqueue(db, "file_knowledge", {
+        "knowledge_id": knowledge.id,
+        "path": upload.name,
+        "substrate_id": substrate_id,
+    })
+    await db.commit()
+    await db.refresh(knowledge)
+    events.publish(substrate_id, "knowledge", events.knowledge_event(knowledge))
 
     return KnowledgeResponse(**knowledge.to_dict())
 
@@ -196,14 +489,69 @@ async def list_knowledge(
     if not result.scalar_one_or_none():
         raise HTTPException(status_code=404, detail="Substrate not found")
 
+    # The preview is cut in SQL so full documents never leave the database
     entries_result = await db.execute(
-        select(Knowledge)
+        select(
+            Knowledge.id,
+            Knowledge.substrate_id,
+            Knowledge.source_type,
+            Knowledge.source_url,
+            Knowledge.title,
+            func.substr(Knowledge.content, 1, Knowledge.CONTENT_PREVIEW_CHARS).label("content"),
+            Knowledge.chunk_count,
+            Knowledge.status,
+            Knowledge.error_message,
+            Knowledge.refresh_interval_hours,
+            Knowledge.next_refresh_at,
+            Knowledge.created_at,
+            Knowledge.updated_at,
+        )
         .where(Knowledge.substrate_id == substrate_id)
         .order_by(Knowledge.created_at.desc())
     )
-    entries = entries_result.scalars().all()
 
-    return [KnowledgeResponse(**e.to_dict()) for e in entries]
+    return [
+        KnowledgeResponse(**{
+            **row._mapping,
+            "source_type": row.source_type.value,
+            "status": row.status.value,
+            "next_refresh_at": row.next_refresh_at.isoformat() if row.next_refresh_at else None,
+            "created_at": row.created_at.isoformat(),
+            "updated_at": row.updated_at.isoformat(),
+        })
+        for row in entries_result.all()
+    ]
+
+
+@router.patch("/substrates/{substrate_id}/knowledge/{knowledge_id}", response_model=KnowledgeResponse)
+async def update_knowledge(
+    substrate_id: str,
+    knowledge_id: str,
+    request: UpdateKnowledgeRequest,
+    db: AsyncSession = Depends(get_db),
+):
+    """Turn periodic refresh of a URL knowledge entry on, off, or change its interval."""
+    result = await db.execute(
+        select(Knowledge).where(
+            Knowledge.id == knowledge_id,
+            Knowledge.substrate_id == substrate_id,
+        )
+    )
+    knowledge = result.scalar_one_or_none()
+    if not knowledge:
+        raise HTTPException(status_code=404, detail="Knowledge entry not found")
+    if knowledge.source_type != KnowledgeSourceType.URL:
+        raise HTTPException(status_code=400, detail="Only URL knowledge can be refreshed")
+    _validate_refresh_interval(request.refresh_interval_hours)
+
+    knowledge.refresh_interval_hours = request.refresh_interval_hours
+    knowledge.next_refresh_at = (
+        _next_refresh_at(request.refresh_interval_hours) if request.refresh_interval_hours else None
+    )
+    await db.commit()
+    await db.refresh(knowledge)
+
+    return KnowledgeResponse(**knowledge.to_dict())
 
 
 @router.delete("/substrates/{substrate_id}/knowledge/{knowledge_id}")
@@ -223,11 +571,13 @@ async def delete_knowledge(
     if not knowledge:
         raise HTTPException(status_code=404, detail="Knowledge entry not found")
 
-    # Delete from ChromaDB
-    delete_knowledge_chunks(knowledge_id)
+    # Delete from the vector store
+    delete_knowledge_chunks(knowledge_id, substrate_id)
 
     # Delete from DB
+    deleted = {**events.knowledge_event(knowledge), "status": "deleted"}
     await db.delete(knowledge)
     await db.commit()
+    events.publish(substrate_id, "knowledge", deleted)
 
     return {"status": "deleted", "id": knowledge_id}
@@ -1,20 +1,28 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import and_, delete, or_, select, update
 from pydantic import BaseModel
 from config import get_settings
 from db import get_db
-from models import Substrate, SocialAccount
-import httpx
+from models import ArchivedTweet, Substrate, SocialAccount
+from http_clients import get_client
+from services import (
+    PermanentJobError,
+    TokenRefreshRejected,
+    enqueue,
+    get_state_store,
+    job_handler,
+    periodic_task,
+    refresh_access_token,
+    store_tokens,
+)
+import random
 import secrets
 from urllib.parse import urlencode
 from datetime import datetime, timedelta
 
 router = APIRouter(prefix="/oauth", tags=["oauth"])
 
-# In-memory state store (use Redis in production)
-oauth_states: dict[str, dict] = {}
-
 
 class OAuthCallbackRequest(BaseModel):
     code: str
@@ -43,18 +51,7 @@ async def twitter_authorize(
     state = f"twitter:{substrate_id}:{nonce}"
 
     # Store state for verification
-    oauth_states[state] = {
-        "substrate_id": substrate_id,
-        "created_at": datetime.utcnow(),
-    }
-
-    # Clean up old states (older than 10 minutes)
-    cutoff = datetime.utcnow() - timedelta(minutes=10)
-    oauth_states_to_remove = [
-        k for k, v in oauth_states.items() if v["created_at"] < cutoff
-    ]
-    for k in oauth_states_to_remove:
-        del oauth_states[k]
+    await get_state_store().put(state, {"substrate_id": substrate_id}, settings.oauth_state_ttl_seconds)
 
     # Build authorization URL
     # Twitter OAuth 2.0 with PKCE
@@ -82,10 +79,10 @@ async def twitter_callback(
     settings = get_settings()
 
     # Verify state
-    if request.state not in oauth_states:
+    state_data = await get_state_store().pop(request.state)
+    if state_data is None:
         raise HTTPException(status_code=400, detail="Invalid or expired state")
 
-    state_data = oauth_states.pop(request.state)
     substrate_id = state_data["substrate_id"]
 
     # Parse state to get nonce for PKCE
@@ -95,43 +92,39 @@ async def twitter_callback(
     nonce = state_parts[2]
 
     # Exchange code for tokens
-    async with httpx.AsyncClient() as client:
-        token_response = await client.post(
-            "https://api.twitter.com/2/oauth2/token",
-            data={
-                "grant_type": "authorization_code",
-                "code": request.code,
-                "redirect_uri": settings.twitter_redirect_uri,
-                "code_verifier": nonce,
-                "client_id": settings.twitter_client_id,
-            },
-            auth=(settings.twitter_client_id, settings.twitter_client_secret),
-        )
-
-        if token_response.status_code != 200:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Failed to exchange code: {token_response.text}",
-            )
+    client = get_client("twitter")
+    token_response = await client.post(
+        "https://api.twitter.com/2/oauth2/token",
+        data={
+            "grant_type": "authorization_code",
+            "code": request.code,
+            "redirect_uri": settings.twitter_redirect_uri,
+            "code_verifier": nonce,
+            "client_id": settings.twitter_client_id,
+        },
+        auth=(settings.twitter_client_id, settings.twitter_client_secret),
+    )
 
-        tokens = token_response.json()
+    if token_response.status_code != 200:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Failed to exchange code: {token_response.text}",
+        )
 
+    tokens = token_response.json()
     access_token = tokens.get("access_token")
-    refresh_token = tokens.get("refresh_token")
-    expires_in = tokens.get("expires_in", 7200)
 
     # Get user info
-    async with httpx.AsyncClient() as client:
-        user_response = await client.get(
-            "https://api.twitter.com/2/users/me",
-            headers={"Authorization": f"Bearer {access_token}"},
-            params={"user.fields": "id,username,name,profile_image_url"},
-        )
+    user_response = await client.get(
+        "https://api.twitter.com/2/users/me",
+        headers={"Authorization": f"Bearer {access_token}"},
+        params={"user.fields": "id,username,name,profile_image_url"},
+    )
 
-        if user_response.status_code != 200:
-            raise HTTPException(status_code=400, detail="Failed to get user info")
+    if user_response.status_code != 200:
+        raise HTTPException(status_code=400, detail="Failed to get user info")
 
-        user_data = user_response.json().get("data", {})
+    user_data = user_response.json().get("data", {})
 
     # Check if account already exists
     result = await db.execute(
@@ -143,13 +136,19 @@ async def twitter_callback(
     existing_account = result.scalar_one_or_none()
 
     if existing_account:
+        if existing_account.platform_user_id != user_data.get("id"):
+            # A different Twitter user: the archived tweets are someone else's
+            await db.execute(
+                delete(ArchivedTweet).where(ArchivedTweet.social_account_id == existing_account.id)
+            )
+            existing_account.since_id = None
+            existing_account.tweets_synced_at = None
+            existing_account.profile = None
+
         # Update existing account
         existing_account.platform_user_id = user_data.get("id")
         existing_account.username = user_data.get("username")
-        existing_account.set_access_token(access_token)
-        if refresh_token:
-            existing_account.set_refresh_token(refresh_token)
-        existing_account.token_expires_at = datetime.utcnow() + timedelta(seconds=expires_in)
+        store_tokens(existing_account, tokens)
         account = existing_account
     else:
         # Create new account
@@ -158,14 +157,77 @@ async def twitter_callback(
             platform="twitter",
             platform_user_id=user_data.get("id"),
             username=user_data.get("username"),
-            token_expires_at=datetime.utcnow() + timedelta(seconds=expires_in),
         )
-        account.set_access_token(access_token)
-        if refresh_token:
-            account.set_refresh_token(refresh_token)
+        store_tokens(account, tokens)
         db.add(account)
 
     await db.commit()
     await db.refresh(account)
 
     return account.to_dict()
+
+
+# A claimed refresh that didn't complete is picked up again after this
+REFRESH_RETRY_SECONDS = 300
+
+
+@job_handler("token_refresh", workers=2, max_attempts=1)
+async def refresh_account_token(account_id: str, db: AsyncSession):
+    """Job handler renewing one account's access token.
+
+    Not retried by the queue: a failed refresh stays due and the next
+    scan after REFRESH_RETRY_SECONDS queues it again.
+    """
+    account = await db.get(SocialAccount, account_id)
+    lead = timedelta(seconds=get_settings().oauth_refresh_lead_seconds)
+    if account is None or (
+        account.token_expires_at and account.token_expires_at > datetime.utcnow() + lead
+    ):
+        return  # Gone, or already refreshed since it was queued
+    try:
+        await refresh_access_token(db, account)
+    except TokenRefreshRejected as e:
+        raise PermanentJobError(str(e))
+
+
+@periodic_task("token_refresh_scan", interval=get_settings().oauth_refresh_scan_seconds)
+async def _schedule_token_refreshes(db: AsyncSession):
+    """Queue refresh jobs for access tokens about to expire, at a bounded rate."""
+    settings = get_settings()
+    window = settings.oauth_refresh_scan_seconds
+    limit = max(1, settings.oauth_refresh_max_per_minute * window // 60)
+    now = datetime.utcnow()
+
+    due = await db.execute(
+        select(SocialAccount.id, SocialAccount.token_refresh_at)
+        .where(
+            SocialAccount.encrypted_refresh_token.is_not(None),
+            or_(
+                SocialAccount.token_refresh_at <= now,
+                # Connected before refreshes were scheduled
+                and_(
+                    SocialAccount.token_refresh_at.is_(None),
+                    SocialAccount.token_expires_at <= now + timedelta(seconds=settings.oauth_refresh_lead_seconds),
+                ),
+            ),
+        )
+        .order_by(SocialAccount.token_expires_at)
+        .limit(limit)
+    )
+    for row in due.all():
+        # Claim the account by moving its schedule; another process that read
+        # the same row loses the compare-and-set and skips it
+        claimed = await db.execute(
+            update(SocialAccount)
+            .where(
+                SocialAccount.id == row.id,
+                SocialAccount.token_refresh_at == row.token_refresh_at
+                if row.token_refresh_at
+                else SocialAccount.token_refresh_at.is_(None),
+            )
+            .values(token_refresh_at=now + timedelta(seconds=REFRESH_RETRY_SECONDS))
+        )
+        if claimed.rowcount != 1:
+            continue
+        # Spread the batch over the scan window to stay under Twitter's limits
+        await enqueue(db, "token_refresh", {"account_id": row.id}, delay=random.uniform(0, window))
@@ -1,15 +1,45 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+import asyncio
+import json
+import logging
+import time
+import httpx
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from pydantic import BaseModel
 from typing import Optional
-from db import get_db
-from models import Substrate, SubstrateStatus, SocialAccount
+import events
+from config import get_settings
+from db import async_session, get_db
+from models import Knowledge, Substrate, SubstrateStatus, SocialAccount
 from agents import ExtractionAgent
+from agents.extraction_agent import EXTRACTION_MODES
 from fetchers import TwitterFetcher
+from fetchers.twitter import RateLimitExceeded
+from services import (
+    RetryJobLater,
+    TokenRefreshRejected,
+    enqueue,
+    job_handler,
+    load_archived_content,
+    refresh_access_token,
+    sync_tweet_archive,
+)
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/substrates", tags=["substrates"])
 
+# Traits shown on directory cards
+SUMMARY_TRAITS = 3
+
+# Share of the extraction progress bar covered by the agent's steps; the
+# rest is fetching (up to 30) and saving the profile (100)
+AGENT_PROGRESS_START = 30
+AGENT_PROGRESS_SPAN = 65
+
 
 class CreateSubstrateRequest(BaseModel):
     owner_wallet: str
@@ -17,6 +47,19 @@ class CreateSubstrateRequest(BaseModel):
     bio: Optional[str] = None
 
 
+class SubstrateSummaryResponse(BaseModel):
+    """List view of a substrate; the full personality profile is only on detail reads."""
+    id: str
+    owner_wallet: str
+    display_name: str
+    bio: Optional[str]
+    avatar_url: Optional[str]
+    top_traits: list[str]
+    status: str
+    created_at: str
+    updated_at: str
+
+
 class SubstrateResponse(BaseModel):
     id: str
     owner_wallet: str
@@ -51,22 +94,50 @@ async def create_substrate(
     return SubstrateResponse(**substrate.to_dict())
 
 
-@router.get("", response_model=list[SubstrateResponse])
+@router.get("", response_model=list[SubstrateSummaryResponse])
 async def list_substrates(
     owner_wallet: Optional[str] = None,
     limit: int = 50,
     db: AsyncSession = Depends(get_db),
 ):
     """List all substrates, optionally filtered by owner."""
-    query = select(Substrate).order_by(Substrate.created_at.desc()).limit(limit)
+    # Only the columns the list view shows; of the personality profile just
+    # the traits array is read, inside the database
+    query = (
+        select(
+            Substrate.id,
+            Substrate.owner_wallet,
+            Substrate.display_name,
+            Substrate.bio,
+            Substrate.avatar_url,
+            Substrate.personality_profile["traits"].label("traits"),
+            Substrate.status,
+            Substrate.created_at,
+            Substrate.updated_at,
+        )
+        .order_by(Substrate.created_at.desc())
+        .limit(limit)
+    )
 
     if owner_wallet:
         query = query.where(Substrate.owner_wallet == owner_wallet)
 
     result = await db.execute(query)
-    substrates = result.scalars().all()
 
-    return [SubstrateResponse(**s.to_dict()) for s in substrates]
+    return [
+        SubstrateSummaryResponse(
+            id=row.id,
+            owner_wallet=row.owner_wallet,
+            display_name=row.display_name,
+            bio=row.bio,
+            avatar_url=row.avatar_url,
+            top_traits=(row.traits or [])[:SUMMARY_TRAITS] if isinstance(row.traits, list) else [],
+            status=row.status.value if row.status else None,
+            created_at=row.created_at.isoformat() if row.created_at else None,
+            updated_at=row.updated_at.isoformat() if row.updated_at else None,
+        )
+        for row in result.all()
+    ]
 
 
 @router.get("/{substrate_id}", response_model=SubstrateResponse)
@@ -100,10 +171,97 @@ async def get_substrate_status(
     if not substrate:
         raise HTTPException(status_code=404, detail="Substrate not found")
 
-    return {
-        "status": substrate.status.value if substrate.status else "pending",
-        "progress": int(substrate.extraction_progress or 0),
-    }
+    return events.extraction_event(substrate)
+
+
+async def _status_snapshot(substrate_id: str) -> list[tuple[str, dict]] | None:
+    """Current extraction, voice and knowledge state as events, or None if gone."""
+    async with async_session() as db:
+        substrate = (await db.execute(
+            select(Substrate).where(Substrate.id == substrate_id)
+        )).scalar_one_or_none()
+        if not substrate:
+            return None
+        knowledge = (await db.execute(
+            select(
+                Knowledge.id,
+                Knowledge.status,
+                Knowledge.title,
+                Knowledge.chunk_count,
+                Knowledge.error_message,
+            ).where(Knowledge.substrate_id == substrate_id)
+        )).all()
+
+    return [
+        ("extraction", events.extraction_event(substrate)),
+        ("voice", events.voice_event(substrate)),
+        *(("knowledge", events.knowledge_event(row)) for row in knowledge),
+    ]
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _event_key(event: str, data: dict) -> str:
+    return f"knowledge:{data['id']}" if event == "knowledge" else event
+
+
+@router.get("/{substrate_id}/events")
+async def substrate_events(substrate_id: str):
+    """Server-sent events for a substrate's extraction, voice and knowledge status.
+
+    Opens with the current state of each, then pushes changes as they are
+    committed. Events only arrive from jobs running in this process, so
+    the state is also re-read every events_poll_seconds to catch changes
+    made by worker.py or another API worker.
+    """
+    snapshot = await _status_snapshot(substrate_id)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="Substrate not found")
+
+    settings = get_settings()
+
+    async def stream():
+        loop = asyncio.get_running_loop()
+        with events.subscribe(substrate_id) as queue:
+            last_sent = {}
+            changes = snapshot
+            last_write = loop.time()
+            next_poll = last_write + settings.events_poll_seconds
+            while True:
+                for event, data in changes:
+                    last_sent[_event_key(event, data)] = data
+                    yield _sse(event, data)
+                if changes:
+                    last_write = loop.time()
+
+                wait = min(next_poll, last_write + settings.events_heartbeat_seconds) - loop.time()
+                try:
+                    changes = [await asyncio.wait_for(queue.get(), max(wait, 0.0))]
+                    continue
+                except asyncio.TimeoutError:
+                    changes = []
+
+                if loop.time() >= next_poll:
+                    next_poll = loop.time() + settings.events_poll_seconds
+                    current = await _status_snapshot(substrate_id) or []
+                    keys = {_event_key(e, d) for e, d in current}
+                    changes = [(e, d) for e, d in current if last_sent.get(_event_key(e, d)) != d]
+                    changes += [
+                        ("knowledge", {**data, "status": "deleted"})
+                        for key, data in last_sent.items()
+                        if key.startswith("knowledge:") and key not in keys and data["status"] != "deleted"
+                    ]
+                if not changes and loop.time() >= last_write + settings.events_heartbeat_seconds:
+                    yield ": keepalive\n\n"
+                    last_write = loop.time()
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.get("/{substrate_id}/social-accounts")
@@ -120,8 +278,48 @@ async def get_social_accounts(
     return [a.to_dict() for a in accounts]
 
 
-async def run_extraction(substrate_id: str, db: AsyncSession):
-    """Background task to run personality extraction."""
+async def _extraction_failed(substrate_id: str, error: str, db: AsyncSession):
+    """Mark a substrate failed once its extraction job gives up."""
+    result = await db.execute(
+        select(Substrate).where(Substrate.id == substrate_id)
+    )
+    substrate = result.scalar_one_or_none()
+    if substrate:
+        substrate.status = SubstrateStatus.FAILED
+        await db.commit()
+        events.publish(substrate_id, "extraction", events.extraction_event(substrate))
+
+
+async def _sync_account(account: SocialAccount, max_tweets: int) -> None:
+    """Archive an account's new tweets, in a session of its own so accounts sync concurrently."""
+    fetcher = None
+    try:
+        async with async_session() as session:
+            account = await session.get(SocialAccount, account.id)
+            if account.token_expires_at and account.token_expires_at <= datetime.utcnow() and account.encrypted_refresh_token:
+                # Missed by the refresh scheduler, e.g. while workers were down
+                await refresh_access_token(session, account)
+            access_token = account.get_access_token()
+            if not access_token:
+                return
+            fetcher = TwitterFetcher(access_token)
+            await sync_tweet_archive(session, account, fetcher, max_tweets)
+    except (httpx.HTTPError, TokenRefreshRejected) as e:
+        if not account.tweets_synced_at:
+            raise
+        # Twitter is down, rate limited or the account needs reconnecting; the archive is enough
+        logger.warning(f"Tweet sync for account {account.id} failed, using archive: {e}")
+    if fetcher:
+        logger.info(f"Twitter rate limit budget for account {account.id}: {fetcher.rate_limit_budget()}")
+
+
+@job_handler("extraction", on_failure=_extraction_failed, workers=2, visibility_timeout=900)
+async def run_extraction(substrate_id: str, db: AsyncSession, mode: Optional[str] = None):
+    """Job handler to run personality extraction.
+
+    ``mode`` picks the extraction pipeline (see EXTRACTION_MODES); None uses
+    the configured default.
+    """
     result = await db.execute(
         select(Substrate).where(Substrate.id == substrate_id)
     )
@@ -139,65 +337,96 @@ async def run_extraction(substrate_id: str, db: AsyncSession):
     if not accounts:
         substrate.status = SubstrateStatus.FAILED
         await db.commit()
+        events.publish(substrate_id, "extraction", events.extraction_event(substrate))
         return
 
-    try:
-        # Update status
-        substrate.status = SubstrateStatus.EXTRACTING
-        substrate.extraction_progress = "10"
-        await db.commit()
-
-        # Fetch content from all connected platforms
-        all_content = {"tweets": [], "user": {}}
-
-        for account in accounts:
-            if account.platform == "twitter":
-                access_token = account.get_access_token()
-                if access_token:
-                    fetcher = TwitterFetcher(access_token)
-                    content = await fetcher.get_content_for_extraction()
-                    all_content["tweets"].extend(content.get("tweets", []))
-                    if content.get("user"):
-                        all_content["user"] = content["user"]
-
-        substrate.extraction_progress = "30"
-        await db.commit()
-
-        # Run extraction agent
-        agent = ExtractionAgent()
-        personality_profile = await agent.extract(all_content)
-
-        if "error" in personality_profile:
-            substrate.status = SubstrateStatus.FAILED
-            await db.commit()
-            return
-
-        # Update substrate with results
-        substrate.personality_profile = personality_profile
-        substrate.status = SubstrateStatus.READY
-        substrate.extraction_progress = "100"
-
-        # Update avatar from Twitter if available
-        if all_content["user"].get("profile_image_url"):
-            substrate.avatar_url = all_content["user"]["profile_image_url"].replace(
-                "_normal", ""
-            )
-
-        await db.commit()
+    # Update status
+    substrate.status = SubstrateStatus.EXTRACTING
+    substrate.extraction_progress = "10"
+    await db.commit()
+    events.publish(substrate_id, "extraction", events.extraction_event(substrate))
+
+    # Bring every account's tweet archive up to date at once, then extract from them.
+    # map_reduce reads the corpus in batches, so it takes far more tweets than
+    # the sampling modes.
+    settings = get_settings()
+    if (mode or settings.extraction_mode) == "map_reduce":
+        max_tweets = settings.extraction_map_reduce_max_tweets
+    else:
+        max_tweets = settings.extraction_max_tweets
+    all_content = {"tweets": [], "user": {}}
+
+    twitter_accounts = [a for a in accounts if a.platform == "twitter"]
+    results = await asyncio.gather(
+        *(_sync_account(account, max_tweets) for account in twitter_accounts), return_exceptions=True
+    )
+    errors = [r for r in results if isinstance(r, Exception)]
+    if errors and all(isinstance(e, RateLimitExceeded) for e in errors):
+        # An account without an archive yet hit an exhausted window; the
+        # queue's backoff would give up long before it resets
+        reset_at = max(e.reset_at for e in errors)
+        raise RetryJobLater(str(errors[0]), delay=max(reset_at - time.time(), 0) + 1)
+    if errors:
+        raise errors[0]
+    for account in twitter_accounts:
+        await db.refresh(account)  # Synced in its own session
+        content = await load_archived_content(db, account, max_tweets)
+        all_content["tweets"].extend(content["tweets"])
+        if content["user"]:
+            all_content["user"] = content["user"]
+
+    substrate.extraction_progress = "30"
+    await db.commit()
+    events.publish(substrate_id, "extraction", events.extraction_event(substrate))
+
+    def on_progress(step: str, percent: int) -> None:
+        # Pushed to subscribers only; the stored progress stays coarse
+        events.publish(substrate_id, "extraction", {
+            "status": SubstrateStatus.EXTRACTING.value,
+            "progress": AGENT_PROGRESS_START + AGENT_PROGRESS_SPAN * min(percent, 100) // 100,
+            "node": step,
+        })
+
+    # Run extraction agent
+    agent = ExtractionAgent()
+    personality_profile = await agent.extract(all_content, mode=mode, on_progress=on_progress)
+
+    if "error" in personality_profile:
+        # Raise so the job queue retries with backoff
+        raise RuntimeError(f"Extraction failed: {personality_profile['error']}")
+
+    # Update substrate with results
+    substrate.personality_profile = personality_profile
+    substrate.status = SubstrateStatus.READY
+    substrate.extraction_progress = "100"
+
+    # Update avatar from Twitter if available
+    if all_content["user"].get("profile_image_url"):
+        substrate.avatar_url = all_content["user"]["profile_image_url"].replace(
+            "_normal", ""
+        )
 
-    except Exception as e:
-        print(f"Extraction failed: {e}")
-        substrate.status = SubstrateStatus.FAILED
-        await db.commit()
+    await db.commit()
+    events.publish(substrate_id, "extraction", events.extraction_event(substrate))
 
 
 @router.post("/{substrate_id}/extract")
 async def trigger_extraction(
     substrate_id: str,
-    background_tasks: BackgroundTasks,
+    mode: Optional[str] = Query(None),
     db: AsyncSession = Depends(get_db),
 ):
-    """Trigger personality extraction for a substrate."""
+    """Trigger personality extraction for a substrate.
+
+    ``mode`` (one of EXTRACTION_MODES) overrides the configured extraction
+    pipeline for this run, e.g. to compare their quality and latency.
+    """
+    if mode is not None and mode not in EXTRACTION_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown extraction mode. Use one of: {', '.join(EXTRACTION_MODES)}",
+        )
+
     result = await db.execute(
         select(Substrate).where(Substrate.id == substrate_id)
     )
@@ -222,7 +451,11 @@ async def trigger_extraction(
             detail="No social accounts connected. Please connect at least one account.",
         )
 
-    # Start extraction in background
-    background_tasks.add_task(run_extraction, substrate_id, db)
+    # Queue extraction; marking the substrate now keeps duplicate triggers out
+    substrate.status = SubstrateStatus.EXTRACTING
+    substrate.extraction_progress = "0"
+    await enqueue(db, "extraction", {"substrate_id": substrate_id, "mode": mode})
+    await db.commit()
+    events.publish(substrate_id, "extraction", events.extraction_event(substrate))
 
     return {"message": "Extraction started"}
@@ -0,0 +1,208 @@
+"""Streaming multipart uploads.
+
+FastAPI's ``UploadFile`` parses the whole request body before the endpoint
+runs, so size limits can only be checked once the upload has completed.
+``receive_upload`` parses the multipart stream as it arrives and writes the
+file part straight to disk, rejecting oversized uploads as soon as they
+cross the limit. An optional ``check_head`` callback sees the first bytes
+of the file as soon as they arrive, so uploads of the wrong format are
+rejected before the rest is sent.
+
+Files are written to the ``upload_dir`` setting and handed to jobs by name
+(``StoredUpload.name``), since the job may run in another process that
+mounts the shared directory elsewhere; ``upload_path`` resolves the name.
+"""
+import os
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable
+
+from fastapi import HTTPException, Request
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+from config import get_settings
+
+# Plain form fields (title, ...) are kept in memory; cap them
+MAX_FIELD_BYTES = 64 * 1024
+# Bytes of the file passed to check_head (enough for any magic number)
+HEAD_BYTES = 64
+
+
+@dataclass
+class StoredUpload:
+    path: str
+    filename: str
+    content_type: str
+    size: int
+    fields: dict[str, str] = field(default_factory=dict)
+
+    @property
+    def name(self) -> str:
+        """The file's name within the upload directory, for job payloads."""
+        return os.path.basename(self.path)
+
+
+def upload_dir() -> Path:
+    """Directory uploads are stored in until their job has run."""
+    configured = get_settings().upload_dir
+    path = Path(configured) if configured else Path(tempfile.gettempdir()) / "substrate-uploads"
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def upload_path(name: str) -> str:
+    """Local path of an upload a job payload refers to by name."""
+    return str(upload_dir() / name)
+
+
+class _UploadTooLarge(Exception):
+    pass
+
+
+async def receive_upload(
+    request: Request,
+    file_field: str,
+    max_bytes: int,
+    allowed_extensions: set[str] | None = None,
+    check_head: Callable[[bytes], None] | None = None,
+) -> StoredUpload:
+    """Stream a multipart request's ``file_field`` part to a file in upload_dir().
+
+    Raises HTTPException 413 once the file passes ``max_bytes`` and 400 for
+    malformed requests, a missing file or a disallowed extension.
+    ``check_head(first_bytes)`` is called once with the first HEAD_BYTES
+    of the file (fewer if it is shorter) and may raise HTTPException to
+    abort the upload. The caller owns the returned file and must remove it.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=400, detail="Expected multipart/form-data")
+
+    limit_mb = max_bytes // (1024 * 1024)
+    declared = request.headers.get("content-length")
+    # Allow some room for multipart framing and form fields
+    if declared and declared.isdigit() and int(declared) > max_bytes + MAX_FIELD_BYTES:
+        raise HTTPException(status_code=413, detail=f"Maximum file size: {limit_mb}MB")
+
+    upload: StoredUpload | None = None
+    out = None
+    fields: dict[str, str] = {}
+    part = {"headers": {}, "name": None, "value": bytearray()}
+    header_field = bytearray()
+    header_value = bytearray()
+    head = bytearray()
+    head_checked = check_head is None
+
+    def check(data: bytes) -> None:
+        nonlocal head_checked
+        head.extend(data[:HEAD_BYTES - len(head)])
+        if len(head) >= HEAD_BYTES or not data:
+            head_checked = True
+            check_head(bytes(head))
+
+    def on_part_begin():
+        part.update(headers={}, name=None, value=bytearray())
+
+    def on_header_field(data, start, end):
+        header_field.extend(data[start:end])
+
+    def on_header_value(data, start, end):
+        header_value.extend(data[start:end])
+
+    def on_header_end():
+        part["headers"][bytes(header_field).lower()] = bytes(header_value)
+        header_field.clear()
+        header_value.clear()
+
+    def on_headers_finished():
+        nonlocal upload, out
+        _, disposition = parse_options_header(part["headers"].get(b"content-disposition"))
+        part["name"] = disposition.get(b"name", b"").decode()
+        filename = disposition.get(b"filename")
+        if part["name"] != file_field or filename is None or upload is not None:
+            return
+
+        filename = os.path.basename(filename.decode(errors="replace"))
+        ext = os.path.splitext(filename)[1].lower()
+        if allowed_extensions is not None and ext not in allowed_extensions:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Supported file types: {', '.join(sorted(allowed_extensions))}",
+            )
+        fd, path = tempfile.mkstemp(suffix=ext, dir=upload_dir())
+        out = os.fdopen(fd, "wb")
+        upload = StoredUpload(
+            path=path,
+            filename=filename,
+            content_type=part["headers"].get(b"content-type", b"application/octet-stream").decode(),
+            size=0,
+        )
+
+    def on_part_data(data, start, end):
+        if part["name"] == file_field:
+            if out is None or out.closed:
+                return  # Extra file parts are ignored
+            upload.size += end - start
+            if upload.size > max_bytes:
+                raise _UploadTooLarge()
+            if not head_checked:
+                check(data[start:end])
+            out.write(data[start:end])
+        elif part["name"] != file_field:
+            part["value"].extend(data[start:end])
+            if len(part["value"]) > MAX_FIELD_BYTES:
+                raise HTTPException(status_code=400, detail=f"Form field too large: {part['name']}")
+
+    def on_part_end():
+        if out is not None and part["name"] == file_field:
+            if not head_checked and not out.closed:
+                check(b"")  # File shorter than HEAD_BYTES
+            out.close()
+        elif part["name"]:
+            fields[part["name"]] = part["value"].decode(errors="replace")
+
+    parser = MultipartParser(
+        boundary,
+        callbacks={
+            "on_part_begin": on_part_begin,
+            "on_part_data": on_part_data,
+            "on_part_end": on_part_end,
+            "on_header_field": on_header_field,
+            "on_header_value": on_header_value,
+            "on_header_end": on_header_end,
+            "on_headers_finished": on_headers_finished,
+        },
+    )
+
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+        parser.finalize()
+    except _UploadTooLarge:
+        _discard(out, upload)
+        raise HTTPException(status_code=413, detail=f"Maximum file size: {limit_mb}MB")
+    except HTTPException:
+        _discard(out, upload)
+        raise
+    except Exception:
+        _discard(out, upload)
+        raise HTTPException(status_code=400, detail="Malformed multipart upload")
+
+    if upload is None:
+        raise HTTPException(status_code=400, detail=f"Missing file field: {file_field}")
+    if out is not None and not out.closed:
+        # Stream ended without closing the part
+        _discard(out, upload)
+        raise HTTPException(status_code=400, detail="Malformed multipart upload")
+
+    upload.fields = fields
+    return upload
+
+
+def _discard(out, upload: StoredUpload | None) -> None:
+    if out is not None and not out.closed:
+        out.close()
+    if upload is not None and os.path.exists(upload.path):
+        os.remove(upload.path)
@@ -1,71 +1,161 @@
+import asyncio
 import os
-import tempfile
 import logging
+import struct
 
 import mutagen
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
+import events
+import metrics
 from db import get_db
 from models import Substrate, VoiceStatus
-from services import VoiceService
+from services import VoiceService, PermanentJobError, enqueue, job_handler
+from .uploads import receive_upload, upload_path
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(tags=["voice"])
 
-ALLOWED_CONTENT_TYPES = {
-    "audio/mpeg",
-    "audio/mp3",
-    "audio/wav",
-    "audio/x-wav",
-    "audio/mp4",
-    "audio/x-m4a",
-    "audio/m4a",
-    "audio/webm",
-}
-ALLOWED_EXTENSIONS = {".mp3", ".wav", ".m4a", ".webm"}
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
 MIN_DURATION_SECONDS = 120  # 2 minutes
+# Start of a WebM file searched for its declared duration
+WEBM_HEADER_BYTES = 64 * 1024
 
+# EBML element ids on the path to a WebM file's duration
+_EBML_SEGMENT = 0x18538067
+_EBML_INFO = 0x1549A966
+_EBML_TIMECODE_SCALE = 0x2AD7B1
+_EBML_DURATION = 0x4489
+_EBML_CLUSTER = 0x1F43B675
 
-async def _create_voice_clone(substrate_id: str, audio_path: str, voice_name: str, db: AsyncSession):
-    """Background task to create a voice clone via ElevenLabs."""
+
+def _audio_format(head: bytes) -> str | None:
+    """Identify an upload by its magic number rather than its name or content type."""
+    if head.startswith(b"ID3") or (len(head) > 1 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0):
+        return "mp3"
+    if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+        return "wav"
+    if head[4:8] == b"ftyp":
+        return "m4a"
+    if head.startswith(b"\x1a\x45\xdf\xa3"):
+        return "webm"
+    return None
+
+
+def _check_audio_head(head: bytes) -> None:
+    if _audio_format(head) is None:
+        raise HTTPException(status_code=400, detail="Supported formats: mp3, wav, m4a, webm")
+
+
+def _ebml_vint(data: bytes, pos: int, keep_marker: bool) -> tuple[int, int, bool]:
+    """Read an EBML variable-length integer. Returns (value, next position, all value bits set)."""
+    first = data[pos]
+    length = 9 - first.bit_length()
+    value = first if keep_marker else first & (0xFF >> length)
+    for byte in data[pos + 1:pos + length]:
+        value = value << 8 | byte
+    return value, pos + length, value == (1 << (7 * length)) - 1
+
+
+def _webm_duration(head: bytes) -> float | None:
+    """Duration in seconds declared in a WebM header (Segment > Info), if any.
+
+    Browser recordings (MediaRecorder) are written as a live stream and
+    usually don't declare one.
+    """
+    scale, duration = 1_000_000, None  # Default timecode scale is 1ms
+    pos = 0
     try:
-        service = VoiceService()
-        voice_id = service.create_voice_clone(voice_name, audio_path)
+        while pos < len(head):
+            element, pos, _ = _ebml_vint(head, pos, keep_marker=True)
+            size, pos, unknown_size = _ebml_vint(head, pos, keep_marker=False)
+            if element in (_EBML_SEGMENT, _EBML_INFO):
+                continue  # Read the children in place
+            if element == _EBML_CLUSTER or unknown_size:
+                break  # Media data; the header is over
+            if element == _EBML_TIMECODE_SCALE:
+                scale = int.from_bytes(head[pos:pos + size], "big")
+            elif element == _EBML_DURATION:
+                duration = struct.unpack(">f" if size == 4 else ">d", head[pos:pos + size])[0]
+            pos += size
+    except (IndexError, struct.error):
+        pass
+    return duration * scale / 1e9 if duration else None
 
-        result = await db.execute(
-            select(Substrate).where(Substrate.id == substrate_id)
-        )
-        substrate = result.scalar_one_or_none()
-        if substrate:
-            substrate.voice_id = voice_id
-            substrate.voice_status = VoiceStatus.READY
-            await db.commit()
-    except Exception as e:
-        logger.error(f"Voice clone creation failed for substrate {substrate_id}: {e}")
-        result = await db.execute(
-            select(Substrate).where(Substrate.id == substrate_id)
-        )
-        substrate = result.scalar_one_or_none()
-        if substrate:
-            substrate.voice_status = VoiceStatus.FAILED
-            await db.commit()
-    finally:
-        if os.path.exists(audio_path):
-            os.remove(audio_path)
+
+def _audio_duration(path: str) -> float | None:
+    """Duration from the file's headers, without decoding the audio.
+
+    mutagen reads mp3 (Xing/VBRI header or the first frame's bitrate), wav
+    and m4a headers; WebM headers are parsed here. None if unknown.
+    """
+    with open(path, "rb") as f:
+        head = f.read(WEBM_HEADER_BYTES)
+    if _audio_format(head) == "webm":
+        return _webm_duration(head)
+    info = mutagen.File(path)
+    if info is None or info.info is None:
+        raise ValueError("Unrecognized audio file")
+    return info.info.length
+
+
+async def _voice_clone_failed(substrate_id: str, audio_path: str, voice_name: str, error: str, db: AsyncSession):
+    """Mark the voice failed and drop the upload once the clone job gives up."""
+    logger.error(f"Voice clone creation failed for substrate {substrate_id}: {error}")
+    audio_path = upload_path(audio_path)
+    if os.path.exists(audio_path):
+        os.remove(audio_path)
+    result = await db.execute(
+        select(Substrate).where(Substrate.id == substrate_id)
+    )
+    substrate = result.scalar_one_or_none()
+    if substrate:
+        substrate.voice_status = VoiceStatus.FAILED
+        await db.commit()
+        events.publish(substrate_id, "voice", events.voice_event(substrate))
+
+
+@job_handler("voice_clone", on_failure=_voice_clone_failed, workers=2)
+async def _create_voice_clone(substrate_id: str, audio_path: str, voice_name: str, db: AsyncSession):
+    """Job handler to create a voice clone via ElevenLabs.
+
+    ``audio_path`` names the sample in the shared upload directory.
+    """
+    audio_path = upload_path(audio_path)
+    if not os.path.exists(audio_path):
+        raise PermanentJobError("Uploaded audio is no longer available")
+
+    service = VoiceService()
+    voice_id = await service.create_voice_clone(voice_name, audio_path)
+
+    result = await db.execute(
+        select(Substrate).where(Substrate.id == substrate_id)
+    )
+    substrate = result.scalar_one_or_none()
+    if substrate:
+        substrate.voice_id = voice_id
+        substrate.voice_status = VoiceStatus.READY
+        await db.commit()
+        events.publish(substrate_id, "voice", events.voice_event(substrate))
+
+    os.remove(audio_path)
 
 
 @router.post("/substrates/{substrate_id}/voice")
 async def upload_voice(
     substrate_id: str,
-    background_tasks: BackgroundTasks,
-    audio: UploadFile = File(...),
+    request: Request,
     db: AsyncSession = Depends(get_db),
 ):
-    """Upload audio and create a voice clone for a substrate."""
+    """Upload audio (multipart field ``audio``) and create a voice clone for a substrate.
+
+    The file is streamed to disk and its format checked from the first
+    bytes, so oversized or non-audio uploads are cut off early; memory use
+    doesn't grow with the file size.
+    """
     # Validate substrate exists
     result = await db.execute(
         select(Substrate).where(Substrate.id == substrate_id)
@@ -74,48 +164,29 @@ async def upload_voice(
     if not substrate:
         raise HTTPException(status_code=404, detail="Substrate not found")
 
-    # Validate content type
-    ext = os.path.splitext(audio.filename or "")[1].lower()
-    if audio.content_type not in ALLOWED_CONTENT_TYPES and ext not in ALLOWED_EXTENSIONS:
-        raise HTTPException(
-            status_code=400,
-            detail="Supported formats: mp3, wav, m4a",
-        )
-
-    # Read file and validate size
-    content = await audio.read()
-    if len(content) > MAX_FILE_SIZE:
-        raise HTTPException(status_code=400, detail="Maximum file size: 50MB")
+    # Stream to disk for duration validation and the ElevenLabs upload
+    upload = await receive_upload(request, "audio", max_bytes=MAX_FILE_SIZE, check_head=_check_audio_head)
+    metrics.observe("voice_upload_bytes", upload.size)
 
-    # Save to temp file for duration validation and ElevenLabs upload
-    suffix = ext or ".mp3"
-    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
+    # Validate duration
     try:
-        tmp.write(content)
-        tmp.close()
-
-        # Validate duration
-        audio_info = mutagen.File(tmp.name)
-        if audio_info is None or audio_info.info is None:
-            raise HTTPException(status_code=400, detail="Could not read audio file")
-        if audio_info.info.length < MIN_DURATION_SECONDS:
-            os.remove(tmp.name)
-            raise HTTPException(
-                status_code=400,
-                detail="Audio must be at least 2 minutes",
-            )
-    except HTTPException:
-        raise
+        duration = await asyncio.to_thread(_audio_duration, upload.path)
     except Exception:
-        if os.path.exists(tmp.name):
-            os.remove(tmp.name)
+        os.remove(upload.path)
         raise HTTPException(status_code=400, detail="Could not read audio file")
+    # Browser WebM recordings declare no duration; ElevenLabs checks those itself
+    if duration is not None and duration < MIN_DURATION_SECONDS:
+        os.remove(upload.path)
+        raise HTTPException(
+            status_code=400,
+            detail="Audio must be at least 2 minutes",
+        )
 
     # If substrate already has a voice, delete old one
     if substrate.voice_id:
         try:
             service = VoiceService()
-            service.delete_voice(substrate.voice_id)
+            await service.delete_voice(substrate.voice_id)
         except Exception as e:
             logger.warning(f"Failed to delete old voice {substrate.voice_id}: {e}")
 
@@ -124,10 +195,15 @@ async def upload_voice(
     substrate.voice_status = VoiceStatus.PENDING
     substrate.voice_name = voice_name
     substrate.voice_id = None
-    await db.commit()
 
-    # Kick off background clone creation
-    background_tasks.add_task(_create_voice_clone, substrate_id, tmp.name, voice_name, db)
+    # Queue clone creation
+    await enqueue(db, "voice_clone", {
+        "substrate_id": substrate_id,
+        "audio_path": upload.name,
+        "voice_name": voice_name,
+    })
+    await db.commit()
+    events.publish(substrate_id, "voice", events.voice_event(substrate))
 
     return {"message": "Voice upload received, cloning in progress", "voice_status": "pending"}
 
@@ -145,11 +221,7 @@ async def get_voice_status(
     if not substrate:
         raise HTTPException(status_code=404, detail="Substrate not found")
 
-    return {
-        "voice_status": substrate.voice_status.value if substrate.voice_status else None,
-        "voice_name": substrate.voice_name,
-        "has_voice": substrate.voice_id is not None and substrate.voice_status == VoiceStatus.READY,
-    }
+    return events.voice_event(substrate)
 
 
 @router.delete("/substrates/{substrate_id}/voice")
@@ -171,7 +243,7 @@ async def delete_voice(
     # Delete from ElevenLabs
     try:
         service = VoiceService()
-        service.delete_voice(substrate.voice_id)
+        await service.delete_voice(substrate.voice_id)
     except Exception as e:
         logger.warning(f"Failed to delete voice from ElevenLabs: {e}")
 
@@ -180,5 +252,6 @@ async def delete_voice(
     substrate.voice_status = None
     substrate.voice_name = None
     await db.commit()
+    events.publish(substrate_id, "voice", events.voice_event(substrate))
 
     return {"message": "Voice deleted"}
@@ -0,0 +1,104 @@
+"""Parse time and peak memory of HTML extraction on large pages.
+
+Compares the current lxml single-pass extractor (fetchers.url_fetcher) with
+the previous BeautifulSoup/html.parser approach on synthetic pages with deep
+<article>/<li> nesting. Each run happens in a fresh subprocess so peak RSS
+(ru_maxrss) is per extractor and page size. Prints JSON.
+
+    python benchmarks/html_extraction.py --sizes-mb 1 5 20
+
+The baseline needs beautifulsoup4 installed; it is skipped otherwise.
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def make_page(size_mb: float) -> bytes:
+    """Blog-like page: nav, long article with nested lists, sidebar, scripts."""
+    paragraph = "<p>Roasting coffee at home is mostly about patience and paying attention to <a href='/crack'>first crack</a>. " * 3 + "</p>"
+    section = (
+        "<section><h2>Notes</h2>" + paragraph * 4
+        + "<ul><li><p>Nested list paragraph with detail.</p><ul><li>Inner item</li><li>Another</li></ul></li>"
+        + "<li>Plain item</li></ul><blockquote><p>A quote worth keeping.</p></blockquote></section>"
+        + "<script>window.__data = {" + "\"k\": 1," * 50 + "};</script>"
+    )
+    head = "<html><head><title>Benchmark page</title><style>body{margin:0}</style></head><body><nav>" + "<a href='/x'>Link</a>" * 50 + "</nav><article>"
+    tail = "</article><aside>Related</aside><footer>Footer</footer></body></html>"
+    target = int(size_mb * 1024 * 1024)
+    repeats = max(1, (target - len(head) - len(tail)) // len(section))
+    return (head + section * repeats + tail).encode()
+
+
+def extract_lxml(raw: bytes) -> int:
+    from fetchers.url_fetcher import extract_html
+
+    return len(extract_html(raw)["content"])
+
+
+def extract_bs4(raw: bytes) -> int:
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(raw.decode(), "html.parser")
+    for tag in soup.find_all(["script", "style", "nav", "footer", "header", "aside"]):
+        tag.decompose()
+    parts = []
+    for tag in soup.find_all(["p", "h1", "h2", "h3", "h4", "h5", "h6", "li", "article", "blockquote"]):
+        text = tag.get_text(strip=True)
+        if text:
+            parts.append(text)
+    return len("\n\n".join(parts))
+
+
+EXTRACTORS = {"lxml": extract_lxml, "bs4_html_parser": extract_bs4}
+
+
+def run_one(extractor: str, size_mb: float) -> dict:
+    raw = make_page(size_mb)
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    content_chars = EXTRACTORS[extractor](raw)
+    seconds = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "extractor": extractor,
+        "page_mb": round(len(raw) / 1024 / 1024, 2),
+        "parse_seconds": round(seconds, 3),
+        "peak_rss_mb": round(peak_kb / 1024, 1),
+        "peak_rss_growth_mb": round((peak_kb - baseline_kb) / 1024, 1),
+        "content_chars": content_chars,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes-mb", type=float, nargs="+", default=[1, 5, 20])
+    parser.add_argument("--extractor", choices=list(EXTRACTORS), help="run one extractor in-process")
+    args = parser.parse_args()
+
+    if args.extractor:
+        print(json.dumps(run_one(args.extractor, args.sizes_mb[0])))
+        return
+
+    results = []
+    for size in args.sizes_mb:
+        for extractor in EXTRACTORS:
+            proc = subprocess.run(
+                [sys.executable, __file__, "--extractor", extractor, "--sizes-mb", str(size)],
+                capture_output=True, text=True,
+            )
+            if proc.returncode != 0:
+                results.append({"extractor": extractor, "page_mb": size, "skipped": proc.stderr.strip().splitlines()[-1]})
+                continue
+            results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Retrieval quality and latency benchmark for chunking and query parameters.
+
+Loads a fixed corpus and labelled question set into a temporary vector store
+through the same ``vectorstore`` functions the app uses, sweeps chunking and
+retrieval parameters, and prints one JSON object per configuration:
+recall@k, MRR, prompt tokens contributed, ingest throughput and p50/p99
+query latency.
+
+A question counts as answered at rank r when the r-th returned context
+contains its evidence string. Runs fully offline once the local embedding
+model (all-MiniLM-L6-v2, cached by Chroma under ~/.cache/chroma) is present.
+
+    python benchmarks/retrieval.py --chunk-size 500 1000 --overlap 0 200 --k 3 5
+    python benchmarks/retrieval.py --backend numpy --min-recall 0.8 > results.jsonl
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_CORPUS = Path(__file__).resolve().parent / "data" / "retrieval_corpus.json"
+
+
+def _configure_environment(backend: str) -> None:
+    """Point the vector store at a throwaway directory before it is imported."""
+    os.environ["VECTORSTORE_DATA_PATH"] = tempfile.mkdtemp(prefix="retrieval-bench-")
+    os.environ["VECTORSTORE_MODE"] = "embedded"
+    os.environ["VECTORSTORE_BACKEND"] = backend
+    # Required settings that the vector store never uses
+    os.environ.setdefault("ANTHROPIC_API_KEY", "unused")
+    os.environ.setdefault("TOKEN_ENCRYPTION_KEY", "unused")
+    sys.path.insert(0, str(BACKEND_DIR))
+
+
+def run_config(vectorstore, corpus: dict, chunk_size: int, overlap: int, k: int, fetch_k: int, lambda_mult: float) -> dict:
+    from tokens import estimate_tokens
+
+    # Each configuration gets its own substrate, so they share one store
+    # without seeing each other's chunks.
+    substrate_id = f"bench-cs{chunk_size}-ov{overlap}"
+
+    chunk_count = 0
+    ingest_start = time.perf_counter()
+    for doc in corpus["documents"]:
+        chunks = vectorstore.chunk_text(doc["text"], chunk_size=chunk_size, overlap=overlap)
+        chunk_count += vectorstore.add_knowledge_chunks(substrate_id, doc["id"], chunks)
+    ingest_seconds = time.perf_counter() - ingest_start
+
+    reciprocal_ranks = []
+    hits = 0
+    prompt_tokens = []
+    latencies = []
+    for item in corpus["questions"]:
+        start = time.perf_counter()
+        contexts = vectorstore.query_knowledge(
+            substrate_id, item["question"], k=k, fetch_k=fetch_k, lambda_mult=lambda_mult
+        )
+        latencies.append(time.perf_counter() - start)
+
+        prompt_tokens.append(sum(estimate_tokens(c) for c in contexts))
+        rank = next((i + 1 for i, c in enumerate(contexts) if item["evidence"] in c), None)
+        if rank is not None:
+            hits += 1
+        reciprocal_ranks.append(1 / rank if rank else 0.0)
+
+    for doc in corpus["documents"]:
+        vectorstore.delete_knowledge_chunks(doc["id"], substrate_id)
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "chunk_size": chunk_size,
+        "overlap": overlap,
+        "k": k,
+        "fetch_k": fetch_k,
+        "lambda_mult": lambda_mult,
+        "chunks": chunk_count,
+        "recall_at_k": round(hits / len(corpus["questions"]), 4),
+        "mrr": round(float(np.mean(reciprocal_ranks)), 4),
+        "prompt_tokens_mean": round(float(np.mean(prompt_tokens)), 1),
+        "prompt_tokens_max": int(np.max(prompt_tokens)),
+        "ingest_seconds": round(ingest_seconds, 4),
+        "ingest_chunks_per_second": round(chunk_count / ingest_seconds, 1) if ingest_seconds else None,
+        "query_p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+        "query_p99_ms": round(float(np.percentile(latencies_ms, 99)), 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Sweep chunking/retrieval parameters and report JSON lines")
+    parser.add_argument("--corpus", type=Path, default=DEFAULT_CORPUS)
+    parser.add_argument("--backend", choices=["chroma", "numpy"], default="chroma")
+    parser.add_argument("--chunk-size", type=int, nargs="+", default=[300, 500, 1000])
+    parser.add_argument("--overlap", type=int, nargs="+", default=[0, 100, 200])
+    parser.add_argument("--k", type=int, nargs="+", default=[3, 5])
+    parser.add_argument("--fetch-k", type=int, nargs="+", default=[20])
+    parser.add_argument("--lambda-mult", type=float, nargs="+", default=[0.5, 1.0])
+    parser.add_argument("--min-recall", type=float, default=None, help="exit 1 if any configuration scores below this recall@k")
+    args = parser.parse_args()
+
+    _configure_environment(args.backend)
+    import vectorstore
+
+    corpus = json.loads(args.corpus.read_text())
+
+    worst_recall = 1.0
+    for chunk_size, overlap, k, fetch_k, lambda_mult in itertools.product(
+        args.chunk_size, args.overlap, args.k, args.fetch_k, args.lambda_mult
+    ):
+        if overlap >= chunk_size:
+            continue
+        result = run_config(vectorstore, corpus, chunk_size, overlap, k, max(k, fetch_k), lambda_mult)
+        result["backend"] = args.backend
+        worst_recall = min(worst_recall, result["recall_at_k"])
+        print(json.dumps(result), flush=True)
+
+    if args.min_recall is not None and worst_recall < args.min_recall:
+        print(f"recall@k {worst_recall} below threshold {args.min_recall}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
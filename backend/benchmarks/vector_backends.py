@@ -0,0 +1,142 @@
+"""Compare Chroma (HNSW + metadata filter) against the NumPy exact-search index.
+
+Builds the same synthetic multi-substrate corpus in both backends inside a
+temporary directory and reports ingest time, query latency and resident
+memory as JSON. Each backend runs in its own subprocess so RSS numbers are
+not polluted by the other.
+
+    python benchmarks/vector_backends.py --substrates 50 --chunks 2000
+"""
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+DIM = 384  # all-MiniLM-L6-v2, Chroma's default embedding model
+
+
+def _rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        pages = int(f.read().split()[1])
+    return pages * 4096 / 1024 / 1024
+
+
+def _corpus(substrate: int, chunks: int, rng: np.random.Generator) -> np.ndarray:
+    # Clustered vectors so neighbours are meaningful, like real topic chunks
+    centers = rng.standard_normal((8, DIM)).astype(np.float32)
+    vectors = centers[rng.integers(0, 8, chunks)] + 0.3 * rng.standard_normal((chunks, DIM)).astype(np.float32)
+    return vectors
+
+
+def _percentiles(latencies: list[float]) -> dict:
+    values = np.array(latencies) * 1000
+    return {"p50_ms": float(np.percentile(values, 50)), "p99_ms": float(np.percentile(values, 99))}
+
+
+def run_backend(backend: str, args: argparse.Namespace) -> dict:
+    rng = np.random.default_rng(args.seed)
+    workdir = Path(tempfile.mkdtemp(prefix=f"bench-{backend}-"))
+    rss_start = _rss_mb()
+
+    if backend == "numpy":
+        from numpy_index import NumpyIndex
+
+        index = NumpyIndex(workdir, max_loaded=args.max_loaded)
+
+        def add(substrate_id, ids, vectors, docs, metas):
+            index.add(substrate_id, ids, vectors, docs, metas)
+
+        def query(substrate_id, vector):
+            return index.search(substrate_id, vector, args.k)
+    else:
+        import chromadb
+        from chromadb.config import Settings
+
+        client = chromadb.PersistentClient(path=str(workdir), settings=Settings(anonymized_telemetry=False))
+        collection = client.get_or_create_collection(
+            name="knowledge", metadata={"hnsw:space": "cosine"}, embedding_function=None
+        )
+
+        def add(substrate_id, ids, vectors, docs, metas):
+            for start in range(0, len(ids), 1000):
+                end = start + 1000
+                collection.add(
+                    ids=ids[start:end], embeddings=vectors[start:end], documents=docs[start:end], metadatas=metas[start:end]
+                )
+
+        def query(substrate_id, vector):
+            return collection.query(
+                query_embeddings=[vector.tolist()],
+                n_results=args.k,
+                where={"substrate_id": substrate_id},
+                include=["documents", "metadatas", "distances", "embeddings"],
+            )
+
+    ingest_start = time.perf_counter()
+    for s in range(args.substrates):
+        substrate_id = f"substrate-{s}"
+        vectors = _corpus(s, args.chunks, rng)
+        ids = [f"{substrate_id}-k_{i}" for i in range(args.chunks)]
+        docs = [f"chunk {i} of {substrate_id}" for i in range(args.chunks)]
+        metas = [{"substrate_id": substrate_id, "knowledge_id": "k", "chunk_index": i} for i in range(args.chunks)]
+        add(substrate_id, ids, vectors, docs, metas)
+    ingest_seconds = time.perf_counter() - ingest_start
+
+    # Skewed access: most queries hit a small set of hot substrates
+    hot = max(1, args.substrates // 10)
+    targets = np.where(
+        rng.random(args.queries) < 0.8,
+        rng.integers(0, hot, args.queries),
+        rng.integers(0, args.substrates, args.queries),
+    )
+    queries = rng.standard_normal((args.queries, DIM)).astype(np.float32)
+
+    latencies = []
+    for target, vector in zip(targets, queries):
+        start = time.perf_counter()
+        query(f"substrate-{target}", vector)
+        latencies.append(time.perf_counter() - start)
+
+    return {
+        "backend": backend,
+        "ingest_seconds": round(ingest_seconds, 3),
+        "chunks_per_second": round(args.substrates * args.chunks / ingest_seconds, 1),
+        **{k: round(v, 3) for k, v in _percentiles(latencies).items()},
+        "rss_mb_delta": round(_rss_mb() - rss_start, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--substrates", type=int, default=50)
+    parser.add_argument("--chunks", type=int, default=2000, help="chunks per substrate")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=20, help="candidates per query (fetch_k)")
+    parser.add_argument("--max-loaded", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--backend", choices=["chroma", "numpy"], help="run a single backend in-process")
+    args = parser.parse_args()
+
+    if args.backend:
+        print(json.dumps(run_backend(args.backend, args)))
+        return
+
+    results = []
+    for backend in ("chroma", "numpy"):
+        cmd = [sys.executable, __file__, "--backend", backend] + [
+            arg for arg in sys.argv[1:] if not arg.startswith("--backend")
+        ]
+        output = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    print(json.dumps({"params": {k: v for k, v in vars(args).items() if k != "backend"}, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
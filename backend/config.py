@@ -19,9 +19,120 @@ class Settings(BaseSettings):
     twitter_client_id: str = ""
     twitter_client_secret: str = ""
     twitter_redirect_uri: str = "http://localhost:3000/oauth/callback"
+    # Pending OAuth states: "database" (shared by every API process) or
+    # "memory" (single API process only)
+    oauth_state_store: str = "database"
+    oauth_state_ttl_seconds: int = 600
 
     # Encryption key for OAuth tokens (Fernet key)
     token_encryption_key: str
+    token_cache_ttl_seconds: int = 300  # Decrypted tokens are kept in memory this long
+    # Access tokens (about 2 hours) are renewed with the refresh token this
+    # long before they expire. Each process running job workers scans for
+    # due accounts every scan interval and queues at most max_per_minute
+    # refreshes, spread across the interval.
+    oauth_refresh_lead_seconds: int = 600
+    oauth_refresh_scan_seconds: int = 60
+    oauth_refresh_max_per_minute: int = 60
+
+    # Vector store
+    # "embedded" opens the ChromaDB index in-process (single worker only).
+    # "server" connects to one shared vector store service over HTTP, so
+    # several API workers never open the same SQLite/HNSW files.
+    vectorstore_mode: str = "embedded"
+    vectorstore_data_path: str = ""  # Defaults to backend/chroma_data
+    vectorstore_host: str = "127.0.0.1"
+    vectorstore_port: int = 8001
+    vectorstore_max_connections: int = 20
+    # "chroma" (HNSW) or "numpy" (exact search over per-substrate float16
+    # matrices; faster for Shadows with a few thousand chunks or fewer)
+    vectorstore_backend: str = "chroma"
+    numpy_index_max_substrates: int = 64  # LRU size of memory-mapped matrices
+
+    # Background jobs
+    # Set JOB_WORKERS_ENABLED=false on API-only processes and run worker.py
+    # separately to scale heavy work independently of request handling.
+    job_workers_enabled: bool = True
+    job_concurrency: str = "{}"  # JSON, e.g. {"extraction": 2, "url_knowledge": 4}
+    job_poll_interval: float = 1.0  # seconds
+
+    # Twitter requests wait out an exhausted rate limit window only if it
+    # resets within this; otherwise extraction falls back to archived tweets
+    twitter_rate_limit_max_wait: float = 60.0  # seconds
+
+    # Tweets per account read into an extraction (and the most fetched per
+    # archive sync; later syncs only pull tweets newer than the archive)
+    extraction_max_tweets: int = 500
+
+    # Personality extraction: "graph" (one LLM call per profile field),
+    # "structured" (one tool call for the whole profile) or "map_reduce"
+    # (batches over the whole corpus, then one combining call). Can be
+    # overridden per run with POST /substrates/{id}/extract?mode=...
+    extraction_mode: str = "graph"
+    # Prompt budget for the tweet sample the graph and structured modes
+    # analyze (tweets are deduplicated and sampled for signal and variety)
+    extraction_sample_tokens: int = 1900
+    # "map_reduce" mode: corpus batch size and how many batches are
+    # analyzed at once (calls grow linearly with tweets / batch size)
+    extraction_batch_tokens: int = 6000
+    extraction_map_concurrency: int = 4
+    # Tweets per account for "map_reduce", in place of extraction_max_tweets
+    # (Twitter's timeline only goes back this far anyway)
+    extraction_map_reduce_max_tweets: int = 3200
+    # Per-step LLM results keyed by model + prompt + processed input, so
+    # re-extracting unchanged content (or after editing one prompt) only
+    # pays for the steps whose input changed
+    extraction_cache_enabled: bool = True
+    extraction_cache_ttl_days: int = 30
+    # Batch re-extraction of every ready substrate (POST /admin/extraction-batches):
+    # "anthropic" (Message Batches API) or "local" (in-process stand-in that
+    # answers with live calls; single process only)
+    extraction_batch_backend: str = "anthropic"
+    extraction_batch_max_requests: int = 5000  # Substrates per submitted batch
+    extraction_batch_poll_seconds: int = 60
+
+    # Status event streams (GET /substrates/{id}/events)
+    events_heartbeat_seconds: float = 15.0  # Keep-alive comment when idle
+    # Streams re-read status this often, since changes made by worker.py or
+    # another API worker are only published in that process
+    events_poll_seconds: float = 5.0
+
+    # URL knowledge
+    url_cache_ttl_seconds: int = 24 * 60 * 60  # Revalidate cached pages after this
+    # Local HTML extractions scoring below this fall back to Claude web_fetch
+    url_local_min_quality: float = 0.6
+    url_fetch_max_bytes: int = 5 * 1024 * 1024  # Pages are cut off here
+    # User-supplied URLs may only reach globally routable addresses; set for
+    # local development against pages served from this machine or LAN
+    url_fetch_allow_private: bool = False
+    # Opt-in periodic refresh of URL knowledge. Each process running job
+    # workers scans for due entries every scan interval and queues at most
+    # max_per_minute refreshes, spread across the interval.
+    knowledge_refresh_scan_seconds: int = 60
+    knowledge_refresh_max_per_minute: int = 30
+    knowledge_refresh_min_interval_hours: int = 6
+
+    # Uploads wait here until their job has run (voice samples, knowledge
+    # files). Defaults to a directory under the system temp dir; when job
+    # workers run as separate processes (worker.py) on other hosts or
+    # containers, point every API and worker process at one shared volume.
+    upload_dir: str = ""
+
+    # Knowledge file uploads (.txt, .md, .pdf)
+    knowledge_upload_max_bytes: int = 500 * 1024 * 1024
+    knowledge_ingest_batch_size: int = 256  # Chunks embedded per vector store write
+
+    # Outbound HTTP (shared keep-alive clients, see http_clients.py)
+    http2_enabled: bool = True
+    http_connect_timeout: float = 5.0  # seconds
+    http_read_timeout: float = 30.0  # seconds
+    http_max_connections: int = 100  # Per client
+    http_max_connections_per_host: int = 10
+    http_keepalive_expiry: float = 60.0  # Idle pooled connections close after this
+
+    # Admin endpoints (/admin/...) require this in the X-Admin-Key header;
+    # they are disabled while it is empty
+    admin_api_key: str = ""
 
     # App settings
     app_url: str = "http://localhost:3000"
@@ -35,6 +146,14 @@ class Settings(BaseSettings):
         except json.JSONDecodeError:
             return ["*"]
 
+    @property
+    def get_job_concurrency(self) -> dict[str, int]:
+        """Parse per-job-type worker counts from JSON string."""
+        try:
+            return {k: int(v) for k, v in json.loads(self.job_concurrency).items()}
+        except (json.JSONDecodeError, AttributeError, TypeError, ValueError):
+            return {}
+
     class Config:
         env_file = ".env"
 
@@ -1,8 +1,12 @@
-from sqlalchemy import create_engine
+import logging
+
+from sqlalchemy import Enum, create_engine, inspect, text
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import DeclarativeBase, sessionmaker
 from config import get_settings
 
+logger = logging.getLogger(__name__)
+
 settings = get_settings()
 
 # Convert sync URL to async URL
@@ -29,6 +33,56 @@ class Base(DeclarativeBase):
     pass
 
 
+def upgrade_schema(connection) -> None:
+    """Bring tables created by an older version up to date with the models.
+
+    Run after ``create_all``, which only creates missing tables. Adds the
+    nullable columns models have gained since (with their indexes) and, on
+    PostgreSQL, new members of existing enum types. Any other change has
+    to be migrated by hand.
+    """
+    inspector = inspect(connection)
+    quote = connection.dialect.identifier_preparer
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            if not column.nullable:
+                logger.warning(f"Column {table.name}.{column.name} is missing and must be added by hand")
+                continue
+            connection.execute(text(
+                f"ALTER TABLE {quote.format_table(table)} ADD COLUMN {quote.format_column(column)} "
+                f"{column.type.compile(dialect=connection.dialect)}"
+            ))
+            for index in table.indexes:
+                if index.columns.contains_column(column):
+                    index.create(connection, checkfirst=True)
+            logger.info(f"Added column {table.name}.{column.name}")
+
+    if connection.dialect.name != "postgresql":
+        return
+    enum_types = {
+        column.type.name: column.type
+        for table in Base.metadata.sorted_tables
+        for column in table.columns
+        if isinstance(column.type, Enum) and column.type.native_enum and column.type.name
+    }
+    for name, enum_type in enum_types.items():
+        labels = set(connection.execute(
+            text("SELECT e.enumlabel FROM pg_enum e JOIN pg_type t ON e.enumtypid = t.oid WHERE t.typname = :name"),
+            {"name": name},
+        ).scalars())
+        if not labels:
+            continue  # Created with its table, or unused
+        for label in enum_type.enums:
+            if label not in labels:
+                connection.execute(text(f"ALTER TYPE {quote.quote(name)} ADD VALUE IF NOT EXISTS '{label}'"))
+                logger.info(f"Added {label} to enum type {name}")
+
+
 async def get_db():
     """Dependency to get database session."""
     async with async_session() as session:
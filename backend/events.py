@@ -0,0 +1,82 @@
+"""In-process pub/sub for substrate status events.
+
+Handlers publish after committing a status change and the SSE endpoint
+(GET /substrates/{id}/events) subscribes per substrate. Events only reach
+subscribers in the publishing process, so the endpoint also diffs
+periodic snapshots to pick up changes made by other processes.
+"""
+import asyncio
+from contextlib import contextmanager
+
+import metrics
+from models import VoiceStatus
+
+# Events buffered per subscriber; past this the oldest are dropped, since
+# a slow client only needs the latest state of each entity
+SUBSCRIBER_QUEUE_SIZE = 100
+
+_subscribers: dict[str, set[tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+
+
+def _put(queue: asyncio.Queue, item: tuple[str, dict]) -> None:
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(item)
+
+
+def publish(substrate_id: str, event: str, data: dict) -> None:
+    """Send an event to every subscriber of a substrate. Safe from any thread."""
+    for loop, queue in list(_subscribers.get(substrate_id, ())):
+        try:
+            loop.call_soon_threadsafe(_put, queue, (event, data))
+        except RuntimeError:
+            pass  # Subscriber's loop already closed
+
+
+def _publish_count() -> None:
+    metrics.set_gauge("event_subscribers", sum(len(s) for s in _subscribers.values()))
+
+
+@contextmanager
+def subscribe(substrate_id: str):
+    """Yield a queue receiving (event, data) tuples for one substrate."""
+    entry = (asyncio.get_running_loop(), asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE))
+    _subscribers.setdefault(substrate_id, set()).add(entry)
+    _publish_count()
+    try:
+        yield entry[1]
+    finally:
+        subscribers = _subscribers.get(substrate_id)
+        if subscribers is not None:
+            subscribers.discard(entry)
+            if not subscribers:
+                del _subscribers[substrate_id]
+        _publish_count()
+
+
+def extraction_event(substrate, node: str | None = None) -> dict:
+    data = {
+        "status": substrate.status.value if substrate.status else "pending",
+        "progress": int(substrate.extraction_progress or 0),
+    }
+    if node:
+        data["node"] = node
+    return data
+
+
+def voice_event(substrate) -> dict:
+    return {
+        "voice_status": substrate.voice_status.value if substrate.voice_status else None,
+        "voice_name": substrate.voice_name,
+        "has_voice": substrate.voice_id is not None and substrate.voice_status == VoiceStatus.READY,
+    }
+
+
+def knowledge_event(knowledge) -> dict:
+    return {
+        "id": knowledge.id,
+        "status": knowledge.status.value if knowledge.status else None,
+        "title": knowledge.title,
+        "chunk_count": knowledge.chunk_count,
+        "error_message": knowledge.error_message,
+    }
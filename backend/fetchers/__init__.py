@@ -1,4 +1,5 @@
 from .twitter import TwitterFetcher
 from .url_fetcher import fetch_url_content
+from .file_text import iter_file_text
 
-__all__ = ["TwitterFetcher", "fetch_url_content"]
+__all__ = ["TwitterFetcher", "fetch_url_content", "iter_file_text"]
@@ -0,0 +1,46 @@
+import codecs
+import os
+from collections.abc import Iterator
+
+from pypdf import PdfReader
+
+READ_BLOCK_SIZE = 256 * 1024
+TEXT_EXTENSIONS = {".txt", ".md", ".markdown"}
+PDF_EXTENSIONS = {".pdf"}
+SUPPORTED_EXTENSIONS = TEXT_EXTENSIONS | PDF_EXTENSIONS
+
+
+def iter_file_text(path: str) -> Iterator[str]:
+    """Yield the text of an uploaded document piece by piece.
+
+    Text and Markdown files are decoded block by block (UTF-8, invalid bytes
+    replaced); PDFs yield one page at a time. Nothing holds more than a
+    block or a page, so the caller can chunk documents of any size.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext in PDF_EXTENSIONS:
+        yield from _iter_pdf_pages(path)
+    elif ext in TEXT_EXTENSIONS:
+        yield from _iter_text_blocks(path)
+    else:
+        raise ValueError(f"Unsupported file type: {ext or 'unknown'}")
+
+
+def _iter_text_blocks(path: str) -> Iterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    with open(path, "rb") as f:
+        while block := f.read(READ_BLOCK_SIZE):
+            yield decoder.decode(block)
+    yield decoder.decode(b"", final=True)
+
+
+def _iter_pdf_pages(path: str) -> Iterator[str]:
+    with open(path, "rb") as f:
+        reader = PdfReader(f)
+        for page in reader.pages:
+            text = page.extract_text() or ""
+            # Parsed page objects are cached on the reader; drop them so
+            # memory doesn't grow with the page count
+            reader.resolved_objects.clear()
+            if text.strip():
+                yield text + "\n"
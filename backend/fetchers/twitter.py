@@ -1,55 +1,170 @@
-import httpx
+import asyncio
+import hashlib
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime
 from typing import Optional
 
+import httpx
+
+import metrics
+from config import get_settings
+from http_clients import get_client
+
+# Retries of a request answered 429 before giving up
+RATE_LIMIT_RETRIES = 3
+# First backoff after a 429 without reset headers; doubles per retry
+RATE_LIMIT_BACKOFF = 2.0  # seconds
+
+
+@dataclass
+class RateLimit:
+    limit: int
+    remaining: int
+    reset_at: float  # Unix time the window resets
+
+
+# Last known window per (access token fingerprint, endpoint). Twitter limits
+# user-context requests per token, so fetchers sharing a token share this.
+_rate_limits: dict[tuple[str, str], RateLimit] = {}
+
+
+class RateLimitExceeded(httpx.HTTPError):
+    """The token's rate limit window doesn't reset soon enough to wait for."""
+
+    def __init__(self, endpoint: str, reset_at: float):
+        resets = datetime.utcfromtimestamp(reset_at).isoformat(timespec="seconds")
+        super().__init__(f"Twitter rate limit for {endpoint} exhausted until {resets}Z")
+        self.reset_at = reset_at
+
 
 class TwitterFetcher:
-    """Fetches tweets and user data from Twitter API v2."""
+    """Fetches tweets and user data from Twitter API v2.
+
+    Requests follow the token's x-rate-limit-* headers: an exhausted window
+    is waited out if it resets within twitter_rate_limit_max_wait, else
+    RateLimitExceeded (an httpx.HTTPError) is raised without calling the API.
+    """
 
     BASE_URL = "https://api.twitter.com/2"
 
     def __init__(self, access_token: str):
         self.access_token = access_token
         self.headers = {"Authorization": f"Bearer {access_token}"}
+        self._token_key = hashlib.sha256(access_token.encode()).hexdigest()[:16]
 
-    async def get_user_info(self) -> dict:
-        """Get the authenticated user's information."""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.BASE_URL}/users/me",
+    def rate_limit_budget(self) -> dict[str, dict]:
+        """Last known rate limit of this token per endpoint."""
+        now = time.time()
+        return {
+            endpoint: {
+                "limit": budget.limit,
+                "remaining": budget.remaining,
+                "resets_in": max(0, round(budget.reset_at - now)),
+            }
+            for (token_key, endpoint), budget in _rate_limits.items()
+            if token_key == self._token_key
+        }
+
+    def _record_rate_limit(self, endpoint: str, response: httpx.Response) -> RateLimit | None:
+        try:
+            budget = RateLimit(
+                limit=int(response.headers["x-rate-limit-limit"]),
+                remaining=int(response.headers["x-rate-limit-remaining"]),
+                reset_at=float(response.headers["x-rate-limit-reset"]),
+            )
+        except (KeyError, ValueError):
+            return None
+        if len(_rate_limits) > 10_000:
+            # Forget windows that have long reset
+            for key in [k for k, b in _rate_limits.items() if b.reset_at < time.time()]:
+                del _rate_limits[key]
+        _rate_limits[(self._token_key, endpoint)] = budget
+        metrics.observe("twitter_rate_limit_remaining", budget.remaining, endpoint=endpoint)
+        return budget
+
+    async def _wait_for_reset(self, endpoint: str, reset_at: float) -> None:
+        wait = reset_at - time.time() + 1  # Reset times are whole seconds
+        if wait > get_settings().twitter_rate_limit_max_wait:
+            raise RateLimitExceeded(endpoint, reset_at)
+        if wait > 0:
+            metrics.observe("twitter_rate_limit_wait_seconds", wait, endpoint=endpoint)
+            await asyncio.sleep(wait)
+
+    async def _get(self, endpoint: str, path: str, params: dict) -> dict:
+        """GET ``BASE_URL/path`` within the token's limit for ``endpoint``.
+
+        ``endpoint`` names the rate-limited route, e.g. "users/:id/tweets".
+        A 429 is retried after the window resets (per its headers), or with
+        jittered exponential backoff when it has none.
+        """
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            budget = _rate_limits.get((self._token_key, endpoint))
+            if budget and budget.remaining <= 0 and budget.reset_at > time.time():
+                await self._wait_for_reset(endpoint, budget.reset_at)
+
+            response = await get_client("twitter").get(
+                f"{self.BASE_URL}/{path}",
                 headers=self.headers,
-                params={
-                    "user.fields": "id,name,username,description,profile_image_url,public_metrics"
-                },
+                params=params,
             )
-            response.raise_for_status()
-            return response.json()
+            budget = self._record_rate_limit(endpoint, response)
+            if response.status_code != 429 or attempt == RATE_LIMIT_RETRIES:
+                break
+
+            metrics.increment("twitter_rate_limited", endpoint=endpoint)
+            if budget:
+                await self._wait_for_reset(endpoint, budget.reset_at)
+            else:
+                await asyncio.sleep(RATE_LIMIT_BACKOFF * 2 ** attempt * random.uniform(1, 1.5))
+
+        response.raise_for_status()
+        return response.json()
+
+    async def get_user_info(self) -> dict:
+        """Get the authenticated user's information."""
+        return await self._get(
+            "users/me",
+            "users/me",
+            {"user.fields": "id,name,username,description,profile_image_url,public_metrics"},
+        )
 
     async def get_user_tweets(
-        self, user_id: str, max_results: int = 100, pagination_token: Optional[str] = None
+        self,
+        user_id: str,
+        max_results: int = 100,
+        pagination_token: Optional[str] = None,
+        since_id: Optional[str] = None,
     ) -> dict:
-        """Get user's recent tweets."""
+        """Get user's recent tweets, newest first (only newer than since_id if given)."""
         params = {
-            "max_results": min(max_results, 100),
+            # The endpoint rejects fewer than 5
+            "max_results": max(5, min(max_results, 100)),
             "tweet.fields": "created_at,public_metrics,conversation_id,in_reply_to_user_id",
             "exclude": "retweets",  # Only original tweets
         }
         if pagination_token:
             params["pagination_token"] = pagination_token
+        if since_id:
+            params["since_id"] = since_id
 
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.BASE_URL}/users/{user_id}/tweets",
-                headers=self.headers,
-                params=params,
-            )
-            response.raise_for_status()
-            return response.json()
+        return await self._get("users/:id/tweets", f"users/{user_id}/tweets", params)
 
-    async def fetch_all_tweets(self, max_tweets: int = 500) -> list[dict]:
-        """Fetch all available tweets up to max_tweets."""
-        # First get user info
-        user_data = await self.get_user_info()
-        user_id = user_data["data"]["id"]
+    async def fetch_all_tweets(
+        self,
+        max_tweets: int = 500,
+        since_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+    ) -> list[dict]:
+        """Fetch all available tweets up to max_tweets, newest first.
+
+        Pages are cursor-linked, so they are fetched one after another.
+        ``user_id`` saves a users/me call when the caller already has it.
+        """
+        if user_id is None:
+            user_data = await self.get_user_info()
+            user_id = user_data["data"]["id"]
 
         all_tweets = []
         pagination_token = None
@@ -59,10 +174,11 @@ class TwitterFetcher:
                 user_id,
                 max_results=min(100, max_tweets - len(all_tweets)),
                 pagination_token=pagination_token,
+                since_id=since_id,
             )
 
             if "data" in result:
-                all_tweets.extend(result["data"])
+                all_tweets.extend(result["data"][:max_tweets - len(all_tweets)])
 
             # Check for pagination
             if "meta" in result and "next_token" in result["meta"]:
@@ -72,10 +188,15 @@ class TwitterFetcher:
 
         return all_tweets
 
-    async def get_content_for_extraction(self) -> dict:
-        """Get all content needed for personality extraction."""
+    async def get_content_for_extraction(self, max_tweets: int = 500, since_id: Optional[str] = None) -> dict:
+        """Get all content needed for personality extraction.
+
+        With ``since_id`` only tweets newer than that id are fetched.
+        """
         user_data = await self.get_user_info()
-        tweets = await self.fetch_all_tweets(max_tweets=5)
+        tweets = await self.fetch_all_tweets(
+            max_tweets=max_tweets, since_id=since_id, user_id=user_data["data"]["id"]
+        )
 
         return {
             "user": user_data.get("data", {}),
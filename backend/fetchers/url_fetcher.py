@@ -1,48 +1,182 @@
+import logging
+
 import httpx
-from bs4 import BeautifulSoup
+import lxml.html
+from lxml import etree
 
+from http_clients import get_client, host_slot, is_blocked
 
-async def fetch_url_content(url: str) -> dict:
-    """Fetch and extract text content from a URL.
+logger = logging.getLogger(__name__)
+
+MAX_RESPONSE_BYTES = 5 * 1024 * 1024
+HTML_CONTENT_TYPES = {"text/html", "application/xhtml+xml", "text/plain"}
+
+NON_CONTENT_TAGS = ("script", "style", "noscript", "template", "nav", "footer", "header", "aside", "form")
+# Text blocks, each emitted whole as one paragraph
+CONTENT_TAGS = {"p", "h1", "h2", "h3", "h4", "h5", "h6", "li", "blockquote", "pre"}
+# Elements that don't break a line. Any other tag (<div>, <article>, <td>,
+# <br>, ...) ends the loose text before it, so text sitting directly in
+# containers comes out as separate paragraphs.
+INLINE_TAGS = {
+    "a", "abbr", "b", "bdi", "bdo", "cite", "code", "data", "dfn", "em", "font", "i", "img", "kbd",
+    "label", "mark", "q", "s", "samp", "small", "span", "strong", "sub", "sup", "time", "u", "var",
+}
 
-    Returns {"title": str|None, "content": str, "error": str|None}
+
+def score_extraction(content: str, html_length: int, link_text_length: int) -> float:
+    """Score how likely a local extraction captured the real page content (0-1).
+
+    Combines text length (JS shells and paywalls yield little text), text
+    density relative to the HTML size, and the share of text that is link
+    text (navigation and link farms rather than prose).
     """
+    if not content.strip():
+        return 0.0
+    length_score = min(1.0, len(content) / 1500)
+    density_score = min(1.0, (len(content) / max(html_length, 1)) / 0.05)
+    # Some link text is normal (inline links, nav that survived cleanup);
+    # beyond 20% the page is increasingly a list of links, not prose.
+    boilerplate_ratio = link_text_length / len(content)
+    boilerplate_penalty = 1.0 - min(1.0, max(0.0, boilerplate_ratio - 0.2) / 0.4)
+    return round((0.6 * length_score + 0.4 * density_score) * boilerplate_penalty, 3)
+
+
+def _normalize_space(text: str) -> str:
+    return " ".join(text.split())
+
+
+def extract_html(raw: bytes, encoding: str | None = None) -> dict:
+    """Extract title and readable text from HTML in a single tree walk.
+
+    Uses lxml's C parser. Only the outermost content block of any nesting
+    is emitted, so text inside e.g. <li><p>...</p></li> appears once. Text
+    outside content blocks (directly in a <div>, <td>, ...) is kept too,
+    joined across inline elements.
+
+    Returns {"title": str|None, "content": str, "link_text_length": int}.
+    """
+    parser = lxml.html.HTMLParser(encoding=encoding, remove_comments=True)
     try:
-        async with httpx.AsyncClient(follow_redirects=True, timeout=30.0) as client:
-            response = await client.get(url)
-            response.raise_for_status()
+        doc = lxml.html.document_fromstring(raw, parser=parser)
+    except (etree.ParserError, ValueError):
+        return {"title": None, "content": "", "link_text_length": 0}
+
+    title = doc.findtext(".//title")
+    title = _normalize_space(title) if title else None
 
-        soup = BeautifulSoup(response.text, "html.parser")
+    etree.strip_elements(doc, *NON_CONTENT_TAGS, with_tail=False)
+    body = doc.find("body")
+    if body is None:
+        body = doc
 
-        # Extract title
-        title = None
-        title_tag = soup.find("title")
-        if title_tag:
-            title = title_tag.get_text(strip=True)
+    text_parts = []
+    loose = []  # Text outside content blocks since the last line break
+
+    def flush_loose():
+        text = _normalize_space("".join(loose))
+        loose.clear()
+        if text:
+            text_parts.append(text)
+
+    link_text_length = 0
+    depth = 0  # > 0 while inside an emitted content block
+    for event, element in etree.iterwalk(body, events=("start", "end")):
+        tag = element.tag if isinstance(element.tag, str) else ""
+        breaks_line = tag not in INLINE_TAGS and tag != ""
+        if event == "start":
+            if tag == "a":
+                link_text_length += len(_normalize_space(element.text_content()))
+            if depth == 0:
+                if breaks_line:
+                    flush_loose()
+                if tag in CONTENT_TAGS:
+                    text = _normalize_space(element.text_content())
+                    if text:
+                        text_parts.append(text)
+                elif tag and element.text:
+                    loose.append(element.text)
+            if tag in CONTENT_TAGS:
+                depth += 1
+        else:
+            if tag in CONTENT_TAGS:
+                depth -= 1
+            if depth == 0:
+                if breaks_line:
+                    flush_loose()
+                if element.tail and element is not body:
+                    loose.append(element.tail)
+    flush_loose()
+
+    content = "\n\n".join(text_parts)
+
+    if not content:
+        # Fallback: all visible text from body, one line per text node
+        content = "\n".join(t.strip() for t in body.itertext() if t.strip())
+
+    return {"title": title, "content": content, "link_text_length": link_text_length}
+
+
+async def _read_capped(response: httpx.Response, max_bytes: int) -> tuple[bytes, bool]:
+    """Read at most max_bytes of the body. Returns (body, truncated)."""
+    chunks = []
+    size = 0
+    async for chunk in response.aiter_bytes():
+        remaining = max_bytes - size
+        if len(chunk) >= remaining:
+            chunks.append(chunk[:remaining])
+            return b"".join(chunks), True
+        chunks.append(chunk)
+        size += len(chunk)
+    return b"".join(chunks), False
+
+
+async def fetch_url_content(url: str, max_bytes: int = MAX_RESPONSE_BYTES) -> dict:
+    """Fetch and extract text content from a URL.
+
+    The body is streamed and cut off at ``max_bytes`` (the start of a page
+    carries its main content), and non-HTML responses are rejected from the
+    headers before any body is read.
+
+    Returns {"title": str|None, "content": str, "error": str|None,
+    "quality": float} where quality is the score_extraction() result. A
+    successful fetch also carries the response's "etag" and "last_modified"
+    validators; a failed one has "blocked": True if the URL (or a redirect)
+    points at a non-public address.
+    """
+    try:
+        async with host_slot(url), get_client("web").stream("GET", url) as response:
+            response.raise_for_status()
 
-        # Remove non-content tags
-        for tag in soup.find_all(["script", "style", "nav", "footer", "header", "aside"]):
-            tag.decompose()
+            content_type = response.headers.get("content-type", "").split(";")[0].strip().lower()
+            if content_type and content_type not in HTML_CONTENT_TYPES:
+                return {"title": None, "content": "", "error": f"Unsupported content type: {content_type}", "quality": 0.0}
 
-        # Extract text from content tags
-        content_tags = soup.find_all(["p", "h1", "h2", "h3", "h4", "h5", "h6", "li", "article", "blockquote"])
-        text_parts = []
-        for tag in content_tags:
-            text = tag.get_text(strip=True)
-            if text:
-                text_parts.append(text)
+            raw, truncated = await _read_capped(response, max_bytes)
+            encoding = response.charset_encoding
+            etag = response.headers.get("etag")
+            last_modified = response.headers.get("last-modified")
 
-        content = "\n\n".join(text_parts)
+        if truncated:
+            logger.info(f"Truncated {url} at {max_bytes} bytes")
 
-        if not content.strip():
-            # Fallback: extract all visible text from body
-            body = soup.find("body")
-            if body:
-                content = body.get_text(separator="\n", strip=True)
+        extracted = extract_html(raw, encoding)
+        content = extracted["content"]
+        quality = score_extraction(content, len(raw), extracted["link_text_length"])
 
-        return {"title": title, "content": content, "error": None}
+        return {
+            "title": extracted["title"],
+            "content": content,
+            "error": None,
+            "quality": quality,
+            "etag": etag,
+            "last_modified": last_modified,
+        }
 
     except httpx.HTTPStatusError as e:
-        return {"title": None, "content": "", "error": f"HTTP {e.response.status_code}: {str(e)}"}
+        return {"title": None, "content": "", "error": f"HTTP {e.response.status_code}: {str(e)}", "quality": 0.0}
+    except httpx.ConnectError as e:
+        if is_blocked(e):
+            return {"title": None, "content": "", "error": f"URL not allowed: {e}", "quality": 0.0, "blocked": True}
+        return {"title": None, "content": "", "error": str(e), "quality": 0.0}
     except Exception as e:
-        return {"title": None, "content": "", "error": str(e)}
+        return {"title": None, "content": "", "error": str(e), "quality": 0.0}
@@ -0,0 +1,214 @@
+"""Shared outbound HTTP clients.
+
+One pooled ``httpx.AsyncClient`` per integration, kept for the lifetime of
+the process so TCP/TLS connections (and HTTP/2 streams) are reused across
+requests instead of handshaking on every call. ``start()`` and ``close()``
+are called from the app lifespan and worker.py; ``get_client()`` also
+creates clients lazily for scripts that never call ``start()``.
+
+Every request is traced to record whether it opened a new connection or
+reused a pooled one (``http_requests_total{client,connection}``).
+
+The "web" client fetches user-supplied URLs, so it only connects to
+globally routable addresses (no loopback, private, link-local or cloud
+metadata targets), on every redirect hop.
+"""
+import asyncio
+import ipaddress
+import logging
+import socket
+import time
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+
+import httpcore
+import httpx
+
+import metrics
+from config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Client name -> extra AsyncClient options
+_PROFILES = {
+    # Twitter API and OAuth endpoints: a single host, so the pool limit is
+    # the per-host limit (likewise for ElevenLabs)
+    "twitter": {},
+    # ElevenLabs voice cloning and TTS (through the SDK's async client)
+    "elevenlabs": {},
+    # Arbitrary web pages for URL knowledge; per-host limits via host_slot()
+    # and public addresses only (see _PublicNetworkBackend)
+    "web": {"follow_redirects": True},
+}
+
+_clients: dict[str, httpx.AsyncClient] = {}
+
+
+class _HostSlot:
+    """Per-host semaphore, with a count of the requests holding or awaiting it."""
+
+    __slots__ = ("semaphore", "users")
+
+    def __init__(self, limit: int):
+        self.semaphore = asyncio.Semaphore(limit)
+        self.users = 0
+
+
+# Only hosts with requests in flight have an entry, so fetching arbitrary
+# URLs doesn't grow this for the life of the process
+_host_slots: dict[str, _HostSlot] = {}
+
+
+class BlockedAddress(httpcore.ConnectError):
+    """A URL's host resolved to an address that isn't globally routable."""
+
+
+def is_public_address(address: str) -> bool:
+    ip = ipaddress.ip_address(address.split("%", 1)[0])  # Drop an IPv6 zone id
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+def is_blocked(error: BaseException) -> bool:
+    """Whether an httpx error was caused by a BlockedAddress refusal."""
+    while error is not None:
+        if isinstance(error, BlockedAddress):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+class _PublicNetworkBackend(httpcore.AsyncNetworkBackend):
+    """Opens connections to globally routable addresses only.
+
+    The host is resolved here and the checked address is the one connected
+    to, so a DNS answer that changes between check and connect can't slip
+    a private address through. Every connection, including each redirect
+    hop, goes through this.
+    """
+
+    def __init__(self):
+        self._backend = httpcore.AnyIOBackend()
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        try:
+            infos = await asyncio.wait_for(
+                asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM), timeout
+            )
+        except (OSError, asyncio.TimeoutError) as e:
+            raise httpcore.ConnectError(f"Could not resolve {host}: {e}") from e
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+        for address in addresses:
+            if not is_public_address(address):
+                raise BlockedAddress(f"{host} resolves to a non-public address ({address})")
+
+        error = None
+        for address in addresses:
+            try:
+                return await self._backend.connect_tcp(
+                    address, port, timeout=timeout, local_address=local_address, socket_options=socket_options
+                )
+            except httpcore.ConnectError as e:
+                error = e
+        raise error or httpcore.ConnectError(f"No addresses for {host}")
+
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        raise BlockedAddress("Unix sockets are not allowed")
+
+    async def sleep(self, seconds: float) -> None:
+        await self._backend.sleep(seconds)
+
+
+class _PublicOnlyTransport(httpx.AsyncHTTPTransport):
+    def __init__(self, http2: bool, limits: httpx.Limits):
+        super().__init__(http2=http2, limits=limits, trust_env=False)
+        # AsyncHTTPTransport doesn't take a network backend, so its pool is
+        # replaced with an equivalent one that uses the guarded backend
+        self._pool = httpcore.AsyncConnectionPool(
+            ssl_context=httpx.create_ssl_context(trust_env=False),
+            max_connections=limits.max_connections,
+            max_keepalive_connections=limits.max_keepalive_connections,
+            keepalive_expiry=limits.keepalive_expiry,
+            http2=http2,
+            network_backend=_PublicNetworkBackend(),
+        )
+
+
+def _build(name: str) -> httpx.AsyncClient:
+    settings = get_settings()
+    max_connections = settings.http_max_connections
+    if name != "web":
+        max_connections = settings.http_max_connections_per_host
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_connections,
+        keepalive_expiry=settings.http_keepalive_expiry,
+    )
+    options = dict(_PROFILES[name])
+    if name == "web" and not settings.url_fetch_allow_private:
+        # Proxies from the environment would bypass the address check
+        options.update(transport=_PublicOnlyTransport(settings.http2_enabled, limits), trust_env=False)
+
+    async def on_request(request: httpx.Request) -> None:
+        state = {"new_connection": False, "start": time.perf_counter()}
+
+        async def trace(event: str, info: dict) -> None:
+            if event == "connection.connect_tcp.started":
+                state["new_connection"] = True
+
+        request.extensions["trace"] = trace
+        request.extensions["pool_state"] = state
+
+    async def on_response(response: httpx.Response) -> None:
+        state = response.request.extensions.get("pool_state")
+        if state is None:
+            return
+        connection = "new" if state["new_connection"] else "reused"
+        metrics.increment("http_requests_total", client=name, connection=connection, http_version=response.http_version)
+        metrics.observe("http_response_headers_seconds", time.perf_counter() - state["start"], client=name)
+
+    return httpx.AsyncClient(
+        http2=settings.http2_enabled,
+        timeout=httpx.Timeout(settings.http_read_timeout, connect=settings.http_connect_timeout),
+        limits=limits,
+        event_hooks={"request": [on_request], "response": [on_response]},
+        **options,
+    )
+
+
+def get_client(name: str) -> httpx.AsyncClient:
+    """Return the shared client for an integration ("twitter", "elevenlabs" or "web")."""
+    client = _clients.get(name)
+    if client is None or client.is_closed:
+        client = _clients[name] = _build(name)
+    return client
+
+
+@asynccontextmanager
+async def host_slot(url: str):
+    """Cap concurrent requests to one host on the shared "web" client."""
+    host = (urlsplit(url).hostname or "").lower()
+    slot = _host_slots.get(host)
+    if slot is None:
+        slot = _host_slots[host] = _HostSlot(get_settings().http_max_connections_per_host)
+    slot.users += 1
+    try:
+        async with slot.semaphore:
+            yield
+    finally:
+        slot.users -= 1
+        if slot.users == 0 and _host_slots.get(host) is slot:
+            del _host_slots[host]
+
+
+async def start() -> None:
+    for name in _PROFILES:
+        get_client(name)
+
+
+async def close() -> None:
+    clients = list(_clients.values())
+    _clients.clear()
+    _host_slots.clear()
+    await asyncio.gather(*(client.aclose() for client in clients), return_exceptions=True)
@@ -2,18 +2,36 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from config import get_settings
-from db import engine, Base
-from api import substrates_router, oauth_router, chat_router, knowledge_router, voice_router
+from db import engine, Base, upgrade_schema
+import http_clients
+import metrics
+from api import substrates_router, oauth_router, chat_router, knowledge_router, voice_router, admin_router
+from services import JobQueue
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan handler."""
-    # Create tables on startup
+    # Create tables, and add columns added to existing ones, on startup
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(upgrade_schema)
+
+    # Keep-alive connection pools for outbound APIs and web fetches
+    await http_clients.start()
+
+    # Run background job workers in-process unless a separate worker.py does
+    job_queue = None
+    if get_settings().job_workers_enabled:
+        job_queue = JobQueue()
+        await job_queue.start()
+
     yield
+
     # Cleanup on shutdown
+    if job_queue:
+        await job_queue.stop()
+    await http_clients.close()
     await engine.dispose()
 
 
@@ -40,6 +58,7 @@ app.include_router(oauth_router)
 app.include_router(chat_router)
 app.include_router(knowledge_router)
 app.include_router(voice_router)
+app.include_router(admin_router)
 
 
 @app.get("/")
@@ -54,6 +73,12 @@ async def health():
     return {"status": "healthy"}
 
 
+@app.get("/metrics")
+async def get_metrics():
+    """In-process metrics snapshot for this worker."""
+    return metrics.snapshot()
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
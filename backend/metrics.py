@@ -0,0 +1,71 @@
+import threading
+from collections import defaultdict, deque
+
+
+# Number of recent samples kept per timing/value series for percentiles
+_MAX_SAMPLES = 1024
+
+_lock = threading.Lock()
+_counters: dict[str, float] = defaultdict(float)
+_gauges: dict[str, float] = {}
+_samples: dict[str, deque] = {}
+_totals: dict[str, tuple[int, float]] = {}
+
+
+def _key(name: str, labels: dict) -> str:
+    """Build a series key like ``name{label="value"}``."""
+    if not labels:
+        return name
+    parts = ",".join(f'{k}="{v}"' for k, v in sorted(labels.items()))
+    return f"{name}{{{parts}}}"
+
+
+def increment(name: str, value: float = 1, **labels) -> None:
+    """Increment a counter."""
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] += value
+
+
+def set_gauge(name: str, value: float, **labels) -> None:
+    """Set a gauge to its current value."""
+    key = _key(name, labels)
+    with _lock:
+        _gauges[key] = value
+
+
+def observe(name: str, value: float, **labels) -> None:
+    """Record a sample (latency, token count, ...) for a summary series."""
+    key = _key(name, labels)
+    with _lock:
+        samples = _samples.get(key)
+        if samples is None:
+            samples = _samples[key] = deque(maxlen=_MAX_SAMPLES)
+        samples.append(value)
+        count, total = _totals.get(key, (0, 0.0))
+        _totals[key] = (count + 1, total + value)
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def snapshot() -> dict:
+    """Return a JSON-serializable view of all metrics."""
+    with _lock:
+        summaries = {}
+        for key, samples in _samples.items():
+            values = sorted(samples)
+            count, total = _totals[key]
+            summaries[key] = {
+                "count": count,
+                "sum": round(total, 6),
+                "p50": _percentile(values, 0.5),
+                "p99": _percentile(values, 0.99),
+            }
+        return {
+            "counters": dict(_counters),
+            "gauges": dict(_gauges),
+            "summaries": summaries,
+        }
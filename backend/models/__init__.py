@@ -2,6 +2,12 @@ from .substrate import Substrate, SubstrateStatus, VoiceStatus
 from .social_account import SocialAccount
 from .chat import ChatSession, ChatMessage, MessageRole
 from .knowledge import Knowledge, KnowledgeSourceType, KnowledgeStatus
+from .job import Job, JobStatus
+from .url_cache import UrlContentCache
+from .extraction_cache import ExtractionStepCache
+from .tweet_archive import ArchivedTweet
+from .extraction_batch import ExtractionBatch, ExtractionBatchItem, ExtractionBatchStatus
+from .oauth_state import OAuthState
 
 __all__ = [
     "Substrate",
@@ -14,4 +20,13 @@ __all__ = [
     "Knowledge",
     "KnowledgeSourceType",
     "KnowledgeStatus",
+    "Job",
+    "JobStatus",
+    "UrlContentCache",
+    "ExtractionStepCache",
+    "ArchivedTweet",
+    "ExtractionBatch",
+    "ExtractionBatchItem",
+    "ExtractionBatchStatus",
+    "OAuthState",
 ]
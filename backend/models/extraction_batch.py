@@ -0,0 +1,55 @@
+from datetime import datetime
+from enum import Enum as PyEnum
+from sqlalchemy import Column, String, DateTime, Enum, Text, Integer, ForeignKey
+from db import Base
+import uuid
+
+
+class ExtractionBatchStatus(str, PyEnum):
+    PROCESSING = "processing"  # Submitted, waiting for the provider
+    ENDED = "ended"  # Results ready, being written back
+    APPLIED = "applied"
+    FAILED = "failed"
+
+
+class ExtractionBatch(Base):
+    """One message batch of structured re-extractions."""
+    __tablename__ = "extraction_batches"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    provider_batch_id = Column(String, nullable=False)
+    status = Column(Enum(ExtractionBatchStatus), default=ExtractionBatchStatus.PROCESSING, nullable=False, index=True)
+    request_count = Column(Integer, default=0, nullable=False)
+    # Filled in as results are written back
+    applied_count = Column(Integer, default=0, nullable=False)  # Profiles updated
+    invalid_count = Column(Integer, default=0, nullable=False)  # Answers failing validation
+    failed_count = Column(Integer, default=0, nullable=False)  # Errored, canceled or expired requests
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    ended_at = Column(DateTime, nullable=True)
+    applied_at = Column(DateTime, nullable=True)
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "provider_batch_id": self.provider_batch_id,
+            "status": self.status.value if self.status else None,
+            "request_count": self.request_count,
+            "applied_count": self.applied_count,
+            "invalid_count": self.invalid_count,
+            "failed_count": self.failed_count,
+            "last_error": self.last_error,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "ended_at": self.ended_at.isoformat() if self.ended_at else None,
+            "applied_at": self.applied_at.isoformat() if self.applied_at else None,
+        }
+
+
+class ExtractionBatchItem(Base):
+    """What a batch result for one substrate is validated and cached against."""
+    __tablename__ = "extraction_batch_items"
+
+    batch_id = Column(String, ForeignKey("extraction_batches.id", ondelete="CASCADE"), primary_key=True)
+    substrate_id = Column(String, primary_key=True)  # Also the request's custom_id
+    tweets_text = Column(Text, nullable=False)  # Sample tweets must appear in it verbatim
+    cache_key = Column(String(64), nullable=False)  # Step cache key of the same live call
@@ -0,0 +1,15 @@
+from datetime import datetime
+from sqlalchemy import Column, String, DateTime, Integer, JSON
+from db import Base
+
+
+class ExtractionStepCache(Base):
+    __tablename__ = "extraction_step_cache"
+
+    # sha256 of the step's model, prompt messages and tool schema
+    cache_key = Column(String(64), primary_key=True)
+    step = Column(String, nullable=False)
+    output = Column(JSON, nullable=False)  # Response text, or tool call arguments
+    input_tokens = Column(Integer, default=0)  # What the original call cost
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
@@ -9,6 +9,7 @@ import uuid
 class KnowledgeSourceType(str, PyEnum):
     URL = "url"
     TEXT = "text"
+    FILE = "file"
 
 
 class KnowledgeStatus(str, PyEnum):
@@ -20,6 +21,8 @@ class KnowledgeStatus(str, PyEnum):
 class Knowledge(Base):
     __tablename__ = "knowledge"
 
+    CONTENT_PREVIEW_CHARS = 500
+
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     substrate_id = Column(String, ForeignKey("substrates.id"), nullable=False, index=True)
     source_type = Column(Enum(KnowledgeSourceType), nullable=False)
@@ -29,6 +32,9 @@ class Knowledge(Base):
     chunk_count = Column(Integer, default=0)
     status = Column(Enum(KnowledgeStatus), default=KnowledgeStatus.PROCESSING)
     error_message = Column(Text, nullable=True)
+    content_hash = Column(String, nullable=True)  # sha256 of content, for change detection
+    refresh_interval_hours = Column(Integer, nullable=True)  # URL entries only; None = never refresh
+    next_refresh_at = Column(DateTime, nullable=True, index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -36,7 +42,7 @@ class Knowledge(Base):
     substrate = relationship("Substrate", back_populates="knowledge_entries")
 
     def to_dict(self) -> dict:
-        content_preview = self.content[:500] if self.content else None
+        content_preview = self.content[:self.CONTENT_PREVIEW_CHARS] if self.content else None
         return {
             "id": self.id,
             "substrate_id": self.substrate_id,
@@ -47,6 +53,8 @@ class Knowledge(Base):
             "chunk_count": self.chunk_count,
             "status": self.status.value if self.status else None,
             "error_message": self.error_message,
+            "refresh_interval_hours": self.refresh_interval_hours,
+            "next_refresh_at": self.next_refresh_at.isoformat() if self.next_refresh_at else None,
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None,
         }
@@ -0,0 +1,13 @@
+from datetime import datetime
+from sqlalchemy import Column, String, DateTime, JSON
+from db import Base
+
+
+class OAuthState(Base):
+    """A pending OAuth authorization, kept until its callback or expiry."""
+    __tablename__ = "oauth_states"
+
+    state = Column(String, primary_key=True)
+    data = Column(JSON, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
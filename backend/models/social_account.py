@@ -1,17 +1,43 @@
+import time
 from datetime import datetime
-from sqlalchemy import Column, String, DateTime, ForeignKey, Text
+from functools import lru_cache
+from sqlalchemy import Column, String, DateTime, ForeignKey, Text, JSON
 from sqlalchemy.orm import relationship
 from db import Base
 from cryptography.fernet import Fernet
 from config import get_settings
 import uuid
 
+# Most decrypted tokens held in memory at once
+TOKEN_CACHE_MAX_ENTRIES = 10_000
 
+# Encrypted token -> (decrypted token, monotonic expiry). Keyed by the
+# ciphertext, so a replaced token is never served from here.
+_decrypted_tokens: dict[str, tuple[str, float]] = {}
+
+
+@lru_cache()
 def get_cipher():
     settings = get_settings()
     return Fernet(settings.token_encryption_key.encode())
 
 
+def _decrypt(encrypted: str) -> str:
+    """Decrypt a stored token, reusing recent results for token_cache_ttl_seconds."""
+    now = time.monotonic()
+    cached = _decrypted_tokens.get(encrypted)
+    if cached and cached[1] > now:
+        return cached[0]
+    token = get_cipher().decrypt(encrypted.encode()).decode()
+    if len(_decrypted_tokens) >= TOKEN_CACHE_MAX_ENTRIES:
+        # Drop expired entries, or everything if none have expired yet
+        expired = [k for k, (_, expires) in _decrypted_tokens.items() if expires <= now]
+        for key in expired or list(_decrypted_tokens):
+            del _decrypted_tokens[key]
+    _decrypted_tokens[encrypted] = (token, now + get_settings().token_cache_ttl_seconds)
+    return token
+
+
 class SocialAccount(Base):
     __tablename__ = "social_accounts"
 
@@ -23,13 +49,23 @@ class SocialAccount(Base):
     encrypted_access_token = Column(Text, nullable=True)
     encrypted_refresh_token = Column(Text, nullable=True)
     token_expires_at = Column(DateTime, nullable=True)
+    # When the refresh scheduler next renews the access token
+    token_refresh_at = Column(DateTime, nullable=True, index=True)
     connected_at = Column(DateTime, default=datetime.utcnow)
+    # Tweet archive sync state: newest archived tweet id (the next fetch's
+    # since_id), last sync time, and the profile fetched then
+    since_id = Column(String, nullable=True)
+    tweets_synced_at = Column(DateTime, nullable=True)
+    profile = Column(JSON, nullable=True)
 
     # Relationship
     substrate = relationship("Substrate", back_populates="social_accounts")
+    # Rows are removed by the database's ON DELETE CASCADE, not loaded first
+    archived_tweets = relationship("ArchivedTweet", cascade="all, delete-orphan", passive_deletes=True)
 
     def set_access_token(self, token: str) -> None:
         """Encrypt and store access token."""
+        self.invalidate_cached_tokens()
         cipher = get_cipher()
         self.encrypted_access_token = cipher.encrypt(token.encode()).decode()
 
@@ -37,11 +73,14 @@ class SocialAccount(Base):
         """Decrypt and return access token."""
         if not self.encrypted_access_token:
             return None
-        cipher = get_cipher()
-        return cipher.decrypt(self.encrypted_access_token.encode()).decode()
+        return _decrypt(self.encrypted_access_token)
 
-    def set_refresh_token(self, token: str) -> None:
-        """Encrypt and store refresh token."""
+    def set_refresh_token(self, token: str | None) -> None:
+        """Encrypt and store refresh token (None forgets it)."""
+        self.invalidate_cached_tokens()
+        if token is None:
+            self.encrypted_refresh_token = None
+            return
         cipher = get_cipher()
         self.encrypted_refresh_token = cipher.encrypt(token.encode()).decode()
 
@@ -49,8 +88,13 @@ class SocialAccount(Base):
         """Decrypt and return refresh token."""
         if not self.encrypted_refresh_token:
             return None
-        cipher = get_cipher()
-        return cipher.decrypt(self.encrypted_refresh_token.encode()).decode()
+        return _decrypt(self.encrypted_refresh_token)
+
+    def invalidate_cached_tokens(self) -> None:
+        """Drop this account's decrypted tokens from the in-memory cache."""
+        for encrypted in (self.encrypted_access_token, self.encrypted_refresh_token):
+            if encrypted:
+                _decrypted_tokens.pop(encrypted, None)
 
     def to_dict(self) -> dict:
         return {
@@ -0,0 +1,32 @@
+from datetime import datetime
+from sqlalchemy import Column, String, DateTime, Text, JSON, ForeignKey, Index
+from db import Base
+
+
+class ArchivedTweet(Base):
+    """A tweet kept locally so extractions don't depend on the Twitter API."""
+    __tablename__ = "archived_tweets"
+
+    social_account_id = Column(String, ForeignKey("social_accounts.id", ondelete="CASCADE"), primary_key=True)
+    tweet_id = Column(String, primary_key=True)  # Twitter snowflake id
+    text = Column(Text, nullable=False)
+    created_at = Column(DateTime, nullable=True)  # When it was tweeted
+    public_metrics = Column(JSON, nullable=True)  # like/retweet/reply/quote counts
+    conversation_id = Column(String, nullable=True)
+    in_reply_to_user_id = Column(String, nullable=True)
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_archived_tweets_account_created", "social_account_id", "created_at"),
+    )
+
+    def to_tweet(self) -> dict:
+        """Same shape as a tweet from the Twitter API."""
+        return {
+            "id": self.tweet_id,
+            "text": self.text,
+            "created_at": self.created_at.isoformat() + "Z" if self.created_at else None,
+            "public_metrics": self.public_metrics or {},
+            "conversation_id": self.conversation_id,
+            "in_reply_to_user_id": self.in_reply_to_user_id,
+        }
@@ -0,0 +1,17 @@
+from datetime import datetime
+from sqlalchemy import Column, String, DateTime, Text
+from db import Base
+
+
+class UrlContentCache(Base):
+    __tablename__ = "url_content_cache"
+
+    url_key = Column(String(64), primary_key=True)  # sha256 of the normalized URL
+    url = Column(Text, nullable=False)
+    title = Column(String, nullable=True)
+    content = Column(Text, nullable=False)
+    content_hash = Column(String(64), nullable=False)
+    etag = Column(String, nullable=True)
+    last_modified = Column(String, nullable=True)
+    fetched_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
@@ -0,0 +1,315 @@
+import fcntl
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+MANIFEST = "manifest.json"
+# Files of the single-matrix layout used before segments
+LEGACY_MATRIX = "embeddings.npy"
+LEGACY_CHUNKS = "chunks.json"
+
+
+def _normalize(embeddings: np.ndarray) -> np.ndarray:
+    """L2-normalize rows and store them as float16."""
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return (vectors / np.where(norms == 0, 1, norms)).astype(np.float16)
+
+
+class _SubstrateMatrix:
+    """One substrate's chunks: float16 embedding segments plus chunk records."""
+
+    def __init__(self, segments: list[np.ndarray], records: list[dict], version: tuple[int, int]):
+        self.segments = segments  # [(rows, dim) float16], rows L2-normalized
+        self.offsets = np.cumsum([0] + [len(segment) for segment in segments])
+        self.records = records  # [{"id", "document", "metadata"}] aligned with the rows, in order
+        self.version = version  # (inode, mtime_ns) of the manifest read
+
+    def scores(self, query: np.ndarray) -> np.ndarray:
+        return np.concatenate([segment @ query for segment in self.segments])
+
+    def rows(self, indices: np.ndarray) -> np.ndarray:
+        """Embeddings at the given row positions, as float32."""
+        segment_of = np.searchsorted(self.offsets, indices, side="right") - 1
+        return np.array(
+            [self.segments[s][i - self.offsets[s]] for s, i in zip(segment_of, indices)], dtype=np.float32
+        )
+
+
+class NumpyIndex:
+    """Exact-search vector index with memory-mapped matrices per substrate.
+
+    Each substrate lives in ``<root>/<substrate_id>/`` as immutable
+    segments, each a ``seg-*.npy`` matrix (contiguous float16, normalized)
+    with its ``seg-*.json`` chunk records, listed in ``manifest.json``.
+    Writes add segment files and then atomically replace the manifest
+    under a file lock, so readers always see matching matrices and
+    records, and reload when the manifest changes; several worker
+    processes can share one directory. Adds only write the new rows (plus
+    merges of the newest segments, keeping O(log n) of them); deletes
+    compact into one segment. Matrices are memory-mapped on first use and
+    kept in an LRU of ``max_loaded`` substrates.
+    """
+
+    def __init__(self, root: Path, max_loaded: int = 64):
+        self.root = Path(root)
+        self.max_loaded = max_loaded
+        self._loaded: OrderedDict[str, _SubstrateMatrix] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _dir(self, substrate_id: str) -> Path:
+        return self.root / substrate_id
+
+    @contextmanager
+    def _write_lock(self, substrate_id: str):
+        directory = self._dir(substrate_id)
+        directory.mkdir(parents=True, exist_ok=True)
+        with open(directory / ".lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield directory
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _read_manifest(directory: Path) -> tuple[list[dict], tuple[int, int]]:
+        """Segments listed in the manifest, and the manifest's version."""
+        with open(directory / MANIFEST) as f:
+            stat = os.fstat(f.fileno())
+            return json.load(f)["segments"], (stat.st_ino, stat.st_mtime_ns)
+
+    def _load(self, substrate_id: str) -> _SubstrateMatrix | None:
+        """Return the substrate's matrices, memory-mapping them if not cached or stale."""
+        directory = self._dir(substrate_id)
+        if not (directory / MANIFEST).exists() and (directory / LEGACY_MATRIX).exists():
+            with self._write_lock(substrate_id):
+                self._segments(directory)  # Migrates the old layout
+        try:
+            stat = (directory / MANIFEST).stat()
+        except FileNotFoundError:
+            with self._lock:
+                self._loaded.pop(substrate_id, None)
+            return None
+
+        with self._lock:
+            cached = self._loaded.get(substrate_id)
+            if cached is not None and cached.version == (stat.st_ino, stat.st_mtime_ns):
+                self._loaded.move_to_end(substrate_id)
+                return cached
+
+        # A writer may merge away segments between reading the manifest and
+        # opening them; read the new manifest then
+        for _ in range(3):
+            try:
+                segments, version = self._read_manifest(directory)
+                matrices = []
+                records = []
+                for segment in segments:
+                    matrices.append(np.load(directory / f"{segment['name']}.npy", mmap_mode="r"))
+                    with open(directory / f"{segment['name']}.json") as f:
+                        records += json.load(f)
+                break
+            except FileNotFoundError:
+                continue
+        else:
+            raise RuntimeError(f"Vector index for substrate {substrate_id} keeps changing while loading")
+        entry = _SubstrateMatrix(matrices, records, version)
+
+        with self._lock:
+            self._loaded[substrate_id] = entry
+            self._loaded.move_to_end(substrate_id)
+            while len(self._loaded) > self.max_loaded:
+                self._loaded.popitem(last=False)
+        return entry
+
+    def _segments(self, directory: Path) -> list[dict]:
+        """Current segments, with the write lock held.
+
+        Converts a directory in the earlier single-matrix layout
+        (embeddings.npy + chunks.json) into one segment.
+        """
+        if (directory / MANIFEST).exists():
+            return self._read_manifest(directory)[0]
+        if not (directory / LEGACY_MATRIX).exists():
+            return []
+        embeddings = np.load(directory / LEGACY_MATRIX)
+        with open(directory / LEGACY_CHUNKS) as f:
+            records = json.load(f)
+        if embeddings.shape[0] != len(records):
+            raise RuntimeError(f"Vector index in {directory} is inconsistent")
+        segments = [self._write_segment(directory, embeddings, records)]
+        self._commit(directory, segments)
+        (directory / LEGACY_MATRIX).unlink()
+        (directory / LEGACY_CHUNKS).unlink()
+        return segments
+
+    def _read_segments(self, directory: Path, segments: list[dict]) -> tuple[np.ndarray | None, list[dict]]:
+        """Rows and records of the given segments, concatenated."""
+        matrices = []
+        records = []
+        for segment in segments:
+            matrices.append(np.load(directory / f"{segment['name']}.npy"))
+            with open(directory / f"{segment['name']}.json") as f:
+                records += json.load(f)
+        return (np.concatenate(matrices) if matrices else None), records
+
+    def _write_segment(self, directory: Path, embeddings: np.ndarray, records: list[dict]) -> dict:
+        """Write a new segment; it becomes visible once a manifest lists it."""
+        name = f"seg-{uuid.uuid4().hex[:16]}"
+        with open(directory / f"{name}.json", "w") as f:
+            json.dump(records, f)
+        np.save(directory / f"{name}.npy", np.ascontiguousarray(embeddings, dtype=np.float16))
+        return {"name": name, "rows": len(records)}
+
+    def _commit(self, directory: Path, segments: list[dict]) -> None:
+        """Atomically replace the manifest, then drop segments no longer listed.
+
+        Readers that already mapped a dropped segment keep their mapping.
+        """
+        manifest_tmp = directory / f"{MANIFEST}.tmp"
+        with open(manifest_tmp, "w") as f:
+            json.dump({"segments": segments}, f)
+        os.replace(manifest_tmp, directory / MANIFEST)
+
+        listed = {segment["name"] for segment in segments}
+        for path in directory.glob("seg-*"):
+            if path.stem not in listed:
+                path.unlink(missing_ok=True)
+
+    def _rewrite(self, directory: Path, embeddings: np.ndarray, records: list[dict]) -> None:
+        """Replace all of a substrate's segments with one holding these rows."""
+        self._commit(directory, [self._write_segment(directory, embeddings, records)] if records else [])
+
+    def add(
+        self,
+        substrate_id: str,
+        ids: list[str],
+        embeddings: np.ndarray,
+        documents: list[str],
+        metadatas: list[dict],
+    ) -> None:
+        """Append chunks with precomputed embeddings to a substrate."""
+        if not ids:
+            return
+        vectors = _normalize(embeddings)
+        new_records = [
+            {"id": i, "document": d, "metadata": m}
+            for i, d, m in zip(ids, documents, metadatas)
+        ]
+
+        with self._write_lock(substrate_id) as directory:
+            segments = self._segments(directory)
+            # Fold in the newest segments while they are no larger than the
+            # rows being written, like a binary counter: each row is
+            # rewritten O(log n) times in total
+            merged = []
+            while segments and segments[-1]["rows"] <= len(vectors) + sum(m["rows"] for m in merged):
+                merged.insert(0, segments.pop())
+            if merged:
+                current, records = self._read_segments(directory, merged)
+                vectors = np.concatenate([current, vectors])
+                new_records = records + new_records
+            self._commit(directory, segments + [self._write_segment(directory, vectors, new_records)])
+
+    def delete(self, substrate_id: str, knowledge_id: str) -> int:
+        """Remove every chunk of a knowledge entry. Returns rows removed."""
+        if not self._dir(substrate_id).exists():
+            return 0
+        with self._write_lock(substrate_id) as directory:
+            current, records = self._read_segments(directory, self._segments(directory))
+            if current is None:
+                return 0
+            keep = [i for i, r in enumerate(records) if r["metadata"].get("knowledge_id") != knowledge_id]
+            removed = len(records) - len(keep)
+            if removed:
+                self._rewrite(directory, current[keep], [records[i] for i in keep])
+            return removed
+
+    def records(self, substrate_id: str, knowledge_id: str) -> list[dict]:
+        """Chunk records ({"id", "document", "metadata"}) of one knowledge entry."""
+        entry = self._load(substrate_id)
+        if entry is None:
+            return []
+        return [r for r in entry.records if r["metadata"].get("knowledge_id") == knowledge_id]
+
+    def sync(
+        self,
+        substrate_id: str,
+        knowledge_id: str,
+        keep: dict[str, dict],
+        ids: list[str],
+        embeddings: np.ndarray,
+        documents: list[str],
+        metadatas: list[dict],
+    ) -> None:
+        """Replace a knowledge entry's chunks in one write.
+
+        Chunks listed in ``keep`` (id -> new metadata) retain their
+        embeddings, other chunks of the entry are dropped, and the given new
+        chunks are appended.
+        """
+        with self._write_lock(substrate_id) as directory:
+            current, records = self._read_segments(directory, self._segments(directory))
+            rows = []
+            kept_records = []
+            for i, record in enumerate(records):
+                if record["metadata"].get("knowledge_id") != knowledge_id:
+                    rows.append(i)
+                    kept_records.append(record)
+                elif record["id"] in keep:
+                    rows.append(i)
+                    kept_records.append({**record, "metadata": keep[record["id"]]})
+
+            vectors = current[rows] if current is not None else None
+            if ids:
+                added = _normalize(embeddings)
+                vectors = added if vectors is None or not len(vectors) else np.concatenate([vectors, added])
+                kept_records += [
+                    {"id": i, "document": d, "metadata": m}
+                    for i, d, m in zip(ids, documents, metadatas)
+                ]
+            if vectors is None:
+                return
+            self._rewrite(directory, vectors, kept_records)
+
+    def substrate_ids(self) -> list[str]:
+        """Substrates that have an index directory."""
+        if not self.root.exists():
+            return []
+        return [p.name for p in self.root.iterdir() if p.is_dir()]
+
+    def count(self, substrate_id: str) -> int:
+        entry = self._load(substrate_id)
+        return len(entry.records) if entry else 0
+
+    def search(
+        self, substrate_id: str, query_embedding: np.ndarray, n: int
+    ) -> tuple[list[str], list[dict], np.ndarray, np.ndarray]:
+        """Exact top-n by cosine similarity.
+
+        Returns (documents, metadatas, embeddings, similarities), best first.
+        """
+        entry = self._load(substrate_id)
+        if entry is None or not entry.records:
+            return [], [], np.empty((0, 0), dtype=np.float32), np.empty(0, dtype=np.float32)
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1)
+        scores = entry.scores(query)
+
+        n = min(n, len(scores))
+        if n < len(scores):
+            top = np.argpartition(-scores, n - 1)[:n]
+            top = top[np.argsort(-scores[top])]
+        else:
+            top = np.argsort(-scores)
+
+        documents = [entry.records[i]["document"] for i in top]
+        metadatas = [entry.records[i]["metadata"] for i in top]
+        return documents, metadatas, entry.rows(top), scores[top]
@@ -1,3 +1,10 @@
 from .voice_service import VoiceService
+from .job_queue import JobQueue, PermanentJobError, RetryJobLater, enqueue, job_handler, periodic_task
+from .url_cache import get_url_content, normalize_url
+from .extraction_cache import get_step_output, step_key, store_step_output, store_step_outputs
+from .tweet_archive import load_archived_content, sync_tweet_archive
+from .message_batches import BatchStatus, get_batch_client
+from .oauth_state import get_state_store
+from .oauth_tokens import TokenRefreshRejected, refresh_access_token, store_tokens
 
-__all__ = ["VoiceService"]
+__all__ = ["VoiceService", "JobQueue", "PermanentJobError", "RetryJobLater", "enqueue", "job_handler", "periodic_task", "get_url_content", "normalize_url", "get_step_output", "step_key", "store_step_output", "store_step_outputs", "load_archived_content", "sync_tweet_archive", "BatchStatus", "get_batch_client", "get_state_store", "TokenRefreshRejected", "refresh_access_token", "store_tokens"]
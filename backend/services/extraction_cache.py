@@ -0,0 +1,100 @@
+import hashlib
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import metrics
+from config import get_settings
+from db import async_session
+from models import ExtractionStepCache
+from .job_queue import periodic_task
+
+
+def step_key(model: str, messages: list[str], tool: dict | None = None) -> str:
+    """Fingerprint of one extraction LLM call.
+
+    Covers everything that determines the answer: the model, the full
+    prompt (instructions and the processed content) and the tool schema.
+    Editing a step's prompt therefore only invalidates that step.
+    """
+    payload = json.dumps({"model": model, "messages": messages, "tool": tool}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+async def get_step_output(cache_key: str, step: str):
+    """Stored output of an identical earlier call, or None."""
+    async with async_session() as db:
+        entry = (await db.execute(
+            select(ExtractionStepCache).where(ExtractionStepCache.cache_key == cache_key)
+        )).scalar_one_or_none()
+    if entry is None or entry.expires_at <= datetime.utcnow():
+        metrics.increment("extraction_cache_requests", step=step, result="miss")
+        return None
+    metrics.increment("extraction_cache_requests", step=step, result="hit")
+    metrics.increment("extraction_cache_saved_tokens", entry.input_tokens or 0)
+    return entry.output
+
+
+async def store_step_output(cache_key: str, step: str, output, input_tokens: int) -> None:
+    now = datetime.utcnow()
+    ttl = timedelta(days=get_settings().extraction_cache_ttl_days)
+    async with async_session() as db:
+        entry = (await db.execute(
+            select(ExtractionStepCache).where(ExtractionStepCache.cache_key == cache_key)
+        )).scalar_one_or_none()
+        if entry is None:
+            db.add(ExtractionStepCache(
+                cache_key=cache_key,
+                step=step,
+                output=output,
+                input_tokens=input_tokens,
+                created_at=now,
+                expires_at=now + ttl,
+            ))
+        else:
+            entry.output = output
+            entry.input_tokens = input_tokens
+            entry.created_at = now
+            entry.expires_at = now + ttl
+        try:
+            await db.commit()
+        except IntegrityError:
+            # A concurrent run stored the same step first
+            await db.rollback()
+
+
+async def store_step_outputs(db: AsyncSession, step: str, entries: list[tuple[str, object, int]]) -> None:
+    """Store many (cache_key, output, input_tokens) results in the caller's transaction."""
+    if not entries:
+        return
+    now = datetime.utcnow()
+    ttl = timedelta(days=get_settings().extraction_cache_ttl_days)
+    # Replace existing entries in one statement instead of merging row by row
+    await db.execute(
+        delete(ExtractionStepCache).where(ExtractionStepCache.cache_key.in_([key for key, _, _ in entries]))
+    )
+    db.add_all(
+        ExtractionStepCache(
+            cache_key=key,
+            step=step,
+            output=output,
+            input_tokens=input_tokens,
+            created_at=now,
+            expires_at=now + ttl,
+        )
+        for key, output, input_tokens in {key: (key, o, t) for key, o, t in entries}.values()
+    )
+
+
+@periodic_task("extraction_cache_purge", interval=3600)
+async def _purge_expired(db: AsyncSession):
+    """Drop expired step results (safe to run from several processes at once)."""
+    result = await db.execute(
+        delete(ExtractionStepCache).where(ExtractionStepCache.expires_at <= datetime.utcnow())
+    )
+    await db.commit()
+    if result.rowcount:
+        metrics.increment("extraction_cache_purged", result.rowcount)
@@ -0,0 +1,391 @@
+import asyncio
+import logging
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional
+
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import metrics
+from config import get_settings
+from db import async_session
+from models import Job, JobStatus
+
+logger = logging.getLogger(__name__)
+
+
+class PermanentJobError(Exception):
+    """Raised by a handler for failures that retrying cannot fix."""
+
+
+class RetryJobLater(Exception):
+    """Raised by a handler to run the job again after ``delay`` seconds.
+
+    For waits with a known end (e.g. a rate limit window), so unlike a
+    failure it doesn't use up an attempt.
+    """
+
+    def __init__(self, message: str, delay: float):
+        super().__init__(message)
+        self.delay = delay
+
+
+@dataclass
+class JobHandler:
+    func: Callable[..., Awaitable[None]]
+    on_failure: Optional[Callable[..., Awaitable[None]]]
+    workers: int
+    max_attempts: int
+    visibility_timeout: float
+    backoff_base: float
+
+
+_handlers: dict[str, JobHandler] = {}
+
+
+def job_handler(
+    job_type: str,
+    *,
+    on_failure: Optional[Callable[..., Awaitable[None]]] = None,
+    workers: int = 2,
+    max_attempts: int = 3,
+    visibility_timeout: float = 600,
+    backoff_base: float = 10,
+):
+    """Register an async function as the handler for a job type.
+
+    The handler is called as ``func(db=<session>, **payload)`` with a session
+    owned by the job. ``on_failure(db=<session>, error=<str>, **payload)``
+    runs once the job has exhausted its attempts or raised
+    PermanentJobError.
+    """
+
+    def decorator(func):
+        _handlers[job_type] = JobHandler(
+            func=func,
+            on_failure=on_failure,
+            workers=workers,
+            max_attempts=max_attempts,
+            visibility_timeout=visibility_timeout,
+            backoff_base=backoff_base,
+        )
+        return func
+
+    return decorator
+
+
+@dataclass
+class PeriodicTask:
+    func: Callable[..., Awaitable[None]]
+    interval: float
+
+
+_periodic_tasks: dict[str, PeriodicTask] = {}
+
+
+def periodic_task(name: str, *, interval: float):
+    """Register an async function to run every ``interval`` seconds.
+
+    It is called as ``func(db=<session>)`` by every process running a
+    JobQueue, so it must tolerate running concurrently elsewhere (claim rows
+    with a compare-and-set UPDATE, and hand real work to ``enqueue``).
+    """
+
+    def decorator(func):
+        _periodic_tasks[name] = PeriodicTask(func=func, interval=interval)
+        return func
+
+    return decorator
+
+
+_wakeup: dict[str, asyncio.Event] = {}
+
+
+async def enqueue(db: AsyncSession, job_type: str, payload: dict, delay: float = 0) -> Job:
+    """Add a job in the caller's transaction; it becomes visible on commit."""
+    if job_type not in _handlers:
+        raise ValueError(f"No handler registered for job type: {job_type}")
+
+    job = Job(
+        job_type=job_type,
+        payload=payload,
+        max_attempts=_handlers[job_type].max_attempts,
+        run_after=datetime.utcnow() + timedelta(seconds=delay),
+    )
+    db.add(job)
+    await db.flush()
+
+    event = _wakeup.get(job_type)
+    if event is not None:
+        event.set()
+    return job
+
+
+class JobQueue:
+    """Database-backed job queue with a worker pool per job type.
+
+    Workers claim jobs with a compare-and-set UPDATE, so any number of
+    processes can share the table. A claimed job is invisible to other
+    workers until its visibility timeout expires; the running worker keeps
+    extending it while the handler is alive. Jobs left RUNNING by a crashed
+    or restarted process are picked up again once their timeout passes.
+    """
+
+    def __init__(self, concurrency: dict[str, int] | None = None):
+        settings = get_settings()
+        self.concurrency = concurrency if concurrency is not None else settings.get_job_concurrency
+        self.poll_interval = settings.job_poll_interval
+        self._tasks: list[asyncio.Task] = []
+
+    async def start(self) -> None:
+        for job_type, handler in _handlers.items():
+            workers = self.concurrency.get(job_type, handler.workers)
+            _wakeup[job_type] = asyncio.Event()
+            for i in range(workers):
+                self._tasks.append(asyncio.create_task(self._worker(job_type), name=f"job-worker-{job_type}-{i}"))
+        workers = len(self._tasks)
+        for name, task in _periodic_tasks.items():
+            self._tasks.append(asyncio.create_task(self._run_periodic(name, task), name=f"periodic-{name}"))
+        self._tasks.append(asyncio.create_task(self._supervise(), name="job-supervisor"))
+        logger.info(f"Job queue started with {workers} workers and {len(_periodic_tasks)} periodic tasks")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    async def _worker(self, job_type: str) -> None:
+        handler = _handlers[job_type]
+        event = _wakeup[job_type]
+        while True:
+            try:
+                job = await self._claim(job_type, handler)
+            except Exception as e:
+                logger.error(f"Failed to claim {job_type} job: {e}")
+                job = None
+
+            if job is None:
+                event.clear()
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._run(job, handler)
+
+    async def _claim(self, job_type: str, handler: JobHandler) -> Job | None:
+        """Atomically move one due job to RUNNING. Returns None if none is due."""
+        async with async_session() as db:
+            now = datetime.utcnow()
+            candidate = (
+                await db.execute(
+                    select(Job.id, Job.status, Job.attempts)
+                    .where(
+                        Job.job_type == job_type,
+                        Job.attempts < Job.max_attempts,
+                        or_(
+                            and_(Job.status == JobStatus.QUEUED, Job.run_after <= now),
+                            and_(Job.status == JobStatus.RUNNING, Job.locked_until < now),
+                        ),
+                    )
+                    .order_by(Job.run_after)
+                    .limit(1)
+                )
+            ).first()
+            if candidate is None:
+                return None
+
+            claimed = await db.execute(
+                update(Job)
+                .where(Job.id == candidate.id, Job.status == candidate.status, Job.attempts == candidate.attempts)
+                .values(
+                    status=JobStatus.RUNNING,
+                    attempts=candidate.attempts + 1,
+                    locked_until=now + timedelta(seconds=handler.visibility_timeout),
+                    started_at=now,
+                )
+            )
+            await db.commit()
+            if claimed.rowcount != 1:
+                return None  # Another worker won the race
+
+            job = (await db.execute(select(Job).where(Job.id == candidate.id))).scalar_one()
+            if candidate.status == JobStatus.RUNNING:
+                logger.warning(f"Recovered {job_type} job {job.id} after visibility timeout")
+            metrics.observe("job_wait_seconds", (now - job.run_after).total_seconds(), job_type=job_type)
+            return job
+
+    async def _heartbeat(self, job: Job, handler: JobHandler) -> None:
+        """Keep extending the visibility timeout while the handler runs.
+
+        A failed extension (e.g. the database briefly unreachable) is logged
+        and tried again next beat; the lock lapses only after a full
+        visibility timeout without one succeeding.
+        """
+        while True:
+            await asyncio.sleep(handler.visibility_timeout / 3)
+            try:
+                async with async_session() as db:
+                    await db.execute(
+                        update(Job)
+                        .where(Job.id == job.id, Job.status == JobStatus.RUNNING)
+                        .values(locked_until=datetime.utcnow() + timedelta(seconds=handler.visibility_timeout))
+                    )
+                    await db.commit()
+            except Exception as e:
+                logger.error(f"Failed to extend {job.job_type} job {job.id}: {e}")
+
+    async def _run(self, job: Job, handler: JobHandler) -> None:
+        heartbeat = asyncio.create_task(self._heartbeat(job, handler))
+        started = datetime.utcnow()
+        error: Exception | None = None
+        try:
+            async with async_session() as db:
+                await handler.func(db=db, **job.payload)
+                await db.commit()
+        except asyncio.CancelledError:
+            # Shutting down: hand the job back without charging an attempt
+            await asyncio.shield(self._release(job))
+            raise
+        except Exception as e:
+            error = e
+        finally:
+            heartbeat.cancel()
+
+        duration = (datetime.utcnow() - started).total_seconds()
+        metrics.observe("job_duration_seconds", duration, job_type=job.job_type)
+
+        if error is None:
+            await self._finish(job, JobStatus.SUCCEEDED)
+            metrics.increment("jobs_total", job_type=job.job_type, outcome="succeeded")
+            return
+
+        if isinstance(error, RetryJobLater):
+            logger.info(f"{job.job_type} job {job.id} deferred for {error.delay:.0f}s: {error}")
+            await self._retry(job, str(error), error.delay, charge_attempt=False)
+            metrics.increment("jobs_total", job_type=job.job_type, outcome="deferred")
+            return
+
+        permanent = isinstance(error, PermanentJobError)
+        if not permanent and job.attempts < handler.max_attempts:
+            delay = handler.backoff_base * (2 ** (job.attempts - 1)) * random.uniform(0.8, 1.2)
+            logger.warning(
+                f"{job.job_type} job {job.id} failed (attempt {job.attempts}/{handler.max_attempts}), "
+                f"retrying in {delay:.0f}s: {error}"
+            )
+            await self._retry(job, str(error), delay)
+            metrics.increment("jobs_total", job_type=job.job_type, outcome="retried")
+            return
+
+        logger.error(f"{job.job_type} job {job.id} failed permanently: {error}")
+        await self._fail(job, handler, str(error))
+
+    async def _release(self, job: Job) -> None:
+        async with async_session() as db:
+            await db.execute(
+                update(Job)
+                .where(Job.id == job.id, Job.status == JobStatus.RUNNING)
+                .values(status=JobStatus.QUEUED, attempts=Job.attempts - 1, locked_until=None, run_after=datetime.utcnow())
+            )
+            await db.commit()
+
+    async def _finish(self, job: Job, status: JobStatus, error: str | None = None, expired_only: bool = False) -> bool:
+        """Record a terminal status. With ``expired_only`` this only succeeds
+        if the job is still RUNNING past its timeout, so concurrent
+        supervisors don't fail the same job twice."""
+        now = datetime.utcnow()
+        conditions = [Job.id == job.id]
+        if expired_only:
+            conditions += [Job.status == JobStatus.RUNNING, Job.locked_until < now]
+        async with async_session() as db:
+            result = await db.execute(
+                update(Job)
+                .where(*conditions)
+                .values(status=status, locked_until=None, finished_at=now, last_error=error)
+            )
+            await db.commit()
+        return result.rowcount == 1
+
+    async def _retry(self, job: Job, error: str, delay: float, charge_attempt: bool = True) -> None:
+        async with async_session() as db:
+            await db.execute(
+                update(Job)
+                .where(Job.id == job.id)
+                .values(
+                    status=JobStatus.QUEUED,
+                    attempts=Job.attempts if charge_attempt else Job.attempts - 1,
+                    locked_until=None,
+                    last_error=error,
+                    run_after=datetime.utcnow() + timedelta(seconds=delay),
+                )
+            )
+            await db.commit()
+
+    async def _fail(self, job: Job, handler: JobHandler, error: str, expired_only: bool = False) -> None:
+        if not await self._finish(job, JobStatus.FAILED, error, expired_only=expired_only):
+            return
+        metrics.increment("jobs_total", job_type=job.job_type, outcome="failed")
+        if handler.on_failure is None:
+            return
+        try:
+            async with async_session() as db:
+                await handler.on_failure(db=db, error=error, **job.payload)
+                await db.commit()
+        except Exception as e:
+            logger.error(f"on_failure hook for {job.job_type} job {job.id} failed: {e}")
+
+    async def _run_periodic(self, name: str, task: PeriodicTask) -> None:
+        # Random start offset so processes started together don't run in step
+        await asyncio.sleep(random.uniform(0, task.interval))
+        while True:
+            try:
+                async with async_session() as db:
+                    await task.func(db=db)
+                    await db.commit()
+            except Exception as e:
+                logger.error(f"Periodic task {name} failed: {e}")
+            await asyncio.sleep(task.interval)
+
+    async def _supervise(self) -> None:
+        """Fail jobs that timed out on their last attempt and publish queue depth."""
+        while True:
+            try:
+                await self._reap_exhausted()
+                await self._publish_depth()
+            except Exception as e:
+                logger.error(f"Job supervisor error: {e}")
+            await asyncio.sleep(max(self.poll_interval, 5))
+
+    async def _reap_exhausted(self) -> None:
+        async with async_session() as db:
+            result = await db.execute(
+                select(Job).where(
+                    Job.status == JobStatus.RUNNING,
+                    Job.locked_until < datetime.utcnow(),
+                    Job.attempts >= Job.max_attempts,
+                )
+            )
+            jobs = result.scalars().all()
+        for job in jobs:
+            handler = _handlers.get(job.job_type)
+            if handler is not None:
+                logger.error(f"{job.job_type} job {job.id} timed out on its final attempt")
+                await self._fail(job, handler, "Timed out", expired_only=True)
+
+    async def _publish_depth(self) -> None:
+        async with async_session() as db:
+            result = await db.execute(
+                select(Job.job_type, Job.status, func.count())
+                .where(Job.status.in_([JobStatus.QUEUED, JobStatus.RUNNING]))
+                .group_by(Job.job_type, Job.status)
+            )
+            counts = {(job_type, status): count for job_type, status, count in result.all()}
+        for job_type in _handlers:
+            for status in (JobStatus.QUEUED, JobStatus.RUNNING):
+                metrics.set_gauge(
+                    "job_queue_depth", counts.get((job_type, status), 0), job_type=job_type, status=status.value
+                )
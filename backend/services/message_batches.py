@@ -0,0 +1,117 @@
+"""Message Batches clients for bulk, non-interactive LLM work.
+
+Batches are processed asynchronously (usually within an hour, at most a
+day), billed at half the per-token price and on their own rate limit, so
+bulk re-extraction doesn't slow down live chat. ``get_batch_client()``
+returns the client picked by the ``extraction_batch_backend`` setting:
+"anthropic" for the Message Batches API, or "local", an in-process stand-in
+that answers each request itself, for development and tests.
+
+Both expose the same three calls and plain-dict results:
+
+    batch_id = await client.submit([{"custom_id": ..., "params": {...}}])
+    status = await client.status(batch_id)  # BatchStatus
+    async for custom_id, result in client.results(batch_id): ...
+
+``result`` has the API's shape: {"type": "succeeded", "message": {...}}, or
+a type of "errored", "canceled" or "expired".
+"""
+import asyncio
+import uuid
+from dataclasses import dataclass
+from typing import AsyncIterator, Awaitable, Callable
+
+import anthropic
+
+from config import get_settings
+
+
+@dataclass
+class BatchStatus:
+    ended: bool
+    counts: dict[str, int]  # processing / succeeded / errored / canceled / expired
+
+
+class AnthropicBatchClient:
+    """Anthropic Message Batches API."""
+
+    def __init__(self):
+        self.client = anthropic.AsyncAnthropic(api_key=get_settings().anthropic_api_key)
+
+    async def submit(self, requests: list[dict]) -> str:
+        batch = await self.client.messages.batches.create(requests=requests)
+        return batch.id
+
+    async def status(self, batch_id: str) -> BatchStatus:
+        batch = await self.client.messages.batches.retrieve(batch_id)
+        return BatchStatus(ended=batch.processing_status == "ended", counts=batch.request_counts.model_dump())
+
+    async def results(self, batch_id: str) -> AsyncIterator[tuple[str, dict]]:
+        async for entry in await self.client.messages.batches.results(batch_id):
+            yield entry.custom_id, entry.result.model_dump()
+
+
+class LocalBatchClient:
+    """In-process stand-in for the Message Batches API.
+
+    Each request is answered by ``respond(params) -> message dict`` as soon
+    as the batch is submitted, a few at a time. By default that is a live
+    Messages API call (no batch discount); tests pass a fake. Batches only
+    exist in the submitting process, so run it with a single process.
+    """
+
+    def __init__(self, respond: Callable[[dict], Awaitable[dict]] | None = None, concurrency: int = 4):
+        self.respond = respond or self._create_message
+        self.concurrency = concurrency
+        self._batches: dict[str, dict] = {}
+        self._client = None
+
+    async def _create_message(self, params: dict) -> dict:
+        if self._client is None:
+            self._client = anthropic.AsyncAnthropic(api_key=get_settings().anthropic_api_key)
+        return (await self._client.messages.create(**params)).model_dump()
+
+    async def submit(self, requests: list[dict]) -> str:
+        batch_id = f"local_{uuid.uuid4().hex}"
+        batch = {"results": {}, "total": len(requests)}
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def answer(request: dict) -> None:
+            async with semaphore:
+                try:
+                    result = {"type": "succeeded", "message": await self.respond(request["params"])}
+                except Exception as e:
+                    result = {"type": "errored", "error": {"type": "api_error", "message": str(e)}}
+            batch["results"][request["custom_id"]] = result
+
+        batch["task"] = asyncio.gather(*(answer(r) for r in requests))
+        self._batches[batch_id] = batch
+        return batch_id
+
+    async def status(self, batch_id: str) -> BatchStatus:
+        batch = self._batches[batch_id]
+        counts = {"processing": batch["total"] - len(batch["results"]), "succeeded": 0, "errored": 0, "canceled": 0, "expired": 0}
+        for result in batch["results"].values():
+            counts[result["type"]] += 1
+        return BatchStatus(ended=counts["processing"] == 0, counts=counts)
+
+    async def results(self, batch_id: str) -> AsyncIterator[tuple[str, dict]]:
+        for custom_id, result in list(self._batches[batch_id]["results"].items()):
+            yield custom_id, result
+
+
+_client = None
+
+
+def get_batch_client():
+    """This process's batch client, per the extraction_batch_backend setting."""
+    global _client
+    if _client is None:
+        backend = get_settings().extraction_batch_backend
+        if backend == "local":
+            _client = LocalBatchClient()
+        elif backend == "anthropic":
+            _client = AnthropicBatchClient()
+        else:
+            raise ValueError(f"Unknown extraction batch backend: {backend}")
+    return _client
@@ -0,0 +1,101 @@
+"""Pending OAuth states, from the authorize redirect until the callback.
+
+Two stores behind the same interface, picked by the ``oauth_state_store``
+setting:
+
+- "memory": a dict plus a min-heap of expiry times, so expired states are
+  dropped in O(log n) each instead of scanning every state per request.
+  Only valid with a single API process, since the callback has to land on
+  the process that handled the authorize call.
+- "database": a table indexed on expiry, shared by every process.
+
+A state can be popped once; expired states are never returned.
+"""
+import heapq
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import get_settings
+from db import async_session
+from models import OAuthState
+from .job_queue import periodic_task
+
+
+class MemoryStateStore:
+    """Single-process store with heap-ordered expiry."""
+
+    def __init__(self):
+        self._states: dict[str, tuple[dict, float]] = {}
+        self._expiry: list[tuple[float, str]] = []
+
+    def _expire(self, now: float) -> None:
+        while self._expiry and self._expiry[0][0] <= now:
+            expires_at, state = heapq.heappop(self._expiry)
+            entry = self._states.get(state)
+            if entry and entry[1] == expires_at:
+                del self._states[state]
+
+    async def put(self, state: str, data: dict, ttl: float) -> None:
+        now = time.monotonic()
+        self._expire(now)
+        self._states[state] = (data, now + ttl)
+        heapq.heappush(self._expiry, (now + ttl, state))
+
+    async def pop(self, state: str) -> dict | None:
+        now = time.monotonic()
+        self._expire(now)
+        entry = self._states.pop(state, None)
+        # Its heap entry is skipped when it comes up
+        return entry[0] if entry else None
+
+
+class DatabaseStateStore:
+    """Store shared by every API process through the oauth_states table."""
+
+    async def put(self, state: str, data: dict, ttl: float) -> None:
+        now = datetime.utcnow()
+        async with async_session() as db:
+            db.add(OAuthState(state=state, data=data, created_at=now, expires_at=now + timedelta(seconds=ttl)))
+            await db.commit()
+
+    async def pop(self, state: str) -> dict | None:
+        async with async_session() as db:
+            entry = (await db.execute(
+                select(OAuthState.data, OAuthState.expires_at).where(OAuthState.state == state)
+            )).one_or_none()
+            if entry is None:
+                return None
+            # Only the caller whose delete succeeds gets the state, so a
+            # replayed callback can't use it twice
+            deleted = await db.execute(delete(OAuthState).where(OAuthState.state == state))
+            await db.commit()
+        if deleted.rowcount != 1 or entry.expires_at <= datetime.utcnow():
+            return None
+        return entry.data
+
+
+@periodic_task("oauth_state_purge", interval=600)
+async def _purge_expired(db: AsyncSession):
+    """Drop abandoned authorizations from the shared store."""
+    await db.execute(delete(OAuthState).where(OAuthState.expires_at <= datetime.utcnow()))
+    await db.commit()
+
+
+_store = None
+
+
+def get_state_store():
+    """This process's OAuth state store, per the oauth_state_store setting."""
+    global _store
+    if _store is None:
+        kind = get_settings().oauth_state_store
+        if kind == "memory":
+            _store = MemoryStateStore()
+        elif kind == "database":
+            _store = DatabaseStateStore()
+        else:
+            raise ValueError(f"Unknown OAuth state store: {kind}")
+    return _store
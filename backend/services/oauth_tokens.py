@@ -0,0 +1,72 @@
+"""Twitter OAuth 2.0 token storage and refresh.
+
+Access tokens last about two hours. The refresh token granted with the
+offline.access scope buys a new pair, and is itself replaced on every use.
+api/oauth.py schedules refreshes shortly before expiry; extraction also
+refreshes inline if a token has expired anyway.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import metrics
+from config import get_settings
+from http_clients import get_client
+from models import SocialAccount
+
+TOKEN_URL = "https://api.twitter.com/2/oauth2/token"
+
+
+class TokenRefreshRejected(Exception):
+    """Twitter refused the refresh token; the account has to be reconnected."""
+
+
+def store_tokens(account: SocialAccount, tokens: dict) -> None:
+    """Save a token endpoint response on the account and schedule its next refresh."""
+    account.set_access_token(tokens["access_token"])
+    if tokens.get("refresh_token"):
+        account.set_refresh_token(tokens["refresh_token"])
+    expires_at = datetime.utcnow() + timedelta(seconds=tokens.get("expires_in", 7200))
+    account.token_expires_at = expires_at
+    account.token_refresh_at = (
+        expires_at - timedelta(seconds=get_settings().oauth_refresh_lead_seconds)
+        if account.encrypted_refresh_token
+        else None
+    )
+
+
+async def refresh_access_token(db: AsyncSession, account: SocialAccount) -> None:
+    """Exchange the account's refresh token for a new token pair and commit it.
+
+    Raises TokenRefreshRejected if Twitter refuses the refresh token (the
+    stored one is then cleared), or httpx errors on transient failures.
+    """
+    refresh_token = account.get_refresh_token()
+    if not refresh_token:
+        raise TokenRefreshRejected(f"No refresh token for account {account.id}")
+
+    settings = get_settings()
+    response = await get_client("twitter").post(
+        TOKEN_URL,
+        data={
+            "grant_type": "refresh_token",
+            "refresh_token": refresh_token,
+            "client_id": settings.twitter_client_id,
+        },
+        auth=(settings.twitter_client_id, settings.twitter_client_secret),
+    )
+    if response.status_code in (400, 401):
+        # Refresh tokens are single use; another process may have just used it
+        await db.refresh(account)
+        if account.get_refresh_token() != refresh_token:
+            return
+        account.set_refresh_token(None)
+        account.token_refresh_at = None
+        await db.commit()
+        metrics.increment("oauth_token_refreshes", result="rejected")
+        raise TokenRefreshRejected(f"Refresh token for account {account.id} rejected: {response.text}")
+    response.raise_for_status()
+
+    store_tokens(account, response.json())
+    await db.commit()
+    metrics.increment("oauth_token_refreshes", result="refreshed")
@@ -0,0 +1,73 @@
+from datetime import datetime
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import metrics
+from models import ArchivedTweet, SocialAccount
+
+
+def _parse_created_at(value: str | None) -> datetime | None:
+    if not value:
+        return None
+    # Twitter sends ISO 8601 in UTC ("2024-05-01T12:00:00.000Z"); stored naive like the rest
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).replace(tzinfo=None)
+
+
+async def sync_tweet_archive(db: AsyncSession, account: SocialAccount, fetcher, max_tweets: int) -> int:
+    """Archive the account's tweets posted since the last sync.
+
+    Only tweets newer than ``account.since_id`` are requested (the first
+    sync takes the latest ``max_tweets``). If more than ``max_tweets`` were
+    posted since, the older ones in between are skipped. Also refreshes
+    the stored profile. Returns the number of newly archived tweets.
+    """
+    content = await fetcher.get_content_for_extraction(max_tweets=max_tweets, since_id=account.since_id)
+    tweets = [t for t in content.get("tweets", []) if t.get("id") and t.get("text")]
+
+    new = []
+    if tweets:
+        existing = set((await db.execute(
+            select(ArchivedTweet.tweet_id).where(
+                ArchivedTweet.social_account_id == account.id,
+                ArchivedTweet.tweet_id.in_([t["id"] for t in tweets]),
+            )
+        )).scalars())
+        new = [t for t in tweets if t["id"] not in existing]
+        db.add_all(
+            ArchivedTweet(
+                social_account_id=account.id,
+                tweet_id=t["id"],
+                text=t["text"],
+                created_at=_parse_created_at(t.get("created_at")),
+                public_metrics=t.get("public_metrics"),
+                conversation_id=t.get("conversation_id"),
+                in_reply_to_user_id=t.get("in_reply_to_user_id"),
+            )
+            for t in new
+        )
+        # Snowflake ids grow over time; compare numerically, not as strings
+        account.since_id = max([t["id"] for t in tweets] + ([account.since_id] if account.since_id else []), key=int)
+
+    if content.get("user"):
+        account.profile = content["user"]
+    account.tweets_synced_at = datetime.utcnow()
+    await db.commit()
+
+    metrics.increment("tweet_archive_new_tweets", len(new))
+    return len(new)
+
+
+async def load_archived_content(db: AsyncSession, account: SocialAccount, max_tweets: int) -> dict:
+    """The account's latest archived tweets and profile, shaped like a live fetch."""
+    rows = (await db.execute(
+        select(ArchivedTweet)
+        .where(ArchivedTweet.social_account_id == account.id)
+        .order_by(ArchivedTweet.created_at.desc())
+        .limit(max_tweets)
+    )).scalars().all()
+    return {
+        "user": account.profile or {},
+        "tweets": [row.to_tweet() for row in rows],
+        "platform": account.platform,
+    }
@@ -0,0 +1,209 @@
+import asyncio
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import httpx
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+import metrics
+from config import get_settings
+from db import async_session
+from http_clients import get_client, host_slot, is_blocked
+from models import UrlContentCache
+
+logger = logging.getLogger(__name__)
+
+# Click and campaign ids added by ad and social platforms, which never
+# change page content (utm_* too). Generic names such as "ref" are kept:
+# on many sites they select content (e.g. a git ref).
+_TRACKING_PARAMS = {"fbclid", "gclid", "dclid", "msclkid", "mc_cid", "mc_eid", "igshid"}
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+# Concurrent requests for the same URL in this process share one extraction
+_inflight: dict[str, asyncio.Future] = {}
+
+
+def normalize_url(url: str) -> str:
+    """Canonical form of a URL for cache lookups.
+
+    Lowercases scheme and host, drops default ports, fragments and tracking
+    parameters, and sorts the query string by name. The path, including any
+    trailing slash, is kept as is: /docs and /docs/ can be different pages.
+    """
+    parts = urlsplit(url.strip())
+    scheme = (parts.scheme or "https").lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != _DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+
+    query = sorted(
+        (
+            (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+            if not k.lower().startswith("utm_") and k.lower() not in _TRACKING_PARAMS
+        ),
+        # Repeated parameters keep their order, which can be significant
+        key=lambda item: item[0],
+    )
+    path = parts.path or "/"
+
+    return urlunsplit((scheme, host, path, urlencode(query), ""))
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+async def _probe(url: str, entry: UrlContentCache) -> tuple[int, str | None, str | None]:
+    """Conditional GET that only reads headers.
+
+    Goes through the "web" client like the extraction itself, so it only
+    connects to public addresses. Returns (status_code, etag,
+    last_modified). A 304 means the cached copy is still current.
+    """
+    headers = {}
+    if entry.etag:
+        headers["If-None-Match"] = entry.etag
+    if entry.last_modified:
+        headers["If-Modified-Since"] = entry.last_modified
+
+    async with host_slot(url), get_client("web").stream("GET", url, headers=headers, timeout=10.0) as response:
+        return (
+            response.status_code,
+            response.headers.get("etag"),
+            response.headers.get("last-modified"),
+        )
+
+
+def _is_unchanged(entry: UrlContentCache, status: int, etag: str | None, last_modified: str | None) -> bool:
+    if status == 304:
+        return True
+    # Some servers ignore conditional headers but still send stable validators
+    if status == 200 and entry.etag and etag == entry.etag:
+        return True
+    return bool(status == 200 and not etag and entry.last_modified and last_modified == entry.last_modified)
+
+
+async def _load(url_key: str) -> UrlContentCache | None:
+    async with async_session() as db:
+        result = await db.execute(select(UrlContentCache).where(UrlContentCache.url_key == url_key))
+        return result.scalar_one_or_none()
+
+
+async def _store(url_key: str, url: str, fetched: dict, etag: str | None, last_modified: str | None) -> None:
+    ttl = timedelta(seconds=get_settings().url_cache_ttl_seconds)
+    now = datetime.utcnow()
+    values = {
+        "url": url,
+        "title": fetched["title"],
+        "content": fetched["content"],
+        "content_hash": content_hash(fetched["content"]),
+        "etag": etag,
+        "last_modified": last_modified,
+        "fetched_at": now,
+        "expires_at": now + ttl,
+    }
+    async with async_session() as db:
+        entry = (await db.execute(select(UrlContentCache).where(UrlContentCache.url_key == url_key))).scalar_one_or_none()
+        if entry is None:
+            db.add(UrlContentCache(url_key=url_key, **values))
+        else:
+            for key, value in values.items():
+                setattr(entry, key, value)
+        try:
+            await db.commit()
+        except IntegrityError:
+            # Another worker cached the same URL first; its copy is as good
+            await db.rollback()
+
+
+async def _extend(url_key: str) -> None:
+    ttl = timedelta(seconds=get_settings().url_cache_ttl_seconds)
+    async with async_session() as db:
+        entry = (await db.execute(select(UrlContentCache).where(UrlContentCache.url_key == url_key))).scalar_one_or_none()
+        if entry is not None:
+            entry.expires_at = datetime.utcnow() + ttl
+            await db.commit()
+
+
+def _as_result(entry: UrlContentCache, cache: str) -> dict:
+    return {
+        "title": entry.title,
+        "content": entry.content,
+        "error": None,
+        "content_hash": entry.content_hash,
+        "cache": cache,
+    }
+
+
+async def _get_url_content(
+    url: str, url_key: str, extract: Callable[[str], Awaitable[dict]], revalidate: bool
+) -> dict:
+    entry = await _load(url_key)
+    if entry is not None and not revalidate and entry.expires_at > datetime.utcnow():
+        metrics.increment("url_cache_requests", result="hit")
+        return _as_result(entry, "hit")
+
+    etag = last_modified = None
+    # Without a cached copy there is nothing to revalidate, and the
+    # extraction's own response carries the validators
+    if entry is not None:
+        try:
+            status, etag, last_modified = await _probe(url, entry)
+            if _is_unchanged(entry, status, etag, last_modified):
+                await _extend(url_key)
+                metrics.increment("url_cache_requests", result="revalidated")
+                return _as_result(entry, "revalidated")
+        except httpx.HTTPError as e:
+            if is_blocked(e):
+                return {"title": None, "content": "", "error": f"URL not allowed: {e}", "blocked": True}
+            # The extractor may still be able to reach the page (e.g. web_fetch)
+            logger.info(f"Could not revalidate {url}: {e}")
+
+    metrics.increment("url_cache_requests", result="miss")
+    fetched = await extract(url)
+    if fetched["error"]:
+        return fetched
+
+    # Extractors that fetched the page themselves report its validators
+    etag = fetched.get("etag") or etag
+    last_modified = fetched.get("last_modified") or last_modified
+    await _store(url_key, url, fetched, etag, last_modified)
+    return {**fetched, "content_hash": content_hash(fetched["content"]), "cache": "miss"}
+
+
+async def get_url_content(url: str, extract: Callable[[str], Awaitable[dict]], revalidate: bool = False) -> dict:
+    """Return extracted content for a URL, reusing the shared cache.
+
+    Fresh entries are returned as-is. Stale entries (or any entry, with
+    ``revalidate``) are revalidated with a conditional GET (ETag /
+    Last-Modified) and only re-extracted with ``extract`` when the page
+    actually changed; uncached URLs go straight to ``extract``. Returns
+    the same shape as the extractors ({"title", "content", "error"}) plus
+    "content_hash" and "cache" ("hit", "revalidated" or "miss").
+    """
+    url_key = hashlib.sha256(normalize_url(url).encode()).hexdigest()
+
+    inflight = _inflight.get(url_key)
+    if inflight is not None:
+        return await asyncio.shield(inflight)
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[url_key] = future
+    try:
+        result = await _get_url_content(url, url_key, extract, revalidate)
+        future.set_result(result)
+        return result
+    except Exception as e:
+        future.set_exception(e)
+        raise
+    finally:
+        del _inflight[url_key]
+        if not future.done():
+            future.cancel()
+        # Avoid "exception was never retrieved" when nobody else was waiting
+        if future.done() and not future.cancelled():
+            future.exception()
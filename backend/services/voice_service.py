@@ -1,39 +1,69 @@
 import base64
-from elevenlabs import ElevenLabs
+import os
+from typing import AsyncIterator
+
+from elevenlabs import AsyncElevenLabs
+
 from config import get_settings
+from http_clients import get_client
+
+TTS_MODEL = "eleven_multilingual_v2"
+TTS_FORMAT = "mp3_44100_128"
+
+# SDK client bound to the shared "elevenlabs" connection pool; rebuilt if
+# that pool is replaced (http_clients.close() and a later get_client())
+_client: tuple[object, AsyncElevenLabs] | None = None
+
+
+def _get_client() -> AsyncElevenLabs:
+    global _client
+    http_client = get_client("elevenlabs")
+    if _client is None or _client[0] is not http_client:
+        sdk = AsyncElevenLabs(api_key=get_settings().elevenlabs_api_key, httpx_client=http_client)
+        _client = (http_client, sdk)
+    return _client[1]
 
 
 class VoiceService:
-    """Wrapper around ElevenLabs SDK for voice cloning and TTS."""
+    """Async wrapper around the ElevenLabs SDK for voice cloning and TTS.
+
+    Calls go through the SDK's async client, so they never block the event
+    loop, and every VoiceService in the process shares one client and its
+    keep-alive connections.
+    """
 
     def __init__(self):
-        settings = get_settings()
-        self.client = ElevenLabs(api_key=settings.elevenlabs_api_key)
+        self.client = _get_client()
 
-    def create_voice_clone(self, name: str, audio_file_path: str) -> str:
+    async def create_voice_clone(self, name: str, audio_file_path: str) -> str:
         """Create an instant voice clone from an audio file. Returns the voice_id."""
-        voice = self.client.voices.ivc.create(
-            name=name,
-            files=[audio_file_path],
-        )
+        # The file is streamed from disk into the request body
+        with open(audio_file_path, "rb") as audio:
+            voice = await self.client.voices.ivc.create(
+                name=name,
+                files=[(os.path.basename(audio_file_path), audio)],
+            )
         return voice.voice_id
 
-    def text_to_speech(self, voice_id: str, text: str) -> bytes:
-        """Convert text to speech using a cloned voice. Returns MP3 bytes."""
-        audio_iterator = self.client.text_to_speech.convert(
+    async def stream_speech(self, voice_id: str, text: str) -> AsyncIterator[bytes]:
+        """Speak text in a cloned voice, yielding MP3 chunks as they arrive."""
+        async for chunk in self.client.text_to_speech.stream(
             voice_id=voice_id,
             text=text,
-            model_id="eleven_multilingual_v2",
-            output_format="mp3_44100_128",
-        )
-        # convert() returns an iterator of bytes chunks
-        return b"".join(audio_iterator)
+            model_id=TTS_MODEL,
+            output_format=TTS_FORMAT,
+        ):
+            yield chunk
+
+    async def text_to_speech(self, voice_id: str, text: str) -> bytes:
+        """Convert text to speech using a cloned voice. Returns MP3 bytes."""
+        return b"".join([chunk async for chunk in self.stream_speech(voice_id, text)])
 
-    def text_to_speech_base64(self, voice_id: str, text: str) -> str:
+    async def text_to_speech_base64(self, voice_id: str, text: str) -> str:
         """Convert text to speech and return as base64-encoded string."""
-        audio_bytes = self.text_to_speech(voice_id, text)
+        audio_bytes = await self.text_to_speech(voice_id, text)
         return base64.b64encode(audio_bytes).decode("utf-8")
 
-    def delete_voice(self, voice_id: str) -> None:
+    async def delete_voice(self, voice_id: str) -> None:
         """Delete a voice clone from ElevenLabs."""
-        self.client.voices.delete(voice_id=voice_id)
+        await self.client.voices.delete(voice_id=voice_id)
@@ -0,0 +1,12 @@
+import os
+import tempfile
+
+from cryptography.fernet import Fernet
+
+# Settings are read at import time (db.py builds its engine from them), so the
+# test environment has to be in place before any app module is imported
+_data_dir = tempfile.mkdtemp(prefix="substrate-tests-")
+os.environ.setdefault("ANTHROPIC_API_KEY", "test")
+os.environ.setdefault("TOKEN_ENCRYPTION_KEY", Fernet.generate_key().decode())
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_data_dir}/test.db")
+os.environ.setdefault("VECTORSTORE_DATA_PATH", os.path.join(_data_dir, "chroma"))
@@ -0,0 +1,31 @@
+"""API process for test_oauth_state.py, with Twitter's OAuth endpoints mocked.
+
+    python tests/oauth_server.py PORT
+
+Settings (database, state store) come from the environment.
+"""
+import sys
+
+import httpx
+import uvicorn
+
+import http_clients
+from main import app
+
+
+def twitter(request: httpx.Request) -> httpx.Response:
+    if request.url.path == "/2/oauth2/token":
+        return httpx.Response(200, json={
+            "access_token": "access-token",
+            "refresh_token": "refresh-token",
+            "expires_in": 7200,
+        })
+    if request.url.path == "/2/users/me":
+        return httpx.Response(200, json={"data": {"id": "42", "username": "shadow"}})
+    return httpx.Response(404)
+
+
+if __name__ == "__main__":
+    # The lifespan keeps an already open client, so this one is used throughout
+    http_clients._clients["twitter"] = httpx.AsyncClient(transport=httpx.MockTransport(twitter))
+    uvicorn.run(app, host="127.0.0.1", port=int(sys.argv[1]), log_level="warning")
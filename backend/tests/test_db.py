@@ -0,0 +1,48 @@
+from sqlalchemy import create_engine, inspect, select
+
+import models  # noqa: F401 - registers every table on Base.metadata
+from db import Base, upgrade_schema
+from models import Knowledge, SocialAccount
+
+
+def test_upgrade_schema_adds_new_nullable_columns(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        # Tables as created by an older version, before the refresh and archive columns
+        conn.exec_driver_sql(
+            "CREATE TABLE substrates (id VARCHAR PRIMARY KEY, owner_wallet VARCHAR NOT NULL, display_name VARCHAR NOT NULL)"
+        )
+        conn.exec_driver_sql(
+            "CREATE TABLE knowledge (id VARCHAR PRIMARY KEY, substrate_id VARCHAR NOT NULL, source_type VARCHAR(4) NOT NULL, "
+            "source_url VARCHAR, title VARCHAR, content TEXT, chunk_count INTEGER, status VARCHAR(10), "
+            "error_message TEXT, created_at DATETIME, updated_at DATETIME)"
+        )
+        conn.exec_driver_sql(
+            "CREATE TABLE social_accounts (id VARCHAR PRIMARY KEY, substrate_id VARCHAR NOT NULL, platform VARCHAR NOT NULL, "
+            "platform_user_id VARCHAR, username VARCHAR, encrypted_access_token TEXT, encrypted_refresh_token TEXT, "
+            "token_expires_at DATETIME, connected_at DATETIME)"
+        )
+        conn.exec_driver_sql(
+            "INSERT INTO knowledge (id, substrate_id, source_type, content) VALUES ('k1', 's1', 'TEXT', 'Old entry')"
+        )
+
+    with engine.begin() as conn:
+        Base.metadata.create_all(conn)
+        upgrade_schema(conn)
+
+    inspector = inspect(engine)
+    knowledge_columns = {column["name"] for column in inspector.get_columns("knowledge")}
+    assert {"content_hash", "refresh_interval_hours", "next_refresh_at"} <= knowledge_columns
+    account_columns = {column["name"] for column in inspector.get_columns("social_accounts")}
+    assert {"token_refresh_at", "since_id", "tweets_synced_at", "profile"} <= account_columns
+    indexed = {tuple(index["column_names"]) for index in inspector.get_indexes("social_accounts")}
+    assert ("token_refresh_at",) in indexed
+
+    with engine.connect() as conn:
+        entry = conn.execute(select(Knowledge.id, Knowledge.next_refresh_at)).one()
+        assert entry == ("k1", None)
+        assert conn.execute(select(SocialAccount)).all() == []
+
+    # Running it again on an up-to-date schema changes nothing
+    with engine.begin() as conn:
+        upgrade_schema(conn)
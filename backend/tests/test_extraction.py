@@ -0,0 +1,76 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from agents import ExtractionAgent
+from api.substrates import run_extraction
+from config import get_settings
+from db import Base, async_session, engine
+from fetchers.twitter import RateLimitExceeded
+from models import ArchivedTweet, SocialAccount, Substrate, SubstrateStatus
+from services import RetryJobLater
+
+
+@pytest.fixture
+async def substrate():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with async_session() as db:
+        substrate = Substrate(owner_wallet="0xabc", display_name="Shadow")
+        db.add(substrate)
+        await db.flush()
+        db.add(SocialAccount(substrate_id=substrate.id, platform="twitter", username="shadow"))
+        await db.commit()
+    return substrate
+
+
+async def test_first_sync_rate_limited_defers_until_the_window_resets(substrate, monkeypatch):
+    reset_at = time.time() + 600
+
+    async def sync_account(account, max_tweets):
+        raise RateLimitExceeded("users/:id/tweets", reset_at)
+
+    monkeypatch.setattr("api.substrates._sync_account", sync_account)
+    async with async_session() as db:
+        with pytest.raises(RetryJobLater) as deferred:
+            await run_extraction(substrate.id, db=db)
+
+        assert 595 < deferred.value.delay < 605
+        assert (await db.get(Substrate, substrate.id)).status == SubstrateStatus.EXTRACTING
+
+
+@pytest.mark.parametrize("mode, cap, expected", [("structured", 50, 50), ("map_reduce", 1000, 120)])
+async def test_map_reduce_reads_past_the_sampling_cap(substrate, monkeypatch, mode, cap, expected):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "extraction_max_tweets", 50)
+    monkeypatch.setattr(settings, "extraction_map_reduce_max_tweets", 1000)
+    async with async_session() as db:
+        account = (await db.execute(select(SocialAccount).where(SocialAccount.substrate_id == substrate.id))).scalar_one()
+        account.tweets_synced_at = datetime.utcnow()
+        start = datetime(2026, 1, 1)
+        db.add_all(
+            ArchivedTweet(social_account_id=account.id, tweet_id=str(i), text=f"Tweet {i}", created_at=start + timedelta(hours=i))
+            for i in range(120)
+        )
+        await db.commit()
+
+    synced_with = []
+    extracted = []
+
+    async def sync_account(account, max_tweets):
+        synced_with.append(max_tweets)
+
+    async def extract(self, content, mode=None, on_progress=None):
+        extracted.append(content)
+        return {"summary": "A shadow"}
+
+    monkeypatch.setattr("api.substrates._sync_account", sync_account)
+    monkeypatch.setattr(ExtractionAgent, "__init__", lambda self: None)
+    monkeypatch.setattr(ExtractionAgent, "extract", extract)
+    async with async_session() as db:
+        await run_extraction(substrate.id, db=db, mode=mode)
+
+    assert synced_with == [cap]
+    assert len(extracted[0]["tweets"]) == expected
@@ -0,0 +1,124 @@
+import asyncio
+import re
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from agents.extraction_agent import PROFILE_TOOL_NAME
+from api.admin import _poll_extraction_batches, apply_extraction_batch, submit_extraction_batch
+from db import Base, async_session, engine
+from models import (
+    ArchivedTweet,
+    ExtractionBatch,
+    ExtractionBatchStatus,
+    Job,
+    SocialAccount,
+    Substrate,
+    SubstrateStatus,
+)
+from services.message_batches import LocalBatchClient
+
+NAMES = ("alpha", "beta", "gamma", "delta", "epsilon")
+
+
+async def respond(params: dict) -> dict:
+    """A profile built from the request's own tweets, so each answer names its substrate."""
+    text = params["messages"][0]["content"]
+    tweets = re.findall(r"^Tweet: (.+)$", text, re.MULTILINE)
+    name = tweets[0].split()[0]
+    if name == "beta":
+        raise RuntimeError("overloaded")
+    traits = ["curious", "direct", "playful"] if name != "gamma" else ["curious"]  # gamma's answer is invalid
+    answer = {
+        "traits": traits,
+        "interests": ["coffee", "cycling", "maps"],
+        "communication_style": "Short and warm.",
+        "values": ["honesty", "craft"],
+        "sample_tweets": tweets[:3],
+        "summary": f"Profile of {name}.",
+    }
+    return {
+        "content": [{"type": "tool_use", "id": "tool_1", "name": PROFILE_TOOL_NAME, "input": answer}],
+        "usage": {"input_tokens": 100, "output_tokens": 50},
+    }
+
+
+@pytest.fixture
+async def substrates():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    ids = {}
+    async with async_session() as db:
+        for name in NAMES:
+            substrate = Substrate(
+                owner_wallet="0xabc",
+                display_name=name,
+                status=SubstrateStatus.READY,
+                personality_profile={"summary": "Old profile."},
+            )
+            db.add(substrate)
+            await db.flush()
+            account = SocialAccount(substrate_id=substrate.id, platform="twitter", username=name)
+            db.add(account)
+            await db.flush()
+            db.add_all(
+                ArchivedTweet(
+                    social_account_id=account.id,
+                    tweet_id=f"{name}-{i}",
+                    text=f"{name} tweet {i} about riding to the coffee place",
+                    created_at=datetime(2026, 1, 1) + timedelta(hours=i),
+                )
+                for i in range(6)
+            )
+            ids[name] = substrate.id
+        await db.commit()
+    return ids
+
+
+async def test_batch_results_land_on_their_substrates(substrates, monkeypatch):
+    client = LocalBatchClient(respond=respond)
+    monkeypatch.setattr("api.admin.get_batch_client", lambda: client)
+    # Several pages, so rows from different executemany calls are checked
+    monkeypatch.setattr("api.admin.APPLY_PAGE_SIZE", 2)
+
+    async with async_session() as db:
+        await submit_extraction_batch(db=db, substrate_ids=list(substrates.values()))
+        batch = (await db.execute(select(ExtractionBatch).order_by(ExtractionBatch.created_at.desc()))).scalars().first()
+        assert batch.request_count == len(NAMES)
+
+        # Being re-extracted live since submission, so left alone
+        delta = await db.get(Substrate, substrates["delta"])
+        delta.status = SubstrateStatus.EXTRACTING
+        await db.commit()
+
+    for _ in range(100):
+        async with async_session() as db:
+            await _poll_extraction_batches(db=db)
+            await db.commit()
+            if (await db.get(ExtractionBatch, batch.id)).status == ExtractionBatchStatus.ENDED:
+                break
+        await asyncio.sleep(0.01)
+    async with async_session() as db:
+        job = (await db.execute(
+            select(Job).where(Job.job_type == "extraction_batch_apply").order_by(Job.created_at.desc())
+        )).scalars().first()
+        assert job.payload == {"batch_id": batch.id}
+
+        await apply_extraction_batch(db=db, **job.payload)
+
+    async with async_session() as db:
+        profiles = {
+            name: (await db.get(Substrate, substrate_id)).personality_profile["summary"]
+            for name, substrate_id in substrates.items()
+        }
+        batch = await db.get(ExtractionBatch, batch.id)
+    assert profiles == {
+        "alpha": "Profile of alpha.",
+        "beta": "Old profile.",
+        "gamma": "Old profile.",
+        "delta": "Old profile.",
+        "epsilon": "Profile of epsilon.",
+    }
+    assert batch.status == ExtractionBatchStatus.APPLIED
+    assert (batch.applied_count, batch.invalid_count, batch.failed_count) == (2, 1, 1)
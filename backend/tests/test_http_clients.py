@@ -0,0 +1,48 @@
+import asyncio
+
+import http_clients
+from config import get_settings
+
+
+async def test_host_slots_are_dropped_once_idle():
+    for i in range(100):
+        async with http_clients.host_slot(f"https://site-{i}.example/page"):
+            pass
+    assert http_clients._host_slots == {}
+
+
+async def test_host_slot_caps_concurrency_per_host():
+    limit = get_settings().http_max_connections_per_host
+    active = 0
+    peak = 0
+
+    async def fetch(url: str):
+        nonlocal active, peak
+        async with http_clients.host_slot(url):
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+
+    await asyncio.gather(*(fetch(f"https://Example.com/{i}") for i in range(limit * 3)))
+
+    assert peak == limit
+    assert http_clients._host_slots == {}
+
+
+async def test_host_slot_is_kept_while_requests_wait():
+    limit = get_settings().http_max_connections_per_host
+    release = asyncio.Event()
+
+    async def fetch():
+        async with http_clients.host_slot("https://busy.example/"):
+            await release.wait()
+
+    tasks = [asyncio.create_task(fetch()) for _ in range(limit + 2)]
+    await asyncio.sleep(0)
+    slot = http_clients._host_slots["busy.example"]
+    assert slot.users == limit + 2
+
+    release.set()
+    await asyncio.gather(*tasks)
+    assert "busy.example" not in http_clients._host_slots
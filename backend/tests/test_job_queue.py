@@ -0,0 +1,68 @@
+import asyncio
+from dataclasses import replace
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+from db import Base, async_session, engine
+from models import Job, JobStatus
+from services import JobQueue, RetryJobLater, enqueue, job_handler
+from services.job_queue import _handlers
+
+
+@job_handler("test_deferred", max_attempts=2)
+async def _deferred(db):
+    raise RetryJobLater("Window resets later", delay=900)
+
+
+@pytest.fixture
+async def tables():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+
+async def test_deferred_job_waits_without_using_an_attempt(tables):
+    async with async_session() as db:
+        job_id = (await enqueue(db, "test_deferred", {})).id
+        await db.commit()
+
+    queue = JobQueue(concurrency={})
+    handler = _handlers["test_deferred"]
+    # More deferrals than attempts, none of which fail the job
+    for _ in range(handler.max_attempts + 1):
+        await queue._run(await queue._claim("test_deferred", handler), handler)
+
+        async with async_session() as db:
+            job = await db.get(Job, job_id)
+            assert job.status == JobStatus.QUEUED
+            assert job.attempts == 0
+            assert job.run_after > datetime.utcnow() + timedelta(seconds=890)
+            # Due again right away
+            await db.execute(update(Job).where(Job.id == job_id).values(run_after=datetime.utcnow()))
+            await db.commit()
+
+
+async def test_heartbeat_survives_failed_extensions(tables, monkeypatch):
+    async with async_session() as db:
+        job = await enqueue(db, "test_deferred", {})
+        await db.commit()
+
+    sessions = 0
+
+    def flaky_session():
+        nonlocal sessions
+        sessions += 1
+        if sessions == 1:
+            raise ConnectionError("database unavailable")
+        return async_session()
+
+    monkeypatch.setattr("services.job_queue.async_session", flaky_session)
+    handler = replace(_handlers["test_deferred"], visibility_timeout=0.03)
+    heartbeat = asyncio.create_task(JobQueue(concurrency={})._heartbeat(job, handler))
+    await asyncio.sleep(0.1)
+
+    assert not heartbeat.done()
+    assert sessions >= 2
+    heartbeat.cancel()
+    await asyncio.gather(heartbeat, return_exceptions=True)
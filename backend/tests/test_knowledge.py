@@ -0,0 +1,47 @@
+import threading
+
+import pytest
+
+from api.knowledge import _process_url_knowledge
+from db import Base, async_session, engine
+from models import Knowledge, KnowledgeSourceType, KnowledgeStatus, Substrate
+
+
+@pytest.fixture
+async def knowledge():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with async_session() as db:
+        substrate = Substrate(owner_wallet="0xabc", display_name="Shadow")
+        db.add(substrate)
+        await db.flush()
+        knowledge = Knowledge(
+            substrate_id=substrate.id, source_type=KnowledgeSourceType.URL, source_url="https://example.com/post"
+        )
+        db.add(knowledge)
+        await db.commit()
+    return knowledge
+
+
+async def test_url_knowledge_embeds_off_the_event_loop(knowledge, monkeypatch):
+    async def get_url_content(url, extract):
+        return {"title": "Post", "content": "Some text. " * 50, "error": None, "content_hash": "abc"}
+
+    threads = []
+
+    def add_knowledge_chunks(substrate_id, knowledge_id, chunks):
+        threads.append(threading.get_ident())
+        return len(chunks)
+
+    monkeypatch.setattr("api.knowledge.get_url_content", get_url_content)
+    monkeypatch.setattr("api.knowledge.delete_knowledge_chunks", lambda *args: threads.append(threading.get_ident()))
+    monkeypatch.setattr("api.knowledge.add_knowledge_chunks", add_knowledge_chunks)
+
+    async with async_session() as db:
+        await _process_url_knowledge(knowledge.id, knowledge.source_url, knowledge.substrate_id, db=db)
+        stored = await db.get(Knowledge, knowledge.id)
+        assert stored.status == KnowledgeStatus.READY
+        assert stored.chunk_count > 0
+
+    assert len(threads) == 2
+    assert threading.get_ident() not in threads
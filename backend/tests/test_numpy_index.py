@@ -0,0 +1,71 @@
+import json
+
+import numpy as np
+
+from numpy_index import NumpyIndex
+
+DIM = 16
+
+
+def _batch(start: int, count: int):
+    # One-hot vectors (modulo DIM) so each chunk's nearest query is known
+    ids = [f"k1_{i}" for i in range(start, start + count)]
+    vectors = np.eye(DIM, dtype=np.float32)[[i % DIM for i in range(start, start + count)]]
+    documents = [f"chunk {i}" for i in range(start, start + count)]
+    metadatas = [{"knowledge_id": "k1", "chunk_index": i} for i in range(start, start + count)]
+    return ids, vectors, documents, metadatas
+
+
+def _manifest(index: NumpyIndex, substrate_id: str) -> list[dict]:
+    with open(index.root / substrate_id / "manifest.json") as f:
+        return json.load(f)["segments"]
+
+
+def test_adds_append_segments_and_stay_aligned(tmp_path):
+    index = NumpyIndex(tmp_path)
+    index.add("s1", *_batch(0, 40))
+    first = _manifest(index, "s1")[0]["name"]
+
+    for start in range(40, 70, 3):
+        index.add("s1", *_batch(start, 3))
+
+    segments = _manifest(index, "s1")
+    # Small batches never rewrite the large first segment
+    assert segments[0]["name"] == first
+    assert len(segments) <= 4
+    assert sorted(p.stem for p in (tmp_path / "s1").glob("seg-*.npy")) == sorted(s["name"] for s in segments)
+
+    assert index.count("s1") == 70
+    documents, metadatas, embeddings, scores = index.search("s1", np.eye(DIM)[5], n=70)
+    matching = {d for d, s in zip(documents, scores) if s > 0.99}
+    assert matching == {f"chunk {i}" for i in range(5, 70, DIM)}
+    for metadata, embedding in zip(metadatas, embeddings):
+        assert np.argmax(embedding) == metadata["chunk_index"] % DIM
+
+
+def test_other_processes_see_deletes(tmp_path):
+    writer, reader = NumpyIndex(tmp_path), NumpyIndex(tmp_path)
+    writer.add("s1", *_batch(0, 10))
+    ids, vectors, documents, _ = _batch(10, 5)
+    writer.add("s1", ids, vectors, documents, [{"knowledge_id": "k2", "chunk_index": i} for i in range(10, 15)])
+    assert reader.count("s1") == 15
+
+    assert writer.delete("s1", "k1") == 10
+    assert reader.count("s1") == 5
+    assert len(_manifest(writer, "s1")) == 1
+    assert reader.search("s1", np.eye(DIM)[12], n=1)[0] == ["chunk 12"]
+
+
+def test_migrates_single_matrix_layout(tmp_path):
+    directory = tmp_path / "s1"
+    directory.mkdir()
+    ids, vectors, documents, metadatas = _batch(0, 4)
+    np.save(directory / "embeddings.npy", vectors.astype(np.float16))
+    with open(directory / "chunks.json", "w") as f:
+        json.dump([{"id": i, "document": d, "metadata": m} for i, d, m in zip(ids, documents, metadatas)], f)
+
+    index = NumpyIndex(tmp_path)
+    assert index.search("s1", np.eye(DIM)[2], n=1)[0] == ["chunk 2"]
+    assert not (directory / "embeddings.npy").exists()
+    assert not (directory / "chunks.json").exists()
+    assert index.count("s1") == 4
@@ -0,0 +1,134 @@
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import pytest
+
+from services.oauth_state import MemoryStateStore
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr("services.oauth_state.time.monotonic", clock)
+    return clock
+
+
+async def test_memory_store_pop_is_single_use(clock):
+    store = MemoryStateStore()
+    await store.put("state", {"substrate_id": "s1"}, ttl=60)
+
+    assert await store.pop("state") == {"substrate_id": "s1"}
+    assert await store.pop("state") is None
+
+
+async def test_memory_store_expires_states(clock):
+    store = MemoryStateStore()
+    await store.put("short", {"substrate_id": "s1"}, ttl=10)
+    await store.put("long", {"substrate_id": "s2"}, ttl=60)
+
+    clock.now += 10
+    assert await store.pop("short") is None
+    assert await store.pop("long") == {"substrate_id": "s2"}
+    # Expired entries are dropped, not just hidden
+    assert store._states == {}
+
+
+async def test_memory_store_put_again_renews_ttl(clock):
+    store = MemoryStateStore()
+    await store.put("state", {"substrate_id": "s1"}, ttl=10)
+    clock.now += 5
+    await store.put("state", {"substrate_id": "s1"}, ttl=10)
+
+    # The first entry's expiry must not evict the renewed one
+    clock.now += 6
+    assert await store.pop("state") == {"substrate_id": "s1"}
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_server(port: int, env: dict) -> subprocess.Popen:
+    process = subprocess.Popen(
+        [sys.executable, "tests/oauth_server.py", str(port)],
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"API process on port {port} exited with {process.returncode}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health").status_code == 200:
+                return process
+        except httpx.TransportError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"API process on port {port} did not start")
+
+
+@pytest.fixture
+def api_processes(tmp_path):
+    """Two API processes sharing one SQLite database and the database state store."""
+    database = tmp_path / "oauth.db"
+    env = {
+        **os.environ,
+        "PYTHONPATH": str(BACKEND_DIR),
+        "DATABASE_URL": f"sqlite:///{database}",
+        "OAUTH_STATE_STORE": "database",
+        "JOB_WORKERS_ENABLED": "false",
+    }
+    processes = []
+    try:
+        # One at a time, so only the first creates the tables
+        ports = []
+        for _ in range(2):
+            ports.append(_free_port())
+            processes.append(_start_server(ports[-1], env))
+        with sqlite3.connect(database) as conn:
+            conn.execute(
+                "INSERT INTO substrates (id, owner_wallet, display_name) VALUES ('sub-1', '0xabc', 'Shadow')"
+            )
+        yield [f"http://127.0.0.1:{port}" for port in ports]
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=10)
+
+
+def test_callback_on_another_process(api_processes):
+    first, second = api_processes
+
+    response = httpx.get(f"{first}/oauth/twitter/authorize", params={"substrate_id": "sub-1"})
+    assert response.status_code == 200
+    state = httpx.URL(response.json()["url"]).params["state"]
+
+    callback = {"code": "auth-code", "state": state}
+    response = httpx.post(f"{second}/oauth/twitter/callback", json=callback)
+    assert response.status_code == 200
+    assert response.json()["username"] == "shadow"
+
+    # The state was consumed on the second process; neither accepts it again
+    assert httpx.post(f"{second}/oauth/twitter/callback", json=callback).status_code == 400
+    assert httpx.post(f"{first}/oauth/twitter/callback", json=callback).status_code == 400
@@ -0,0 +1,41 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+import api  # noqa: F401 - registers the token_refresh job handler
+from api.oauth import _schedule_token_refreshes
+from db import Base, upgrade_schema
+from models import Job, SocialAccount
+
+
+async def test_accounts_from_before_refresh_scheduling_get_refreshed(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'old.db'}")
+    async with engine.begin() as conn:
+        # social_accounts as created before token_refresh_at existed
+        await conn.exec_driver_sql(
+            "CREATE TABLE social_accounts (id VARCHAR PRIMARY KEY, substrate_id VARCHAR NOT NULL, platform VARCHAR NOT NULL, "
+            "platform_user_id VARCHAR, username VARCHAR, encrypted_access_token TEXT, encrypted_refresh_token TEXT, "
+            "token_expires_at DATETIME, connected_at DATETIME)"
+        )
+        soon = datetime.utcnow() + timedelta(minutes=5)
+        await conn.exec_driver_sql(
+            "INSERT INTO social_accounts (id, substrate_id, platform, encrypted_refresh_token, token_expires_at) "
+            "VALUES ('expiring', 's1', 'twitter', 'encrypted', ?), ('fresh', 's1', 'twitter', 'encrypted', ?)",
+            (soon, soon + timedelta(hours=2)),
+        )
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(upgrade_schema)
+
+    session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with session() as db:
+        await _schedule_token_refreshes(db=db)
+        await db.commit()
+
+        jobs = (await db.execute(select(Job))).scalars().all()
+        assert [(job.job_type, job.payload) for job in jobs] == [("token_refresh", {"account_id": "expiring"})]
+        # Claimed, so the next scan doesn't queue it again
+        account = await db.get(SocialAccount, "expiring")
+        assert account.token_refresh_at is not None
+    await engine.dispose()
@@ -0,0 +1,48 @@
+import asyncio
+import json
+
+import pytest
+
+from api.substrates import substrate_events
+from config import get_settings
+from db import Base, async_session, engine
+from models import Substrate, SubstrateStatus
+
+
+@pytest.fixture
+async def substrate():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with async_session() as db:
+        substrate = Substrate(owner_wallet="0xabc", display_name="Shadow")
+        db.add(substrate)
+        await db.commit()
+    return substrate
+
+
+async def _next_event(body) -> tuple[str, dict]:
+    message = await asyncio.wait_for(anext(body), 5)
+    event, data = message.strip().split("\n")
+    return event.removeprefix("event: "), json.loads(data.removeprefix("data: "))
+
+
+async def test_stream_picks_up_changes_from_other_processes(substrate, monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "job_workers_enabled", True)
+    monkeypatch.setattr(settings, "events_poll_seconds", 0.05)
+
+    body = (await substrate_events(substrate.id)).body_iterator
+    try:
+        assert (await _next_event(body))[0] == "extraction"
+        assert (await _next_event(body))[0] == "voice"
+
+        # Committed without publishing, as a job in another worker would appear here
+        async with async_session() as db:
+            row = await db.get(Substrate, substrate.id)
+            row.status = SubstrateStatus.EXTRACTING
+            row.extraction_progress = 40
+            await db.commit()
+
+        assert await _next_event(body) == ("extraction", {"status": "extracting", "progress": 40})
+    finally:
+        await body.aclose()
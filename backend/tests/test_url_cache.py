@@ -0,0 +1,75 @@
+import hashlib
+
+import pytest
+
+import http_clients
+from db import Base, engine
+from services import url_cache
+from services.url_cache import get_url_content, normalize_url
+
+
+def test_equivalent_urls_share_a_key():
+    assert normalize_url("HTTPS://Example.COM:443/post?b=2&a=1#comments") == "https://example.com/post?a=1&b=2"
+    assert normalize_url("https://example.com") == "https://example.com/"
+
+
+def test_tracking_parameters_are_dropped():
+    url = "https://example.com/post?utm_source=x&UTM_Campaign=y&fbclid=1&gclid=2&msclkid=3&id=7"
+    assert normalize_url(url) == "https://example.com/post?id=7"
+
+
+def test_ref_parameter_is_kept():
+    assert normalize_url("https://github.com/org/repo/blob/main/README.md?ref=v2") != normalize_url(
+        "https://github.com/org/repo/blob/main/README.md?ref=v1"
+    )
+    assert normalize_url("https://example.com/tree?ref=main") == "https://example.com/tree?ref=main"
+
+
+def test_trailing_slash_is_kept():
+    assert normalize_url("https://example.com/docs/") == "https://example.com/docs/"
+    assert normalize_url("https://example.com/docs") != normalize_url("https://example.com/docs/")
+
+
+def test_repeated_parameters_keep_their_order():
+    assert normalize_url("https://example.com/?tag=b&x=1&tag=a") == "https://example.com/?tag=b&tag=a&x=1"
+
+
+@pytest.fixture
+async def tables(monkeypatch):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    monkeypatch.setattr(http_clients, "_clients", {})
+    yield
+    await http_clients.close()
+
+
+def _key(url):
+    return hashlib.sha256(normalize_url(url).encode()).hexdigest()
+
+
+async def _extract(url):
+    return {"title": "Page", "content": f"Text of {url}", "error": None, "etag": '"v1"', "last_modified": None}
+
+
+async def test_miss_skips_the_probe_and_keeps_the_fetched_validators(tables, monkeypatch):
+    async def probe(url, entry):
+        raise AssertionError("probed an uncached URL")
+
+    monkeypatch.setattr(url_cache, "_probe", probe)
+    fetched = await get_url_content("https://example.com/uncached", _extract)
+    assert fetched["cache"] == "miss"
+
+    entry = await url_cache._load(_key("https://example.com/uncached"))
+    assert entry.etag == '"v1"'
+
+
+async def test_revalidation_probe_refuses_private_addresses(tables):
+    url = "http://127.0.0.1:8001/api/v1/collections"
+    await url_cache._store(_key(url), url, await _extract(url), '"v1"', None)
+
+    async def extract(url):
+        raise AssertionError("extracted a private URL")
+
+    fetched = await get_url_content(url, extract, revalidate=True)
+    assert fetched["blocked"] is True
+    assert fetched["error"].startswith("URL not allowed")
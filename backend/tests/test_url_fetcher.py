@@ -0,0 +1,123 @@
+import asyncio
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import http_clients
+from api.knowledge import _extract_url_content
+from fetchers.url_fetcher import extract_html, fetch_url_content
+
+
+def _content(body: str) -> str:
+    return extract_html(f"<html><head><title>Page</title></head><body>{body}</body></html>".encode())["content"]
+
+
+def test_keeps_text_directly_inside_containers():
+    html = "<article>Lead text<div>Body</div><p>Intro para.</p><ul><li>item <b>nested</b></li></ul></article>"
+    assert _content(html) == "Lead text\n\nBody\n\nIntro para.\n\nitem nested"
+
+
+def test_div_only_page():
+    html = (
+        "<div id='app'>"
+        "<div class='title'>How to roast coffee</div>"
+        "<div class='body'>Start with <b>green</b> beans and a <a href='/pan'>heavy pan</a>."
+        "<br>Stir constantly.</div>"
+        "<section><div>Watch for first crack.</div>Then cool quickly.</section>"
+        "<table><tr><td>Light</td><td>10 <i>min</i></td></tr></table>"
+        "</div>"
+        "<nav><div>Home</div></nav>"
+    )
+    assert _content(html).split("\n\n") == [
+        "How to roast coffee",
+        "Start with green beans and a heavy pan.",
+        "Stir constantly.",
+        "Watch for first crack.",
+        "Then cool quickly.",
+        "Light",
+        "10 min",
+    ]
+
+
+def test_nested_content_blocks_appear_once():
+    html = "<ul><li><p>Nested paragraph.</p> and tail</li></ul><blockquote><p>Quote.</p></blockquote>"
+    assert _content(html) == "Nested paragraph. and tail\n\nQuote."
+
+
+def test_title_and_link_text():
+    extracted = extract_html(b"<html><head><title> My  Page </title></head><body><p>See <a href='/x'>this link</a>.</p></body></html>")
+    assert extracted["title"] == "My Page"
+    assert extracted["link_text_length"] == len("this link")
+
+
+def test_public_address_check():
+    assert http_clients.is_public_address("93.184.216.34")
+    assert http_clients.is_public_address("2606:2800:220:1:248:1893:25c8:1946")
+    for address in ("127.0.0.1", "10.0.0.5", "172.16.0.1", "192.168.1.1", "169.254.169.254",
+                    "100.64.0.1", "0.0.0.0", "::1", "fe80::1%eth0", "fd00::1", "::ffff:127.0.0.1", "224.0.0.1"):
+        assert not http_clients.is_public_address(address), address
+
+
+class _Pages(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/redirect":
+            self.send_response(302)
+            self.send_header("Location", f"http://internal.test:{self.server.server_port}/secret")
+            self.end_headers()
+            return
+        body = b"<html><body><p>" + (b"Public page text. " * 100) + b"</p></body></html>"
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+async def pages(monkeypatch):
+    """A page server that public.test resolves to, next to an internal.test host.
+
+    Both are local; 127.0.0.1 stands in for a public address and 127.0.0.2
+    for a private one.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Pages)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    hosts = {"public.test": "127.0.0.1", "internal.test": "127.0.0.2"}
+    loop = asyncio.get_running_loop()
+
+    async def getaddrinfo(host, port, **kwargs):
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", (hosts.get(host, host), port))]
+
+    monkeypatch.setattr(loop, "getaddrinfo", getaddrinfo)
+    monkeypatch.setattr(http_clients, "is_public_address", lambda address: address == "127.0.0.1")
+    monkeypatch.setattr(http_clients, "_clients", {})
+    yield f"http://public.test:{server.server_port}"
+    await http_clients.close()
+    server.shutdown()
+
+
+async def test_fetches_public_pages(pages):
+    fetched = await fetch_url_content(f"{pages}/article")
+    assert fetched["error"] is None
+    assert fetched["content"].startswith("Public page text.")
+
+
+async def test_refuses_private_addresses_and_redirects_to_them(pages):
+    for url in ("http://internal.test/", "http://127.0.0.2/", f"{pages}/redirect"):
+        fetched = await fetch_url_content(url)
+        assert fetched["blocked"] is True, url
+        assert fetched["content"] == ""
+
+
+async def test_blocked_urls_skip_the_web_fetch_fallback(pages, monkeypatch):
+    async def web_fetch(url):
+        raise AssertionError("fell back to web_fetch")
+
+    monkeypatch.setattr("api.knowledge._fetch_url_with_claude", web_fetch)
+    fetched = await _extract_url_content(f"{pages}/redirect")
+    assert fetched["error"].startswith("URL not allowed")
@@ -0,0 +1,65 @@
+import hashlib
+
+from vectorstore import _merge_adjacent_chunks, _merge_overlapping, chunk_text
+
+
+def _numbered_lines(count: int) -> str:
+    # Sentences broken across lines, with indentation and blank lines, like
+    # text extracted from PDFs and web pages
+    return "\n\n".join(
+        f"Line {i} of the  source\n    text talks about topic {i}. It continues\nhere, {i}."
+        for i in range(count)
+    )
+
+
+def test_merge_drops_overlap_from_newline_heavy_text():
+    chunks = chunk_text(_numbered_lines(200), chunk_size=300, overlap=80)
+    assert len(chunks) > 50
+
+    for first, second in zip(chunks, chunks[1:]):
+        merged = _merge_overlapping(first, second)
+        shared = len(first) + len(second) + 1 - len(merged)
+        assert shared > 0, (first, second)
+        assert merged.startswith(first)
+        # No sentence appears twice across the join
+        sentences = [s for s in merged.split(".") if s.strip()]
+        assert len(sentences) == len(set(" ".join(s.split()) for s in sentences))
+
+
+def test_merge_without_overlap_joins_with_space():
+    assert _merge_overlapping("First part.", "Second part.") == "First part. Second part."
+
+
+def test_merge_adjacent_chunks_keeps_whole_text_once():
+    text = _numbered_lines(12)
+    chunks = chunk_text(text, chunk_size=300, overlap=80)
+    metadatas = [{"knowledge_id": "k1", "chunk_index": i} for i in range(len(chunks))]
+
+    merged = _merge_adjacent_chunks(chunks, metadatas, list(range(len(chunks))))
+
+    assert len(merged) == 1
+    assert merged[0].split() == text.split()
+
+
+def _long_token(length: int) -> str:
+    # Base64-like run without spaces or repeats, as in URLs, hashes and data blobs
+    return "".join(hashlib.sha256(str(i).encode()).hexdigest() for i in range(length // 64 + 1))[:length]
+
+
+def test_merge_character_split_chunks_keeps_text_once():
+    token = _long_token(2500)
+    text = f"{token} Outro sentence here."
+    chunks = chunk_text(text, chunk_size=300, overlap=80)
+    # Most chunks are cut from the token by characters
+    assert sum(len(chunk) == 300 and " " not in chunk for chunk in chunks) > 5
+
+    metadatas = [{"knowledge_id": "k1", "chunk_index": i} for i in range(len(chunks))]
+    merged = _merge_adjacent_chunks(chunks, metadatas, list(range(len(chunks))))
+
+    assert len(merged) == 1
+    assert merged[0].split() == text.split()
+
+
+def test_merge_ignores_short_chance_character_overlap():
+    assert _merge_overlapping("The first chunk ends here", "here we go again") == "The first chunk ends here we go again"
+    assert _merge_overlapping("Ends with abc", "abcdef starts") == "Ends with abc abcdef starts"
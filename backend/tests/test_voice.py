@@ -0,0 +1,70 @@
+import shutil
+import struct
+
+import httpx
+import pytest
+from sqlalchemy import select
+
+import http_clients
+from api.voice import _create_voice_clone
+from config import get_settings
+from db import Base, async_session, engine
+from main import app
+from models import Job, Substrate, VoiceStatus
+
+
+def _wav(seconds: int, rate: int = 8000) -> bytes:
+    """Silent 8-bit mono WAV of the given length."""
+    data = b"\x80" * (rate * seconds)
+    header = b"RIFF" + struct.pack("<I", 36 + len(data)) + b"WAVE"
+    header += b"fmt " + struct.pack("<IHHIIHH", 16, 1, 1, rate, rate, 1, 8)
+    return header + b"data" + struct.pack("<I", len(data)) + data
+
+
+@pytest.fixture
+async def substrate():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with async_session() as db:
+        substrate = Substrate(owner_wallet="0xabc", display_name="Shadow")
+        db.add(substrate)
+        await db.commit()
+    return substrate
+
+
+async def test_clone_job_finds_upload_through_another_mount(substrate, tmp_path, monkeypatch):
+    api_dir, worker_dir = tmp_path / "api-mount", tmp_path / "worker-mount"
+    settings = get_settings()
+    monkeypatch.setattr(settings, "upload_dir", str(api_dir))
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.post(
+            f"/substrates/{substrate.id}/voice",
+            files={"audio": ("sample.wav", _wav(121), "audio/wav")},
+        )
+    assert response.status_code == 200
+
+    async with async_session() as db:
+        job = (await db.execute(select(Job).where(Job.job_type == "voice_clone"))).scalars().one()
+    name = job.payload["audio_path"]
+    # The payload names the file rather than giving this process's path to it
+    assert "/" not in name and (api_dir / name).exists()
+
+    # A worker with the same volume mounted elsewhere
+    shutil.copytree(api_dir, worker_dir)
+    monkeypatch.setattr(settings, "upload_dir", str(worker_dir))
+    sent = []
+
+    def elevenlabs(request: httpx.Request) -> httpx.Response:
+        sent.append(request.read())
+        return httpx.Response(200, json={"voice_id": "voice-1", "requires_verification": False})
+
+    monkeypatch.setitem(http_clients._clients, "elevenlabs", httpx.AsyncClient(transport=httpx.MockTransport(elevenlabs)))
+    async with async_session() as db:
+        await _create_voice_clone(db=db, **job.payload)
+
+    assert b"RIFF" in sent[0]
+    assert not (worker_dir / name).exists()
+    async with async_session() as db:
+        cloned = await db.get(Substrate, substrate.id)
+    assert (cloned.voice_id, cloned.voice_status) == ("voice-1", VoiceStatus.READY)
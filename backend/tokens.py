@@ -0,0 +1,10 @@
+# Rough characters-per-token ratio for English text with Claude's tokenizer.
+# Good enough for budgeting and reporting; not exact billing numbers.
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of prompt tokens a piece of text will use."""
+    if not text:
+        return 0
+    return max(1, len(text) // CHARS_PER_TOKEN)
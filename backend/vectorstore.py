@@ -1,17 +1,64 @@
+import logging
 import re
+import threading
+from collections.abc import Iterable, Iterator
 from pathlib import Path
 import chromadb
+import numpy as np
+from chromadb.config import Settings as ChromaSettings
+from chromadb.utils import embedding_functions
+import metrics
+from config import get_settings
+from numpy_index import NumpyIndex
+from tokens import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+
+# Shortest shared text taken as the overlap of two character-split chunks
+MIN_CHAR_OVERLAP = 20
 
 
 _client = None
+_client_lock = threading.Lock()
+_numpy_index = None
+_embedding_function = None
+
+
+def get_data_path() -> Path:
+    """Directory holding the on-disk vector index."""
+    settings = get_settings()
+    if settings.vectorstore_data_path:
+        return Path(settings.vectorstore_data_path)
+    return Path(__file__).resolve().parent / "chroma_data"
 
 
 def get_chroma_client() -> chromadb.ClientAPI:
-    """Get a singleton ChromaDB persistent client."""
+    """Get a singleton ChromaDB client for this process.
+
+    In "embedded" mode the index is opened in-process. In "server" mode all
+    workers share one vector store service (see ``vectorstore_server.py``)
+    through a pooled keep-alive HTTP client.
+    """
     global _client
     if _client is None:
-        persist_dir = str(Path(__file__).resolve().parent / "chroma_data")
-        _client = chromadb.PersistentClient(path=persist_dir)
+        with _client_lock:
+            if _client is None:
+                settings = get_settings()
+                if settings.vectorstore_mode == "server":
+                    _client = chromadb.HttpClient(
+                        host=settings.vectorstore_host,
+                        port=settings.vectorstore_port,
+                        settings=ChromaSettings(
+                            anonymized_telemetry=False,
+                            chroma_http_max_connections=settings.vectorstore_max_connections,
+                            chroma_http_max_keepalive_connections=settings.vectorstore_max_connections,
+                        ),
+                    )
+                elif settings.vectorstore_mode == "embedded":
+                    _client = chromadb.PersistentClient(path=str(get_data_path()))
+                else:
+                    raise ValueError(f"Unknown vectorstore_mode: {settings.vectorstore_mode}")
     return _client
 
 
@@ -24,6 +71,51 @@ def get_knowledge_collection() -> chromadb.Collection:
     )
 
 
+def get_numpy_index() -> NumpyIndex:
+    """Get the singleton exact-search index used when vectorstore_backend is "numpy"."""
+    global _numpy_index
+    if _numpy_index is None:
+        with _client_lock:
+            if _numpy_index is None:
+                _numpy_index = NumpyIndex(
+                    get_data_path() / "numpy_index",
+                    max_loaded=get_settings().numpy_index_max_substrates,
+                )
+    return _numpy_index
+
+
+def _embed(texts: list[str]) -> np.ndarray:
+    """Embed texts with the same local model Chroma uses by default."""
+    global _embedding_function
+    if _embedding_function is None:
+        _embedding_function = embedding_functions.DefaultEmbeddingFunction()
+    return np.asarray(_embedding_function(texts), dtype=np.float32)
+
+
+def _use_numpy_backend() -> bool:
+    return get_settings().vectorstore_backend == "numpy"
+
+
+def _append_sentence(current_chunk: str, sentence: str, chunk_size: int, overlap: int) -> tuple[str, list[str]]:
+    """Add one sentence to the chunk being built. Returns (current_chunk, finished_chunks)."""
+    if len(current_chunk) + len(sentence) + 1 <= chunk_size:
+        return (current_chunk + " " + sentence).strip(), []
+
+    if current_chunk:
+        # Build overlap from end of current chunk
+        words = current_chunk.split()
+        overlap_text = ""
+        for word in reversed(words):
+            candidate = (word + " " + overlap_text).strip()
+            if len(candidate) > overlap:
+                break
+            overlap_text = candidate
+        return (overlap_text + " " + sentence).strip(), [current_chunk]
+
+    # Single sentence longer than chunk_size — force-split by characters
+    return "", [sentence[i:i + chunk_size] for i in range(0, len(sentence), chunk_size - overlap)]
+
+
 def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> list[str]:
     """Split text into overlapping chunks, preferring sentence boundaries."""
     if not text or not text.strip():
@@ -41,26 +133,8 @@ def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> list[st
     for sentence in sentences:
         if not sentence.strip():
             continue
-
-        if len(current_chunk) + len(sentence) + 1 <= chunk_size:
-            current_chunk = (current_chunk + " " + sentence).strip()
-        else:
-            if current_chunk:
-                chunks.append(current_chunk)
-                # Build overlap from end of current chunk
-                words = current_chunk.split()
-                overlap_text = ""
-                for word in reversed(words):
-                    candidate = (word + " " + overlap_text).strip()
-                    if len(candidate) > overlap:
-                        break
-                    overlap_text = candidate
-                current_chunk = (overlap_text + " " + sentence).strip()
-            else:
-                # Single sentence longer than chunk_size — force-split by characters
-                for i in range(0, len(sentence), chunk_size - overlap):
-                    chunks.append(sentence[i:i + chunk_size])
-                current_chunk = ""
+        current_chunk, finished = _append_sentence(current_chunk, sentence, chunk_size, overlap)
+        chunks.extend(finished)
 
     if current_chunk:
         chunks.append(current_chunk)
@@ -68,18 +142,60 @@ def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> list[st
     return chunks
 
 
-def add_knowledge_chunks(substrate_id: str, knowledge_id: str, chunks: list[str]) -> int:
-    """Add text chunks to ChromaDB with metadata. Returns chunk count."""
+def iter_chunks(pieces: Iterable[str], chunk_size: int = 1000, overlap: int = 200) -> Iterator[str]:
+    """Streaming ``chunk_text`` for text that arrives in pieces (file blocks, PDF pages).
+
+    Only the trailing unfinished sentence and the chunk being built are held
+    in memory. Text without sentence punctuation is cut at whitespace once
+    it grows past a few chunks, so the buffer stays bounded.
+    """
+    max_pending = chunk_size * 4
+    pending = ""
+    current_chunk = ""
+
+    for piece in pieces:
+        pending += piece
+        sentences = re.split(r'(?<=[.!?])\s+', pending)
+        pending = sentences.pop()
+        if len(pending) > max_pending:
+            cut = pending.rfind(" ", 0, max_pending)
+            cut = cut if cut > 0 else max_pending
+            sentences.append(pending[:cut])
+            pending = pending[cut:].lstrip()
+
+        for sentence in sentences:
+            if not sentence.strip():
+                continue
+            current_chunk, finished = _append_sentence(current_chunk, sentence.strip(), chunk_size, overlap)
+            yield from finished
+
+    if pending.strip():
+        current_chunk, finished = _append_sentence(current_chunk, pending.strip(), chunk_size, overlap)
+        yield from finished
+    if current_chunk:
+        yield current_chunk
+
+
+def add_knowledge_chunks(substrate_id: str, knowledge_id: str, chunks: list[str], start_index: int = 0) -> int:
+    """Add text chunks to ChromaDB with metadata. Returns chunk count.
+
+    ``start_index`` numbers the chunks when a document is added in batches.
+    """
     if not chunks:
         return 0
 
-    collection = get_knowledge_collection()
-    ids = [f"{knowledge_id}_{i}" for i in range(len(chunks))]
+    indexes = range(start_index, start_index + len(chunks))
+    ids = [f"{knowledge_id}_{i}" for i in indexes]
     metadatas = [
         {"substrate_id": substrate_id, "knowledge_id": knowledge_id, "chunk_index": i}
-        for i in range(len(chunks))
+        for i in indexes
     ]
 
+    if _use_numpy_backend():
+        get_numpy_index().add(substrate_id, ids, _embed(chunks), chunks, metadatas)
+        return len(chunks)
+
+    collection = get_knowledge_collection()
     collection.add(
         ids=ids,
         documents=chunks,
@@ -89,25 +205,223 @@ def add_knowledge_chunks(substrate_id: str, knowledge_id: str, chunks: list[str]
     return len(chunks)
 
 
-def query_knowledge(substrate_id: str, query_text: str, k: int = 5) -> list[str]:
-    """Query ChromaDB for relevant chunks filtered by substrate_id."""
-    collection = get_knowledge_collection()
+def _mmr_select(relevance: np.ndarray, embeddings: np.ndarray, k: int, lambda_mult: float) -> list[int]:
+    """Pick k candidate indices by maximal marginal relevance.
+
+    Balances similarity to the query (``relevance``) against similarity to
+    already-selected candidates, so near-duplicate chunks are skipped.
+    """
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    normalized = embeddings / np.where(norms == 0, 1, norms)
+    pairwise = normalized @ normalized.T
+
+    selected = [int(np.argmax(relevance))]
+    while len(selected) < min(k, len(relevance)):
+        redundancy = pairwise[:, selected].max(axis=1)
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[selected] = -np.inf
+        selected.append(int(np.argmax(scores)))
+    return selected
+
 
+def _merge_overlapping(first: str, second: str) -> str:
+    """Join two consecutive chunks, dropping the text they share.
+
+    Pieces of a sentence too long for one chunk are cut by characters, so
+    they share exactly the end of ``first``, usually starting mid-word;
+    that is looked for first, and needs at least MIN_CHAR_OVERLAP
+    characters so a chance match of a few letters isn't taken for it.
+    Otherwise ``chunk_text`` started ``second`` with the last words of
+    ``first``, rejoined with single spaces, so the overlap is the longest
+    run of words ending ``first`` that also starts ``second``. Comparing
+    words rather than raw text keeps newlines and repeated spaces in the
+    source from hiding it.
+    """
+    if len(second) >= MIN_CHAR_OVERLAP:
+        probe = second[:MIN_CHAR_OVERLAP]
+        # The earliest match in first is the longest overlap
+        start = first.find(probe, max(0, len(first) - len(second)))
+        while start != -1:
+            if second.startswith(first[start:]):
+                return first + second[len(first) - start:]
+            start = first.find(probe, start + 1)
+
+    first_words = first.split()
+    second_spans = [match.span() for match in re.finditer(r"\S+", second)]
+    second_words = [second[start:end] for start, end in second_spans]
+    for count in range(min(len(first_words), len(second_words)), 0, -1):
+        if first_words[-count:] == second_words[:count]:
+            return first + second[second_spans[count - 1][1]:]
+    return first + " " + second
+
+
+def _merge_adjacent_chunks(documents: list[str], metadatas: list[dict], order: list[int]) -> list[str]:
+    """Merge selected chunks that are neighbours within the same knowledge entry.
+
+    Groups keep the rank of their most relevant chunk.
+    """
+    groups: list[list[int]] = []
+    for i in sorted(order, key=lambda i: (metadatas[i].get("knowledge_id", ""), metadatas[i].get("chunk_index", 0))):
+        if groups:
+            prev = groups[-1][-1]
+            if (
+                metadatas[prev].get("knowledge_id") == metadatas[i].get("knowledge_id")
+                and metadatas[prev].get("chunk_index", 0) + 1 == metadatas[i].get("chunk_index", 0)
+            ):
+                groups[-1].append(i)
+                continue
+        groups.append([i])
+
+    rank = {idx: pos for pos, idx in enumerate(order)}
+    groups.sort(key=lambda group: min(rank[i] for i in group))
+
+    merged = []
+    for group in groups:
+        text = documents[group[0]]
+        for i in group[1:]:
+            text = _merge_overlapping(text, documents[i])
+        merged.append(text)
+    return merged
+
+
+def _query_candidates(
+    substrate_id: str, query_text: str, n: int
+) -> tuple[list[str], list[dict], np.ndarray, np.ndarray] | None:
+    """Nearest chunks for a query from the configured backend.
+
+    Returns (documents, metadatas, embeddings, cosine similarities) sorted by
+    similarity, or None when the substrate has no chunks.
+    """
+    if _use_numpy_backend():
+        index = get_numpy_index()
+        if index.count(substrate_id) == 0:
+            return None
+        return index.search(substrate_id, _embed([query_text])[0], n)
+
+    collection = get_knowledge_collection()
     if collection.count() == 0:
-        return []
+        return None
 
     results = collection.query(
         query_texts=[query_text],
-        n_results=k,
+        n_results=n,
         where={"substrate_id": substrate_id},
+        include=["documents", "metadatas", "distances", "embeddings"],
     )
 
     documents = results.get("documents", [[]])[0]
-    return documents
+    if not documents:
+        return None
+    embeddings = np.asarray(results["embeddings"][0], dtype=np.float32)
+    # Collection uses cosine space, so similarity is 1 - distance
+    relevance = 1 - np.asarray(results["distances"][0], dtype=np.float32)
+    return documents, results["metadatas"][0], embeddings, relevance
+
 
+def query_knowledge(
+    substrate_id: str,
+    query_text: str,
+    k: int = 5,
+    fetch_k: int = 20,
+    lambda_mult: float = 0.5,
+) -> list[str]:
+    """Query the vector store for relevant chunks filtered by substrate_id.
 
-def delete_knowledge_chunks(knowledge_id: str) -> None:
+    Fetches ``fetch_k`` candidates, re-ranks them with maximal marginal
+    relevance down to ``k``, then merges adjacent chunks of the same knowledge
+    entry so overlapping text is only sent once.
+    """
+    candidates = _query_candidates(substrate_id, query_text, max(k, fetch_k))
+    if candidates is None:
+        return []
+    documents, metadatas, embeddings, relevance = candidates
+
+    order = _mmr_select(relevance, embeddings, k, lambda_mult)
+    context = _merge_adjacent_chunks(documents, metadatas, order)
+
+    # Candidates come back sorted by distance, so the first k are plain top-k
+    baseline_tokens = sum(estimate_tokens(d) for d in documents[:k])
+    context_tokens = sum(estimate_tokens(c) for c in context)
+    tokens_saved = baseline_tokens - context_tokens
+    metrics.observe("retrieval_context_tokens", context_tokens)
+    metrics.observe("retrieval_tokens_saved", tokens_saved)
+    logger.info(
+        f"Knowledge query for substrate {substrate_id}: {len(order)} chunks from "
+        f"{len(documents)} candidates, {context_tokens} tokens ({tokens_saved} saved vs top-{k})"
+    )
+
+    return context
+
+
+def sync_knowledge_chunks(substrate_id: str, knowledge_id: str, chunks: list[str], revision: str) -> dict:
+    """Update a knowledge entry's stored chunks to a new chunking of its content.
+
+    Chunks whose text is unchanged keep their stored embeddings (only their
+    chunk_index is updated); only new text is embedded, and chunks that no
+    longer appear are removed. ``revision`` identifies the new content and
+    keeps ids of newly added chunks distinct from the ones kept.
+    Returns {"added", "removed", "kept"} counts.
+    """
+    if _use_numpy_backend():
+        existing = get_numpy_index().records(substrate_id, knowledge_id)
+    else:
+        collection = get_knowledge_collection()
+        found = collection.get(where={"knowledge_id": knowledge_id}, include=["documents", "metadatas"])
+        existing = [
+            {"id": i, "document": d, "metadata": m}
+            for i, d, m in zip(found["ids"], found["documents"], found["metadatas"])
+        ]
+
+    by_text: dict[str, list[dict]] = {}
+    for record in existing:
+        by_text.setdefault(record["document"], []).append(record)
+
+    keep: dict[str, dict] = {}
+    reindexed: dict[str, dict] = {}
+    new_indexes = []
+    for i, chunk in enumerate(chunks):
+        metadata = {"substrate_id": substrate_id, "knowledge_id": knowledge_id, "chunk_index": i}
+        matches = by_text.get(chunk)
+        if matches:
+            record = matches.pop(0)
+            keep[record["id"]] = metadata
+            if record["metadata"].get("chunk_index") != i:
+                reindexed[record["id"]] = metadata
+        else:
+            new_indexes.append(i)
+    removed = [record["id"] for records in by_text.values() for record in records]
+
+    ids = [f"{knowledge_id}_{i}_{revision}" for i in new_indexes]
+    documents = [chunks[i] for i in new_indexes]
+    metadatas = [
+        {"substrate_id": substrate_id, "knowledge_id": knowledge_id, "chunk_index": i}
+        for i in new_indexes
+    ]
+
+    if _use_numpy_backend():
+        embeddings = _embed(documents) if documents else np.empty((0, 0), dtype=np.float32)
+        get_numpy_index().sync(substrate_id, knowledge_id, keep, ids, embeddings, documents, metadatas)
+    else:
+        if removed:
+            collection.delete(ids=removed)
+        if reindexed:
+            collection.update(ids=list(reindexed), metadatas=list(reindexed.values()))
+        if ids:
+            collection.add(ids=ids, documents=documents, metadatas=metadatas)
+
+    return {"added": len(ids), "removed": len(removed), "kept": len(keep)}
+
+
+def delete_knowledge_chunks(knowledge_id: str, substrate_id: str | None = None) -> None:
     """Delete all chunks for a knowledge entry."""
+    if _use_numpy_backend():
+        index = get_numpy_index()
+        substrate_ids = [substrate_id] if substrate_id else index.substrate_ids()
+        for sid in substrate_ids:
+            if index.delete(sid, knowledge_id):
+                break
+        return
+
     collection = get_knowledge_collection()
 
     if collection.count() == 0:
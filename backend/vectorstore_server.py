@@ -0,0 +1,34 @@
+"""Run the shared vector store service used when VECTORSTORE_MODE=server.
+
+One service process owns the Chroma index on disk; API workers connect to it
+over HTTP instead of each opening the SQLite/HNSW files themselves.
+
+    python vectorstore_server.py --path ./chroma_data --port 8001
+"""
+import argparse
+import os
+import shutil
+import sys
+from pathlib import Path
+
+
+def main() -> None:
+    default_path = os.environ.get("VECTORSTORE_DATA_PATH") or str(
+        Path(__file__).resolve().parent / "chroma_data"
+    )
+    parser = argparse.ArgumentParser(description="Shared vector store service")
+    parser.add_argument("--path", default=default_path)
+    parser.add_argument("--host", default=os.environ.get("VECTORSTORE_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("VECTORSTORE_PORT", "8001")))
+    args = parser.parse_args()
+
+    chroma = shutil.which("chroma")
+    if chroma is None:
+        sys.exit("chroma CLI not found; install chromadb in this environment")
+
+    Path(args.path).mkdir(parents=True, exist_ok=True)
+    os.execv(chroma, [chroma, "run", "--path", args.path, "--host", args.host, "--port", str(args.port)])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Standalone background job worker.
+
+Runs the same job handlers as the API process, so extraction, URL ingestion
+and voice cloning can be scaled separately from request handling. Pair with
+JOB_WORKERS_ENABLED=false on the API processes.
+
+    python worker.py
+"""
+import asyncio
+import logging
+import signal
+
+import api  # noqa: F401 - importing the routers registers their job handlers
+import http_clients
+from config import get_settings
+from db import engine, Base, upgrade_schema
+from services import JobQueue
+
+
+async def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    if not get_settings().upload_dir:
+        logging.warning(
+            "UPLOAD_DIR is not set: voice and file uploads received by API processes on "
+            "other hosts or containers won't be found. Point it at a volume shared with them."
+        )
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(upgrade_schema)
+
+    await http_clients.start()
+    job_queue = JobQueue()
+    await job_queue.start()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
+
+    await job_queue.stop()
+    await http_clients.close()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
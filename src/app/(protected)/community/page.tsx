@@ -1,18 +1,18 @@
 import { ShadowProfileCard } from '@/components/Community';
 import { Page } from '@/components/PageLayout';
 import { prisma } from '@/lib/prisma';
-import { Substrate } from '@/lib/substrate-api';
+import { SubstrateSummary } from '@/lib/substrate-api';
 import { TopBar } from '@worldcoin/mini-apps-ui-kit-react';
 import { Group } from 'iconoir-react';
 
-async function getVerifiedShadows(): Promise<(Substrate & { is_verified: true })[]> {
+async function getVerifiedShadows(): Promise<(SubstrateSummary & { is_verified: true })[]> {
   const backendUrl = process.env.SUBSTRATE_API_URL || process.env.NEXT_PUBLIC_SUBSTRATE_API_URL || 'http://localhost:8000';
   try {
     const res = await fetch(`${backendUrl}/substrates?limit=50`, {
       next: { revalidate: 60 },
     });
     if (!res.ok) return [];
-    const substrates: Substrate[] = await res.json();
+    const substrates: SubstrateSummary[] = await res.json();
 
     // Filter to ready substrates only
     const readySubstrates = substrates.filter((s) => s.status === 'ready');
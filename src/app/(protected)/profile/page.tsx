@@ -3,12 +3,12 @@ import { SubstrateCard } from '@/components/Substrate';
 import { Page } from '@/components/PageLayout';
 import { SignOutButton } from '@/components/SignOutButton';
 import { prisma } from '@/lib/prisma';
-import { Substrate } from '@/lib/substrate-api';
+import { SubstrateSummary } from '@/lib/substrate-api';
 import { Button, CircularIcon, Marble, TopBar } from '@worldcoin/mini-apps-ui-kit-react';
 import { Plus, User } from 'iconoir-react';
 import Link from 'next/link';
 
-async function getUserSubstrates(walletAddress: string): Promise<Substrate[]> {
+async function getUserSubstrates(walletAddress: string): Promise<SubstrateSummary[]> {
   const backendUrl = process.env.SUBSTRATE_API_URL || process.env.NEXT_PUBLIC_SUBSTRATE_API_URL || 'http://localhost:8000';
   try {
     const res = await fetch(
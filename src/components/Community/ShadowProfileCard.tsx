@@ -1,11 +1,11 @@
 'use client';
 
-import { Substrate } from '@/lib/substrate-api';
+import { SubstrateSummary } from '@/lib/substrate-api';
 import { BadgeCheck, ChatBubble, User } from 'iconoir-react';
 import Link from 'next/link';
 
 interface ShadowProfileCardProps {
-  substrate: Substrate & { is_verified?: boolean };
+  substrate: SubstrateSummary & { is_verified?: boolean };
 }
 
 const GRADIENTS = [
@@ -28,7 +28,7 @@ function getGradient(id: string): string {
 }
 
 export function ShadowProfileCard({ substrate }: ShadowProfileCardProps) {
-  const traits = substrate.personality_profile?.traits?.slice(0, 2) ?? [];
+  const traits = substrate.top_traits?.slice(0, 2) ?? [];
 
   return (
     <Link href={`/substrate/${substrate.id}`}>
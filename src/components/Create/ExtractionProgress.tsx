@@ -1,6 +1,11 @@
 'use client';
 
-import { getSubstrateStatus, SubstrateStatus } from '@/lib/substrate-api';
+import {
+  ExtractionEvent,
+  getSubstrateStatus,
+  subscribeToSubstrateEvents,
+  SubstrateStatus,
+} from '@/lib/substrate-api';
 import { Button } from '@worldcoin/mini-apps-ui-kit-react';
 import { CheckCircle, Refresh, WarningCircle } from 'iconoir-react';
 import { useEffect, useState } from 'react';
@@ -35,42 +40,62 @@ export function ExtractionProgress({
   const [error, setError] = useState<string | null>(null);
 
   useEffect(() => {
-    let intervalId: NodeJS.Timeout | null = null;
+    let pollId: NodeJS.Timeout | null = null;
+    let finished = false;
+
+    const stopPolling = () => {
+      if (pollId) clearInterval(pollId);
+      pollId = null;
+    };
+
+    const applyStatus = (event: Pick<ExtractionEvent, 'status' | 'progress'>) => {
+      if (finished) return;
+      setError(null);
+      setStatus(event.status);
+      setProgress(event.progress || 0);
+
+      // Calculate current step based on progress
+      const stepIndex = Math.min(
+        Math.floor((event.progress || 0) / 20),
+        steps.length - 1
+      );
+      setCurrentStep(stepIndex);
+
+      if (event.status === 'ready' || event.status === 'failed') {
+        finished = true;
+        stopPolling();
+        unsubscribe();
+        if (event.status === 'ready') onComplete?.();
+      }
+    };
 
     const checkStatus = async () => {
       const result = await getSubstrateStatus(substrateId);
-
       if (result.error) {
         setError(result.error);
-        return;
-      }
-
-      if (result.data) {
-        setStatus(result.data.status);
-        setProgress(result.data.progress || 0);
-
-        // Calculate current step based on progress
-        const stepIndex = Math.min(
-          Math.floor((result.data.progress || 0) / 20),
-          steps.length - 1
-        );
-        setCurrentStep(stepIndex);
-
-        if (result.data.status === 'ready') {
-          onComplete?.();
-          if (intervalId) clearInterval(intervalId);
-        } else if (result.data.status === 'failed') {
-          if (intervalId) clearInterval(intervalId);
-        }
+      } else if (result.data) {
+        applyStatus({ status: result.data.status, progress: result.data.progress || 0 });
       }
     };
 
-    // Poll every 2 seconds while extracting
-    checkStatus();
-    intervalId = setInterval(checkStatus, 2000);
+    // The stream starts with the current status, then pushes every step
+    const unsubscribe = subscribeToSubstrateEvents(substrateId, {
+      onExtraction: (event) => {
+        // Back on the stream (it resends the current status on reconnect)
+        stopPolling();
+        applyStatus(event);
+      },
+      onError: () => {
+        // Poll while the stream is down, showing why if that fails too
+        if (finished || pollId) return;
+        checkStatus();
+        pollId = setInterval(checkStatus, 2000);
+      },
+    });
 
     return () => {
-      if (intervalId) clearInterval(intervalId);
+      stopPolling();
+      unsubscribe();
     };
   }, [substrateId, onComplete]);
 
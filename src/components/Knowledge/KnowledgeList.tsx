@@ -1,6 +1,11 @@
 'use client';
 
-import { KnowledgeEntry, listKnowledge, deleteKnowledge } from '@/lib/substrate-api';
+import {
+  KnowledgeEntry,
+  listKnowledge,
+  deleteKnowledge,
+  subscribeToSubstrateEvents,
+} from '@/lib/substrate-api';
 import { Link as LinkIcon, Text, Trash, Xmark } from 'iconoir-react';
 import { useCallback, useEffect, useState } from 'react';
 
@@ -38,14 +43,21 @@ export function KnowledgeList({ substrateId, refreshKey }: KnowledgeListProps) {
     fetchEntries();
   }, [fetchEntries, refreshKey]);
 
-  // Poll while any entry is processing
+  // Apply status changes pushed by the backend (new entries arrive
+  // through refreshKey)
   useEffect(() => {
-    const hasProcessing = entries.some((e) => e.status === 'processing');
-    if (!hasProcessing) return;
-
-    const interval = setInterval(fetchEntries, 5000);
-    return () => clearInterval(interval);
-  }, [entries, fetchEntries]);
+    return subscribeToSubstrateEvents(substrateId, {
+      onKnowledge: (event) => {
+        setEntries((prev) =>
+          event.status === 'deleted'
+            ? prev.filter((e) => e.id !== event.id)
+            : prev.map((e) =>
+                e.id === event.id ? { ...e, ...event, status: event.status as KnowledgeEntry['status'] } : e
+              )
+        );
+      },
+    });
+  }, [substrateId]);
 
   const handleDelete = async (entryId: string) => {
     setDeletingIds((prev) => new Set(prev).add(entryId));
@@ -1,12 +1,12 @@
 'use client';
 
-import { Substrate } from '@/lib/substrate-api';
+import { SubstrateSummary } from '@/lib/substrate-api';
 import { CircularIcon } from '@worldcoin/mini-apps-ui-kit-react';
 import { BadgeCheck, CheckCircle, User } from 'iconoir-react';
 import Link from 'next/link';
 
 interface SubstrateCardProps {
-  substrate: Substrate & { is_verified?: boolean };
+  substrate: SubstrateSummary & { is_verified?: boolean };
 }
 
 export function SubstrateCard({ substrate }: SubstrateCardProps) {
@@ -15,6 +15,12 @@ export interface Substrate {
   updated_at: string;
 }
 
+// List views (GET /substrates) return this lighter shape; the full
+// personality_profile is only included when fetching a single substrate
+export interface SubstrateSummary extends Omit<Substrate, 'personality_profile'> {
+  top_traits: string[];
+}
+
 export interface PersonalityProfile {
   traits: string[];
   interests: string[];
@@ -83,7 +89,7 @@ export async function createSubstrate(data: {
 }
 
 // Get all substrates
-export async function listSubstrates(): Promise<ApiResponse<Substrate[]>> {
+export async function listSubstrates(): Promise<ApiResponse<SubstrateSummary[]>> {
   try {
     const response = await fetch(`${API_BASE_URL}/substrates`);
 
@@ -145,6 +151,59 @@ export async function getSubstrateStatus(id: string): Promise<ApiResponse<{ stat
   }
 }
 
+// Status events pushed by GET /substrates/{id}/events
+export interface ExtractionEvent {
+  status: SubstrateStatus;
+  progress: number;
+  node?: string;
+}
+
+export interface VoiceEvent {
+  voice_status: 'pending' | 'ready' | 'failed' | null;
+  voice_name?: string | null;
+  has_voice: boolean;
+}
+
+export interface KnowledgeEvent {
+  id: string;
+  status: KnowledgeEntry['status'] | 'deleted';
+  title?: string | null;
+  chunk_count: number;
+  error_message?: string | null;
+}
+
+export interface SubstrateEventHandlers {
+  onExtraction?: (event: ExtractionEvent) => void;
+  onVoice?: (event: VoiceEvent) => void;
+  onKnowledge?: (event: KnowledgeEvent) => void;
+  // The connection failed or dropped. The browser keeps retrying unless it
+  // was refused outright; either way the next event arrives only once
+  // the stream is back.
+  onError?: () => void;
+}
+
+// Subscribe to a substrate's status events. The stream opens with the
+// current state and reconnects on its own; returns an unsubscribe function.
+export function subscribeToSubstrateEvents(
+  id: string,
+  handlers: SubstrateEventHandlers
+): () => void {
+  const source = new EventSource(`${API_BASE_URL}/substrates/${id}/events`);
+
+  const listen = <T>(type: string, handler?: (event: T) => void) => {
+    if (!handler) return;
+    source.addEventListener(type, (message) => {
+      handler(JSON.parse((message as MessageEvent).data) as T);
+    });
+  };
+  listen('extraction', handlers.onExtraction);
+  listen('voice', handlers.onVoice);
+  listen('knowledge', handlers.onKnowledge);
+  if (handlers.onError) source.onerror = handlers.onError;
+
+  return () => source.close();
+}
+
 // Trigger personality extraction
 export async function triggerExtraction(id: string): Promise<ApiResponse<{ message: string }>> {
   try {
@@ -408,7 +467,7 @@ export async function deleteKnowledge(
 }
 
 // Get substrates owned by a specific wallet
-export async function getSubstratesByOwner(walletAddress: string): Promise<ApiResponse<Substrate[]>> {
+export async function getSubstratesByOwner(walletAddress: string): Promise<ApiResponse<SubstrateSummary[]>> {
   try {
     const response = await fetch(
       `${API_BASE_URL}/substrates?owner_wallet=${encodeURIComponent(walletAddress)}`